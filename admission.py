@@ -0,0 +1,181 @@
+# admission control - per-user token buckets per endpoint class and a global in-flight cap
+
+import json
+import math
+import os
+import threading
+import time
+from array import array
+
+from werkzeug.wsgi import ClosingIterator
+
+from player_store import GOLDEN_RATIO_64, MASK_64, StripedLock
+
+DEFAULT_SLOTS = 1 << 18
+DEFAULT_RETRY_AFTER_SECONDS = 1
+
+
+def parse_limits(spec):
+    """{endpoint class: (tokens per second, burst)} from "spin=20/40,wallet=50/100" """
+    limits = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        try:
+            name, rate_burst = item.split("=")
+            rate, _, burst = rate_burst.partition("/")
+            rate = float(rate)
+            burst = float(burst) if burst else rate
+        except ValueError:
+            raise ValueError(f"bad rate limit {item!r}, expected class=rate/burst")
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"bad rate limit {item!r}, the rate must be positive and the burst at least 1")
+        limits[name.strip()] = (rate, burst)
+    return limits
+
+
+class TokenBuckets:
+    """One token bucket per user for one endpoint class, in a fixed-size table
+
+    Users are hashed into `slots` buckets kept in two flat float arrays
+    (tokens, last refill), so memory is fixed however many distinct users
+    show up. Users that land in the same slot share its bucket: size the
+    table well above the number of users active at once (it is rounded up
+    to a power of two). A bucket only locks its own stripe, so requests of
+    different users rarely contend.
+    """
+
+    def __init__(self, rate, burst, slots=DEFAULT_SLOTS, lock_stripes=64, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._shift = 64 - max(1, (slots - 1).bit_length())
+        self.slots = 1 << (64 - self._shift)
+        self.clock = clock
+        self._tokens = array("d", bytes(8 * self.slots))
+        self._stamps = array("d", bytes(8 * self.slots))  # 0.0 marks a bucket nobody has used, it starts full
+        self._locks = StripedLock(lock_stripes)
+
+    def acquire(self, userId, cost=1):
+        """0.0 when cost tokens were taken, otherwise the seconds until they will be there
+
+        A cost above the burst gets in once the bucket is full and still
+        pays its whole cost: the bucket goes negative and the user waits
+        until the debt is refilled, so batching does not raise their rate.
+        """
+        needed = min(cost, self.burst)
+        slot = self._slot(userId)
+        with self._locks.for_key(slot):
+            now = self.clock()
+            stamp = self._stamps[slot]
+            if stamp == 0.0:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, self._tokens[slot] + (now - stamp) * self.rate)
+            self._stamps[slot] = now
+            if tokens >= needed:
+                self._tokens[slot] = tokens - cost
+                return 0.0
+            self._tokens[slot] = tokens
+            return (needed - tokens) / self.rate
+
+    def _slot(self, userId):
+        return ((hash(userId) * GOLDEN_RATIO_64) & MASK_64) >> self._shift
+
+    def refund(self, userId, cost=1):
+        slot = self._slot(userId)
+        with self._locks.for_key(slot):
+            self._tokens[slot] = min(self.burst, self._tokens[slot] + cost)
+
+
+class AdmissionController:
+    """Decides whether a request is let in
+
+    Per-user limits are token buckets per endpoint class (limits maps a
+    class to (rate, burst)); classes without a limit are not metered.
+    max_in_flight caps the requests being served at once across all users,
+    0 leaves it open. Rejections are meant to be cheap: the in-flight check
+    runs in front of flask, before any routing or body parsing.
+    """
+
+    def __init__(self, limits=None, max_in_flight=0, slots=DEFAULT_SLOTS, clock=time.monotonic):
+        self.limits = dict(limits or {})
+        self.max_in_flight = max_in_flight
+        self._buckets = {
+            name: TokenBuckets(rate, burst, slots=slots, clock=clock) for name, (rate, burst) in self.limits.items()
+        }
+        self.in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        # rejections since start, only touched on the rejection path
+        self.stats = {"rate_limited": 0, "overloaded": 0}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            limits=parse_limits(os.getenv("CASINO_RATE_LIMITS")),
+            max_in_flight=int(os.getenv("CASINO_MAX_IN_FLIGHT", "0")),
+            slots=int(os.getenv("CASINO_RATE_LIMIT_SLOTS", str(DEFAULT_SLOTS)))
+        )
+
+    def metered(self, endpoint_class):
+        return endpoint_class in self._buckets
+
+    def admit_users(self, endpoint_class, costs):
+        """0.0 when every {userId: cost} fits its bucket, otherwise the seconds to wait
+
+        All or nothing: tokens taken from earlier users of a batch are
+        given back when a later one is over its limit.
+        """
+        buckets = self._buckets.get(endpoint_class)
+        if buckets is None:
+            return 0.0
+        charged = []
+        for userId, cost in costs.items():
+            wait = buckets.acquire(userId, cost)
+            if wait:
+                for charged_id, charged_cost in charged:
+                    buckets.refund(charged_id, charged_cost)
+                with self._stats_lock:
+                    self.stats["rate_limited"] += 1
+                return wait
+            charged.append((userId, cost))
+        return 0.0
+
+    def wsgi_middleware(self, wsgi_app, exempt_prefixes=()):
+        """wsgi_app behind the in-flight cap, paths under exempt_prefixes always get in"""
+        if not self.max_in_flight:
+            return wsgi_app
+        overloaded = json.dumps({"error": "Server is overloaded, retry later"}).encode()
+        headers = [
+            ("Content-Type", "application/json"),
+            ("Content-Length", str(len(overloaded))),
+            ("Retry-After", str(DEFAULT_RETRY_AFTER_SECONDS))
+        ]
+
+        def release():
+            with self._in_flight_lock:
+                self.in_flight -= 1
+
+        def admitted_app(environ, start_response):
+            if environ.get("PATH_INFO", "").startswith(exempt_prefixes):
+                return wsgi_app(environ, start_response)
+            with self._in_flight_lock:
+                full = self.in_flight >= self.max_in_flight
+                if not full:
+                    self.in_flight += 1
+            if full:
+                with self._stats_lock:
+                    self.stats["overloaded"] += 1
+                start_response("503 Service Unavailable", headers)
+                return [overloaded]
+            try:
+                # released when the server closes the body, so streamed responses count until they finish
+                return ClosingIterator(wsgi_app(environ, start_response), release)
+            except BaseException:
+                release()
+                raise
+
+        return admitted_app
+
+
+def retry_after(seconds):
+    """Retry-After header value, whole seconds and at least one"""
+    return str(max(DEFAULT_RETRY_AFTER_SECONDS, math.ceil(seconds)))
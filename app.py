@@ -1,225 +1,854 @@
 # mock server 
 
-from flask import Flask, request, jsonify
+import base64
+import json
+import math
+import os
+import time
+from itertools import islice
+
+from flask import Flask, Response, request, jsonify
+from player_store import PlayerStore
+from ledger import IdGenerator, Ledger
+from retention import RetentionPolicy, SegmentArchive
+from slot_machine import evaluate_spin
+from spin_rng import SpinRng
+from notification_queue import NotificationDispatcher, sink_from_env
+from wal import LogUnavailable, WriteAheadLog
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from profiler import DEFAULT_INTERVAL as PROFILE_INTERVAL, SamplingProfiler
+from schemas import MAX_BATCH_ITEMS, VALIDATORS, ValidationError
+from json_codec import install_codec
+from idempotency import HIT, IN_FLIGHT, IdempotencyCache, SharedIdempotencyCache
+from game_stats import DEFAULT_ROLLUPS as STATS_ROLLUPS, GameStats, SharedGameStats
+from admission import AdmissionController, retry_after
+from storage import HISTORY_KINDS, BalanceOutOfRange, InMemoryStorage
+from sqlite_storage import SQLiteStorage
+from shm_ledger import DEFAULT_PATH as DEFAULT_SHM_PATH, SharedBalanceLedger, SharedLedgerStorage
 
 app = Flask(__name__)
+JSON_CODEC = install_codec(app)
+
+DEFAULT_MAX_RECORDS = 100_000
+
+
+def is_settled_transaction(transaction):
+    # a transaction is settled once it was spun and, if it won, paid out
+    outcome = transaction.get('outcome')
+    if outcome is None:
+        return False
+    return outcome != "WIN" or transaction.get('payoutStatus') == 'PAID'
+
+
+def is_settled_notification(notification):
+    # queued notifications still belong to the dispatcher
+    return notification.get('status') in ("SENT", "FAILED", "REJECTED")
+
+
+SEED_PLAYERS = [{"userId": 123, "balance": 150.00, "currency": "USD"}]
+DEFAULT_TENANT_BALANCE = 150.00
+ADMIN_API_ENABLED = os.getenv("CASINO_ADMIN_API", "0") == "1"
+
+players = PlayerStore(SEED_PLAYERS)
+transactions = Ledger(
+    "transactionId",
+    policy=RetentionPolicy.from_env("transactions", DEFAULT_MAX_RECORDS),
+    archive=SegmentArchive("transactions", "transactionId"),
+    is_settled=is_settled_transaction,
+    index_by="userId"
+)
+spin_results = Ledger(
+    "spinId",
+    policy=RetentionPolicy.from_env("spin_results", DEFAULT_MAX_RECORDS),
+    archive=SegmentArchive("spin_results", "spinId"),
+    index_by="userId"
+)
+notifications = Ledger(
+    "notificationId",
+    policy=RetentionPolicy.from_env("notifications", DEFAULT_MAX_RECORDS),
+    archive=SegmentArchive("notifications", "notificationId"),
+    is_settled=is_settled_notification,
+    index_by="userId"
+)
+
+# route handlers only use `storage`; the in-memory collections above back the default backend
+STORAGE_BACKEND = os.getenv("CASINO_STORAGE", "memory")
+if STORAGE_BACKEND == "sqlite":
+    storage = SQLiteStorage(
+        os.getenv("CASINO_SQLITE_PATH", "casino.db"),
+        pool_size=int(os.getenv("CASINO_SQLITE_POOL_SIZE", "8"))
+    )
+elif STORAGE_BACKEND == "shared":
+    # multi-process serving: balances in the shared-memory ledger, records in sqlite
+    storage = SharedLedgerStorage(
+        os.getenv("CASINO_SQLITE_PATH", "casino.db"),
+        SharedBalanceLedger(
+            os.getenv("CASINO_SHM_PATH", DEFAULT_SHM_PATH),
+            capacity=int(os.getenv("CASINO_SHM_CAPACITY", str(1 << 20)))
+        ),
+        pool_size=int(os.getenv("CASINO_SQLITE_POOL_SIZE", "8"))
+    )
+else:
+    storage = InMemoryStorage(players, transactions, spin_results, notifications)
+
+
+
+def seed_players():
+    # the demo user, plus accounts 1..N for load tests (benchmarks/load_test.py --workload many_users)
+    for player in SEED_PLAYERS:
+        if storage.get_player(player["userId"]) is None:
+            storage.add_player(player["userId"], player["balance"], player["currency"])
+    for seed_user_id in range(1, int(os.getenv("CASINO_SEED_USERS", "0")) + 1):
+        if storage.get_player(seed_user_id) is None:
+            storage.add_player(seed_user_id, float(os.getenv("CASINO_SEED_BALANCE", "1000000")), "USD")
+
+
+seed_players()
+
+notification_dispatcher = NotificationDispatcher(
+    sink_from_env(),
+    max_depth=int(os.getenv("CASINO_NOTIFICATION_QUEUE_DEPTH", "10000")),
+    batch_size=int(os.getenv("CASINO_NOTIFICATION_BATCH_SIZE", "100")),
+    workers=int(os.getenv("CASINO_NOTIFICATION_WORKERS", "2")),
+    on_delivered=storage.update_notifications
+)
+NOTIFICATION_RETRY_AFTER_SECONDS = 1
+
+transaction_ids = IdGenerator("txn")
+spin_ids = IdGenerator("spin")
+notification_ids = IdGenerator("notif")
+tenant_ids = IdGenerator("user")
+spin_rng = SpinRng.from_env()
+
+
+def journal_player(player):
+    # called under the player's lock stripe, only buffers the event
+    wal.append({"type": "balance", "userId": player.userId, "balance": player.balance, "currency": player.currency})
+
+
+def players_snapshot():
+    return {"players": [p.to_dict() for p in players]}
+
+
+def restore_players(state, events):
+    records = (state or {}).get("players", []) + events
+    for record in records:
+        user = players.get(record['userId'])
+        if user is None:
+            players.add(record['userId'], record['balance'], record['currency'])
+        else:
+            user.balance = record['balance']
+            user.currency = record['currency']
+
+
+# In-memory balances survive restarts only when a write-ahead log directory is configured
+wal = None
+if os.getenv("CASINO_WAL_DIR") and STORAGE_BACKEND == "memory":
+    wal = WriteAheadLog(
+        os.getenv("CASINO_WAL_DIR"),
+        commit_window=float(os.getenv("CASINO_WAL_COMMIT_WINDOW", "0.002")),
+        snapshot_interval=float(os.getenv("CASINO_WAL_SNAPSHOT_SECONDS", "60")),
+        snapshot_every=int(os.getenv("CASINO_WAL_SNAPSHOT_EVERY", "100000"))
+    )
+    restore_players(*wal.recover())
+    players.journal = journal_player
+    wal.start(players_snapshot)
+
+
+metrics = MetricsRegistry()
+http_requests = metrics.counter(
+    "casino_http_requests_total", "HTTP requests by route, method and status code", ("route", "method", "status")
+)
+http_latency = metrics.histogram(
+    "casino_http_request_duration_seconds", "Request handling time in seconds", ("route", "method")
+)
+bets_placed = metrics.counter("casino_bets_placed_total", "Accepted bets")
+amount_wagered = metrics.counter("casino_amount_wagered_total", "Sum of accepted bet amounts")
+amount_paid_out = metrics.counter("casino_amount_paid_out_total", "Sum of payouts credited")
+spins = metrics.counter("casino_spins_total", "Spins by outcome, WIN counts the wins", ("outcome",))
+metrics.gauge(
+    "casino_collection_size", "Records held per storage collection", lambda: (
+        ((name,), size) for name, size in storage.sizes().items()
+    ), ("collection",)
+)
+metrics.gauge(
+    "casino_notification_dispatcher", "Notification dispatcher counters and queue state", lambda: (
+        ((name,), value) for name, value in notification_dispatcher.metrics().items()
+    ), ("metric",)
+)
+# worker processes serving this app, serve.py sets it; per-process state is only complete with one
+WORKER_COUNT = int(os.getenv("CASINO_WORKERS", "1"))
+IDEMPOTENCY_CACHE_SETTINGS = {
+    "max_keys": int(os.getenv("CASINO_IDEMPOTENCY_MAX_KEYS", "100000")),
+    "ttl_seconds": float(os.getenv("CASINO_IDEMPOTENCY_TTL_SECONDS", "3600"))
+}
+if STORAGE_BACKEND in ("sqlite", "shared"):
+    # keys claimed in the database, a retry on another worker process is replayed too
+    idempotency_cache = SharedIdempotencyCache(storage, **IDEMPOTENCY_CACHE_SETTINGS)
+else:
+    idempotency_cache = IdempotencyCache(**IDEMPOTENCY_CACHE_SETTINGS)
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+MAX_BALANCE_LOOKUP = 1000
+DEFAULT_HISTORY_LIMIT = 50
+MAX_HISTORY_LIMIT = 500
+idempotency_requests = metrics.counter(
+    "casino_idempotency_requests_total", "Requests carrying an Idempotency-Key by cache result", ("result",)
+)
+metrics.gauge("casino_idempotency_keys", "Idempotency keys held in the response cache", lambda: len(idempotency_cache))
+# running totals behind /stats
+STATS_ROLLUP_SETTINGS = STATS_ROLLUPS if os.getenv("CASINO_STATS_ROLLUPS", "1") != "0" else ()
+if STORAGE_BACKEND in ("sqlite", "shared"):
+    # kept in the database, so every worker process reports the same totals
+    game_stats = SharedGameStats(storage, rollups=STATS_ROLLUP_SETTINGS)
+else:
+    game_stats = GameStats(rollups=STATS_ROLLUP_SETTINGS)
+METRICS_ENABLED = os.getenv("CASINO_METRICS", "1") != "0"
+
+# installs itself into the request path only while a profile is being taken
+profiler = SamplingProfiler(app)
+
+if METRICS_ENABLED:
+    @app.before_request
+    def start_request_timer():
+        request.environ["casino.start"] = time.perf_counter()
+
+    # registered before the WAL hook so it runs after it: latency includes the durable wait
+    @app.after_request
+    def record_request_metrics(response):
+        # unwrap the request proxy once, each proxied attribute access costs about a microsecond
+        current = request._get_current_object()
+        start = current.environ.get("casino.start")
+        if start is not None:
+            rule = current.url_rule
+            labels = (rule.rule if rule is not None else "unmatched", current.method)
+            http_latency.observe(time.perf_counter() - start, labels)
+            http_requests.inc(1, labels + (response.status_code,))
+        return response
+
+
+@app.after_request
+def wait_for_durable_balance(response):
+    # group commit: the response leaves only after this request's events are fsynced
+    if wal is not None:
+        try:
+            wal.wait_durable()
+        except LogUnavailable as error:
+            # the change is not on disk, so the client must not take it as done
+            response = jsonify({"error": str(error)})
+            response.status_code = 503
+    return response
+
+
+# per-user token buckets are kept per endpoint class, set with CASINO_RATE_LIMITS="spin=20/40,wallet=50/100"
+ENDPOINT_CLASSES = {
+    "/slot/spin": "spin",
+    "/slot/spinMany": "spin",
+    "/game/play": "spin",
+    "/payment/placeBet": "wallet",
+    "/payment/placeBets": "wallet",
+    "/payment/payout": "wallet",
+    "/user/update-balance": "wallet",
+    "/notify": "notify",
+    "/user/balance": "read",
+    "/user/balances": "read",
+    "/user/history": "read",
+    "/stats": "read"
+}
+# the in-flight cap never turns away scrapes or the admin API
+ADMISSION_EXEMPT_PREFIXES = ("/metrics", "/admin/")
+admission = AdmissionController.from_env()
+app.wsgi_app = admission.wsgi_middleware(app.wsgi_app, ADMISSION_EXEMPT_PREFIXES)
+metrics.gauge("casino_requests_in_flight", "Requests being served under the in-flight cap", lambda: admission.in_flight)
+metrics.gauge(
+    "casino_admission_rejections", "Requests turned away since start, rate_limited (429) or overloaded (503)",
+    lambda: (((reason,), count) for reason, count in admission.stats.items()), ("reason",)
+)
+
+
+def request_user_costs():
+    # {userId: requests} a call makes on behalf of each user; batches charge one per item
+    costs = {}
+    userIds = []
+    for raw in request.args.getlist('userId'):
+        try:
+            userIds.append(int(raw))
+        except ValueError:
+            pass
+    if request.method == "POST":
+        body = request.get_json(silent=True)  # cached, parse_body reuses it
+        if type(body) is dict:
+            items = body.get('bets') or body.get('spins') or [body]
+            # an oversized batch is rejected by its schema, it costs nothing
+            if type(items) is list and len(items) <= MAX_BATCH_ITEMS:
+                userIds.extend(item.get('userId') for item in items if type(item) is dict)
+    for userId in userIds:
+        if type(userId) is int:
+            costs[userId] = costs.get(userId, 0) + 1
+    return costs
+
+
+@app.before_request
+def admit_request():
+    # registered after the metrics timer, so rejected calls still show up in the request metrics
+    rule = request.url_rule
+    endpoint_class = ENDPOINT_CLASSES.get(rule.rule) if rule is not None else None
+    if endpoint_class is None or not admission.metered(endpoint_class):
+        return None
+    wait = admission.admit_users(endpoint_class, request_user_costs())
+    if wait:
+        return jsonify({"error": "Rate limit exceeded, retry later"}), 429, {"Retry-After": retry_after(wait)}
+    return None
+
+
+def parse_body(schema):
+    # reject a malformed body before any state lookup, see schemas.py
+    return VALIDATORS[schema](request.get_json(silent=True))
+
+
+def validation_error(schema, data):
+    # batch items are validated one by one, a bad item only fails itself
+    try:
+        VALIDATORS[schema](data)
+    except ValidationError as e:
+        return str(e)
+    return None
+
+
+def run_idempotent(data, execute):
+    # with an Idempotency-Key header a retried request gets the first response instead of running again
+    key = request.headers.get('Idempotency-Key')
+    if key is None:
+        body, status = execute()
+        return jsonify(body), status
+    if not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        return jsonify({"error": "Invalid Idempotency-Key"}), 400
+    if WORKER_COUNT > 1 and not isinstance(idempotency_cache, SharedIdempotencyCache):
+        # another worker would not see the key and run a retry again
+        return jsonify({"error": "Idempotency-Key needs CASINO_STORAGE=sqlite or shared with several workers"}), 501
+
+    # keys are scoped to the endpoint, the body must match the first request's
+    fingerprint = json.dumps(data, sort_keys=True)
+    outcome, (body, status) = idempotency_cache.run((request.path, key), fingerprint, execute)
+    idempotency_requests.inc(1, (outcome,))
+    headers = {"Idempotent-Replayed": "true"} if outcome in (HIT, IN_FLIGHT) else {}
+    return jsonify(body), status, headers
+
+
+@app.errorhandler(ValidationError)
+def reject_invalid_request(error):
+    return jsonify({"error": str(error)}), 400
 
-players = [{"userId": 123, "balance": 150.00, "currency": "USD"}]
-transactions = []
-spin_results = []
-notifications = []
+
+@app.errorhandler(BalanceOutOfRange)
+def reject_out_of_range_balance(error):
+    return jsonify({"error": str(error)}), 400
+
+
+def balance_view(user):
+    body = user.to_dict()
+    body["version"] = user.version
+    return body
 
 
 @app.route('/user/balance', methods=['GET'])
 def get_balance():
     userId = request.args.get('userId', type=int)
-    user = next((p for p in players if p['userId'] == userId), None)
+    user = storage.get_player(userId)
     if user is None:
         return jsonify({"error": "User not found"}), 404
-    
+
+    # the tag comes from the stored version, so a revalidation skips building the body
+    etag = user.etag()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(balance_view(user))
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route('/user/balances', methods=['GET'])
+def get_balances():
+    """Balances of every ?userId= in one call, unknown ids are listed under missing"""
+    raw_ids = request.args.getlist('userId')
+    if not raw_ids:
+        return jsonify({"error": "userId is required"}), 400
+    if len(raw_ids) > MAX_BALANCE_LOOKUP:
+        return jsonify({"error": f"At most {MAX_BALANCE_LOOKUP} userIds per call"}), 400
+    try:
+        userIds = [int(userId) for userId in raw_ids]
+    except ValueError:
+        return jsonify({"error": "userId must be an integer"}), 400
+
+    balances = []
+    missing = []
+    for userId, user in zip(userIds, storage.get_players(userIds)):
+        if user is None:
+            missing.append(userId)
+        else:
+            body = balance_view(user)
+            body["etag"] = f'"{user.etag()}"'
+            balances.append(body)
+    return jsonify({"balances": balances, "missing": missing})
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key), separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        createdAt, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValidationError("Invalid cursor")
+    if type(createdAt) not in (int, float) or type(record_id) is not str:
+        raise ValidationError("Invalid cursor")
+    return createdAt, record_id
+
+
+def query_float(name):
+    raw = request.args.get(name)
+    if raw is None:
+        return None
+    try:
+        value = float(raw)
+    except ValueError:
+        value = math.nan
+    if not math.isfinite(value):
+        raise ValidationError(f"{name} must be a number")
+    return value
+
+
+def history_view(record):
+    # dict() copies in one step, the dispatcher may update a stored notification meanwhile;
+    # the rng position of seeded spins stays server side, it would let a client predict the stream
+    record = dict(record)
+    record.pop("rng", None)
+    return record
+
+
+@app.route('/user/history', methods=['GET'])
+def user_history():
+    """One user's transactions, spins or notifications, newest first
+
+    ?type= picks the collection (transactions by default), ?since= / ?until=
+    bound createdAt and ?cursor= continues after the previous page. Pages
+    hold ?limit= records and carry nextCursor while more remain;
+    ?format=ndjson streams every match as one JSON object per line instead.
+    """
+    userId = request.args.get('userId', type=int)
+    if userId is None:
+        raise ValidationError("userId must be an integer")
+    kind = request.args.get('type', HISTORY_KINDS[0])
+    if kind not in HISTORY_KINDS:
+        raise ValidationError(f"type must be one of {', '.join(HISTORY_KINDS)}")
+    since = query_float('since')
+    until = query_float('until')
+    cursor = request.args.get('cursor')
+    before = decode_cursor(cursor) if cursor else None
+    limit = request.args.get('limit', type=int)
+    if 'limit' in request.args and (limit is None or not 0 < limit <= MAX_HISTORY_LIMIT):
+        raise ValidationError(f"limit must be between 1 and {MAX_HISTORY_LIMIT}")
+    if storage.get_player(userId) is None:
+        return jsonify({"error": "User not found"}), 404
+
+    entries = storage.history(kind, userId, since, until, before)
+    if request.args.get('format') == "ndjson":
+        if limit is not None:
+            entries = islice(entries, limit)
+        dumps = app.json.dumps
+        # a generator body: records are encoded and sent one by one, never collected
+        return Response((dumps(history_view(record)) + "\n" for _, record in entries),
+                        mimetype="application/x-ndjson")
+
+    limit = limit or DEFAULT_HISTORY_LIMIT
+    page = list(islice(entries, limit + 1))
+    nextCursor = encode_cursor(page[limit - 1][0]) if len(page) > limit else None
     return jsonify({
-        "userId": user['userId'],
-        "balance": user['balance'],
-        "currency": user['currency']
+        "userId": userId,
+        "type": kind,
+        "items": [history_view(record) for _, record in page[:limit]],
+        "nextCursor": nextCursor
     })
 
 
 @app.route('/user/update-balance', methods=['POST'])
 def update_balance():
-    data = request.get_json()
+    data = parse_body("update_balance")
     userId = data.get('userId')
     newBalance = data.get('newBalance')
     
-    # Find user in players list
-    user = next((p for p in players if p['userId'] == userId), None)
+    user = storage.get_player(userId)
     
     if user is None:
         return jsonify({"error": "User not found"}), 404
     
     # Update existing user's balance
-    user['balance'] = newBalance
+    storage.set_balance(user, newBalance)
     
-    return jsonify({
-        "userId": user['userId'],
-        "balance": user['balance'],
-        "currency": user['currency']
-    })
+    return jsonify(user.to_dict())
 
 
 
-@app.route('/payment/placeBet', methods=['POST'])
-def place_bet():
-    data = request.get_json()
-    userId = data.get('userId')
-    betAmount = data.get('betAmount')
-    
-    # Find user in players list
-    user = next((p for p in players if p['userId'] == userId), None)
-    
+def execute_bet(user, userId, betAmount):
     if user is None:
-        return jsonify({"error": "User not found"}), 404
-    
-    # Check if user has enough balance
-    if user['balance'] < betAmount:
-        return jsonify({"error": "Insufficient balance"}), 400
+        return {"error": "User not found"}, 404
     
+    # Check and deduct in one step so concurrent bets can't overdraw
+    newBalance = storage.debit_if_sufficient(user, betAmount)
+    if newBalance is None:
+        return {"error": "Insufficient balance"}, 400
     
-    import random
-    transactionId = f"txn_{random.randint(100, 999)}"
-    
-   
-    user['balance'] -= betAmount
+    transactionId = transaction_ids.next_id()
     
     # Create transaction record
     transaction = {
         "transactionId": transactionId,
         "userId": userId,
         "betAmount": betAmount,
-        "status": "SUCCESS"
+        "status": "SUCCESS",
+        "createdAt": time.time()
     }
-    transactions.append(transaction)
+    storage.add_transaction(transaction)
+    bets_placed.inc()
+    game_stats.record_bet(userId, betAmount)
+    amount_wagered.inc(betAmount)
     
-    return jsonify({
+    return {
         "userId": userId,
         "transactionId": transactionId,
         "status": "SUCCESS",
-        "newBalance": user['balance']
-    })
+        "newBalance": newBalance
+    }, 200
 
 
-@app.route('/payment/payout', methods=['POST'])
-def payout():
-    data = request.get_json()
+@app.route('/payment/placeBet', methods=['POST'])
+def place_bet():
+    data = parse_body("place_bet")
     userId = data.get('userId')
-    transactionId = data.get('transactionId')
-    winAmount = data.get('winAmount')
+    betAmount = data.get('betAmount')
     
-    # Find user in players list
-    user = next((p for p in players if p['userId'] == userId), None)
+    return run_idempotent(data, lambda: execute_bet(storage.get_player(userId), userId, betAmount))
+
+
+@app.route('/payment/placeBets', methods=['POST'])
+def place_bets():
+    bets = parse_body("place_bets")['bets']
+    
+    # validate every bet, then resolve the valid ones' users in one pass before touching any balance
+    errors = [validation_error("place_bet", bet) for bet in bets]
+    users = storage.get_players(None if error else bet['userId'] for bet, error in zip(bets, errors))
+    
+    results = []
+    for bet, error, user in zip(bets, errors, users):
+        if error:
+            body, status = {"error": error}, 400
+        else:
+            body, status = execute_bet(user, bet['userId'], bet['betAmount'])
+        body["statusCode"] = status
+        results.append(body)
     
+    return jsonify({"results": results})
+
+
+def execute_payout(user, transaction, userId, transactionId, winAmount):
     if user is None:
-        return jsonify({"error": "User not found"}), 404
-    
-    # Find transaction in transactions list
-    transaction = next((t for t in transactions if t['transactionId'] == transactionId), None)
+        return {"error": "User not found"}, 404
     
     if transaction is None:
-        return jsonify({"error": "Transaction not found"}), 404
-    
+        return {"error": "Transaction not found"}, 404
     
-    user['balance'] += winAmount
+    newBalance = storage.credit(user, winAmount)
     
-   
-    transaction['winAmount'] = winAmount
-    transaction['payoutStatus'] = 'PAID'
+    storage.update_transaction(transaction, winAmount=winAmount, payoutStatus='PAID')
+    amount_paid_out.inc(winAmount)
+    game_stats.record_payout(userId, winAmount)
     
-    return jsonify({
+    return {
         "userId": userId,
-        "transactionId": transactionId,  
+        "transactionId": transactionId,
         "status": "SUCCESS",
-        "newBalance": user['balance']
-    })
+        "newBalance": newBalance
+    }, 200
 
 
-@app.route('/slot/spin', methods=['POST'])
-def spin():
-    data = request.get_json()
+@app.route('/payment/payout', methods=['POST'])
+def payout():
+    data = parse_body("payout")
     userId = data.get('userId')
-    betAmount = data.get('betAmount')
     transactionId = data.get('transactionId')
+    winAmount = data.get('winAmount')
     
+    return run_idempotent(data, lambda: execute_payout(
+        storage.get_player(userId), storage.get_transaction(transactionId), userId, transactionId, winAmount
+    ))
+
+
+def execute_spin(user, transaction, userId, betAmount, transactionId):
+    if user is None:
+        return {"error": "User not found"}, 404
     
-    user = next((p for p in players if p['userId'] == userId), None)
+    if transaction is None:
+        return {"error": "Transaction not found"}, 404
     
-    if user is None:
-        return jsonify({"error": "User not found"}), 404
+    if betAmount != transaction['betAmount']:
+        return {"error": "betAmount does not match the transaction"}, 400
     
-    # Find transaction in transactions list
-    transaction = next((t for t in transactions if t['transactionId'] == transactionId), None)
+    # Slot machine logic - reels come from the pre-generated outcome pool
+    spin_result, rng_position = spin_rng.spin(userId)
     
-    if transaction is None:
-        return jsonify({"error": "Transaction not found"}), 404
-    
-    # Slot machine logic - determine win or lose
-    import random
-    reels = ["Cherry", "Bell", "Seven", "Bar", "Lemon"]
-    spin_result = [random.choice(reels) for _ in range(3)]
-    
-    # Determine outcome based on combination
-    # WIN condition: Only three of a kind
-    if spin_result[0] == spin_result[1] == spin_result[2]:
-        outcome = "WIN"
-        if spin_result[0] == "Cherry":
-            winAmount = betAmount * 10  
-        elif spin_result[0] == "Seven":
-            winAmount = betAmount * 5   
-        else:
-            winAmount = betAmount * 3   
-        message = f"Congratulations! You won ${winAmount}!"
-    else:
-        # All other combinations are LOSE
-        outcome = "LOSE"
-        winAmount = 0
-        message = "Better luck next time!"
+    # WIN condition: Only three of a kind, paid from the paytable
+    outcome, winAmount, message = evaluate_spin(spin_result, betAmount)
+    
+    storage.update_transaction(transaction, outcome=outcome)
     
     # Create spin result record
     spin_result_record = {
+        "spinId": spin_ids.next_id(),
         "transactionId": transactionId,
         "userId": userId,
         "outcome": outcome,
         "winAmount": winAmount,
         "reels": spin_result,
-        "message": message
+        "message": message,
+        "createdAt": time.time()
     }
-    spin_results.append(spin_result_record)
-    
-    return jsonify({
+    if rng_position is not None:
+        # seeded rng: enough to regenerate these reels with spin_rng.replay()
+        spin_result_record["rng"] = rng_position
+    storage.add_spin(spin_result_record)
+    spins.inc(1, (outcome,))
+    game_stats.record_spin(userId, outcome == "WIN")
+    
+    return {
         "userId": userId,
         "outcome": outcome,
         "winAmount": winAmount,
         "reels": spin_result,
         "message": message
-    })
+    }, 200
 
 
-@app.route('/notify', methods=['POST'])
-def send_notification():
-    data = request.get_json()
+@app.route('/slot/spin', methods=['POST'])
+def spin():
+    data = parse_body("spin")
     userId = data.get('userId')
+    betAmount = data.get('betAmount')
     transactionId = data.get('transactionId')
-    message = data.get('message')
     
-    # Find user in players list
-    user = next((p for p in players if p['userId'] == userId), None)
+    return run_idempotent(data, lambda: execute_spin(
+        storage.get_player(userId), storage.get_transaction(transactionId), userId, betAmount, transactionId
+    ))
+
+
+@app.route('/slot/spinMany', methods=['POST'])
+def spin_many():
+    spin_items = parse_body("spin_many")['spins']
+    
+    errors = [validation_error("spin", item) for item in spin_items]
+    # resolve users and transactions of the valid spins in one pass each
+    users = storage.get_players(None if error else item['userId'] for item, error in zip(spin_items, errors))
+    found_transactions = storage.get_transactions(None if error else item['transactionId'] for item, error in zip(spin_items, errors))
+    
+    results = []
+    for item, error, user, transaction in zip(spin_items, errors, users, found_transactions):
+        if error:
+            body, status = {"error": error}, 400
+        else:
+            body, status = execute_spin(user, transaction, item['userId'], item['betAmount'], item['transactionId'])
+        body["statusCode"] = status
+        results.append(body)
     
+    return jsonify({"results": results})
+
+
+def execute_notification(user, transaction, userId, transactionId, message):
     if user is None:
-        return jsonify({"error": "User not found"}), 404
-    
-    
-    transaction = next((t for t in transactions if t['transactionId'] == transactionId), None)
+        return {"error": "User not found"}, 404
     
     if transaction is None:
-        return jsonify({"error": "Transaction not found"}), 404
-    
+        return {"error": "Transaction not found"}, 404
     
-    import random
-    notificationId = f"notif_{random.randint(100, 999)}"
+    notificationId = notification_ids.next_id()
     
-    # Create notification record
+    # Create notification record, delivery happens on the dispatcher workers
     notification = {
         "notificationId": notificationId,
         "userId": userId,
         "transactionId": transactionId,
         "message": message,
-        "status": "SENT"
+        "status": "QUEUED",
+        "createdAt": time.time()
     }
-    notifications.append(notification)
+    # store first so the dispatcher always finds the record it updates
+    storage.add_notification(notification)
+    if not notification_dispatcher.submit(notification):
+        storage.update_notifications([notification], status="REJECTED")
+        return {"error": "Notification queue full"}, 503
+    
+    return {
+        "status": "QUEUED",
+        "notificationId": notificationId
+    }, 200
+
+
+@app.route('/notify', methods=['POST'])
+def send_notification():
+    data = parse_body("notify")
+    userId = data.get('userId')
+    transactionId = data.get('transactionId')
+    message = data.get('message')
+    
+    body, status = execute_notification(storage.get_player(userId), storage.get_transaction(transactionId), userId, transactionId, message)
+    if status == 503:
+        # backpressure: tell the client when to try again
+        return jsonify(body), status, {"Retry-After": str(NOTIFICATION_RETRY_AFTER_SECONDS)}
+    return jsonify(body), status
+
+
+@app.route('/notify/status', methods=['GET'])
+def notification_status():
+    notificationId = request.args.get('notificationId')
+    notification = storage.get_notification(notificationId)
+    if notification is None:
+        return jsonify({"error": "Notification not found"}), 404
     
     return jsonify({
-        "status": "SENT",
-        "notificationId": notificationId
+        "notificationId": notificationId,
+        "status": notification['status'],
+        "queuedAt": notification.get('queuedAt'),
+        "deliveredAt": notification.get('deliveredAt')
     })
 
 
+@app.route('/notify/metrics', methods=['GET'])
+def notification_metrics():
+    return jsonify(notification_dispatcher.metrics())
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    # casino-wide totals with the per-minute / per-hour rollups, or one player's with ?userId=
+    if WORKER_COUNT > 1 and not isinstance(game_stats, SharedGameStats):
+        # this process only saw its own share of the traffic
+        return jsonify({"error": "/stats needs CASINO_STORAGE=sqlite or shared with several workers"}), 501
+    if 'userId' not in request.args:
+        return jsonify(game_stats.summary())
+    userId = request.args.get('userId', type=int)
+    if userId is None:
+        raise ValidationError("userId must be an integer")
+    if storage.get_player(userId) is None:
+        return jsonify({"error": "User not found"}), 404
+    return jsonify(dict(game_stats.user(userId), userId=userId))
+
+
+@app.route('/game/play', methods=['POST'])
+def play():
+    # one round trip: placeBet -> spin -> payout (on WIN) -> notify
+    data = parse_body("play")
+    userId = data.get('userId')
+    betAmount = data.get('betAmount')
+    
+    user = storage.get_player(userId)
+    
+    # nothing is charged unless the bet itself succeeds
+    bet, status = execute_bet(user, userId, betAmount)
+    if status != 200:
+        return jsonify(bet), status
+    
+    transactionId = bet["transactionId"]
+    transaction = storage.get_transaction(transactionId)
+    balance = bet["newBalance"]
+    
+    spin_data, _ = execute_spin(user, transaction, userId, betAmount, transactionId)
+    
+    if spin_data["outcome"] == "WIN":
+        paid, _ = execute_payout(user, transaction, userId, transactionId, spin_data["winAmount"])
+        balance = paid["newBalance"]
+    
+    message = data.get('message') or spin_data["message"]
+    # a full notification queue must not undo a settled round
+    notification, _ = execute_notification(user, transaction, userId, transactionId, message)
+    
+    return jsonify({
+        "userId": userId,
+        "transactionId": transactionId,
+        "outcome": spin_data["outcome"],
+        "winAmount": spin_data["winAmount"],
+        "reels": spin_data["reels"],
+        "message": spin_data["message"],
+        "notificationId": notification.get("notificationId"),
+        "notificationStatus": notification.get("status", "REJECTED"),
+        "balance": balance,
+        "currency": user.currency
+    })
+
+
+@app.route('/admin/users', methods=['POST'])
+def create_user():
+    # a fresh isolated user, so parallel test runs never share a balance
+    if not ADMIN_API_ENABLED:
+        return jsonify({"error": "Not found"}), 404
+    data = parse_body("create_user") if request.get_data() else {}
+    balance = data.get('balance')
+    if balance is None:
+        balance = DEFAULT_TENANT_BALANCE
+    currency = data.get('currency') or "USD"
+
+    user = storage.add_player(tenant_ids.next_int(), balance, currency)
+    return jsonify(user.to_dict()), 201
+
+
+@app.route('/admin/reset', methods=['POST'])
+def reset_state():
+    # back to the startup state: seed users only, no transactions, spins or notifications
+    if not ADMIN_API_ENABLED:
+        return jsonify({"error": "Not found"}), 404
+    notification_dispatcher.flush(timeout=NOTIFICATION_RETRY_AFTER_SECONDS)
+    storage.reset()
+    idempotency_cache.clear()
+    game_stats.clear()
+    seed_players()
+    if wal is not None:
+        wal.snapshot(players_snapshot)
+    return jsonify({"status": "RESET", "sizes": storage.sizes()})
+
+
+@app.route('/admin/profile', methods=['POST'])
+def start_profile():
+    # sample the next N requests ({"requests": N}) or a time window ({"seconds": T})
+    if not ADMIN_API_ENABLED:
+        return jsonify({"error": "Not found"}), 404
+    data = parse_body("start_profile")
+    request_count = data.get('requests')
+    seconds = data.get('seconds')
+    interval = data.get('interval') or PROFILE_INTERVAL
+
+    if (request_count is None) == (seconds is None):
+        return jsonify({"error": "Give either requests or seconds"}), 400
+
+    try:
+        profiler.start(requests=request_count, seconds=seconds, interval=interval)
+    except RuntimeError:
+        return jsonify({"error": "Profiler already running"}), 409
+    return jsonify(profiler.report())
+
+
+@app.route('/admin/profile', methods=['GET'])
+def profile_report():
+    # ?format=collapsed returns flame-graph input instead of the per-route json summary
+    if not ADMIN_API_ENABLED:
+        return jsonify({"error": "Not found"}), 404
+    if request.args.get('format') == "collapsed":
+        return Response(profiler.collapsed(), content_type="text/plain; charset=utf-8")
+    return jsonify(profiler.report())
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000)
\ No newline at end of file
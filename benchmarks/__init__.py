@@ -0,0 +1 @@
+# Benchmarks package for Casino Game Microservices
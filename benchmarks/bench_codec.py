@@ -0,0 +1,65 @@
+# per-request CPU of request validation and of the stdlib vs orjson json codec
+# run: python -m benchmarks.bench_codec
+
+import json
+import time
+
+from schemas import VALIDATORS
+
+ITERATIONS = 100_000
+REQUESTS = 5_000
+PLAY_BODY = {"userId": 123, "betAmount": 0.01, "message": "hello"}
+PLAY_RESPONSE = {
+    "userId": 123, "transactionId": "txn_0000000000000000001", "outcome": "LOSE", "winAmount": 0,
+    "reels": ["Cherry", "Lemon", "Seven"], "message": "Better luck next time!", "notificationId": "notif_0000000000000000001",
+    "notificationStatus": "QUEUED", "balance": 149.99, "currency": "USD"
+}
+
+
+def time_per_call(fn, iterations=ITERATIONS):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def time_requests(client, requests=REQUESTS):
+    # process CPU time, so waiting on the notification workers does not count
+    start = time.process_time()
+    for _ in range(requests):
+        client.post("/payment/placeBet", json={"userId": 123, "betAmount": 0.01})
+        client.get("/user/balance?userId=123")
+    return (time.process_time() - start) / (2 * requests)
+
+
+def main():
+    validate = VALIDATORS["play"]
+    encoded = json.dumps(PLAY_BODY)
+    print(f"{'operation':<34} {'us/call':>8}")
+    print(f"{'validate /game/play body':<34} {time_per_call(lambda: validate(PLAY_BODY)) * 1e6:8.3f}")
+    print(f"{'stdlib decode request':<34} {time_per_call(lambda: json.loads(encoded)) * 1e6:8.3f}")
+    print(f"{'stdlib encode response':<34} {time_per_call(lambda: json.dumps(PLAY_RESPONSE, sort_keys=True)) * 1e6:8.3f}")
+    try:
+        import orjson
+    except ImportError:
+        print("orjson is not installed, skipping the orjson rows")
+        return
+    print(f"{'orjson decode request':<34} {time_per_call(lambda: orjson.loads(encoded)) * 1e6:8.3f}")
+    print(f"{'orjson encode response':<34} {time_per_call(lambda: orjson.dumps(PLAY_RESPONSE)) * 1e6:8.3f}")
+
+    import app as server
+    from json_codec import install_codec
+
+    server.storage.set_balance(server.storage.get_player(123), 1_000_000.00)
+    client = server.app.test_client()
+    results = {}
+    for codec in ("stdlib", "orjson"):
+        install_codec(server.app, codec)
+        time_requests(client, 200)  # warm up
+        results[codec] = time_requests(client)
+        print(f"{'in-process request, ' + codec:<34} {results[codec] * 1e6:8.1f}")
+    print(f"{'CPU saved per request':<34} {(results['stdlib'] - results['orjson']) * 1e6:8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+# one user's history page: full scan of the ledger vs the per-user secondary index
+# run: python -m benchmarks.bench_history
+
+import time
+from itertools import islice
+
+from ledger import Ledger
+
+USERS = 10_000
+PER_USER = 100
+PAGE = 50
+LOOKUPS = 200
+
+
+def build():
+    ledger = Ledger("transactionId", index_by="userId")
+    for i in range(USERS * PER_USER):
+        ledger.add({"transactionId": f"txn_{i:019d}", "userId": i % USERS, "betAmount": 1, "createdAt": float(i)})
+    return ledger
+
+
+def scan_page(ledger, userId, since, until):
+    # what a history read costs without the index
+    matches = [r for r in ledger if r["userId"] == userId and since <= r["createdAt"] < until]
+    return sorted(matches, key=lambda r: r["createdAt"], reverse=True)[:PAGE]
+
+
+def index_page(ledger, userId, since, until):
+    return [record for _, record in islice(ledger.history(userId, since, until), PAGE)]
+
+
+def time_per_call(fn, ledger, lookups):
+    start = time.perf_counter()
+    for n in range(lookups):
+        fn(ledger, n % USERS, 0.0, float(USERS * PER_USER))
+    return (time.perf_counter() - start) / lookups
+
+
+def main():
+    ledger = build()
+    assert scan_page(ledger, 7, 0.0, 1e12) == index_page(ledger, 7, 0.0, 1e12)
+    print(f"{len(ledger):,} records, {USERS:,} users, page of {PAGE}")
+    print(f"{'full scan':<14} {time_per_call(scan_page, ledger, 5) * 1e3:10.3f} ms/page")
+    print(f"{'user index':<14} {time_per_call(index_page, ledger, LOOKUPS) * 1e3:10.3f} ms/page")
+
+
+if __name__ == '__main__':
+    main()
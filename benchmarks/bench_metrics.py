@@ -0,0 +1,56 @@
+# cost of the /metrics instrumentation: raw recording calls and the per-request hook pair
+# run: python -m benchmarks.bench_metrics
+
+import time
+
+from metrics import MetricsRegistry
+
+ITERATIONS = 200_000
+REQUESTS = 20_000
+ROUTE = ("/payment/placeBet", "POST")
+
+
+def time_per_call(fn, iterations=ITERATIONS):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def time_requests(client, requests=REQUESTS):
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get("/user/balance?userId=123")
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "requests", ("route", "method", "status"))
+    histogram = registry.histogram("duration_seconds", "duration", ("route", "method"))
+    labels = ROUTE + (200,)
+
+    print(f"{'operation':<32} {'us/call':>8}")
+    print(f"{'counter.inc':<32} {time_per_call(lambda: counter.inc(1, labels)) * 1e6:8.3f}")
+    print(f"{'histogram.observe':<32} {time_per_call(lambda: histogram.observe(0.0042, ROUTE)) * 1e6:8.3f}")
+    print(f"{'render (2 series)':<32} {time_per_call(registry.render, 10_000) * 1e6:8.3f}")
+
+    # the app's two hooks as they run for a matched route, then a whole in-process request for scale
+    import app as server
+
+    response = server.app.response_class("{}", status=200)
+    with server.app.test_request_context("/payment/placeBet", method="POST"):
+        server.request.url_rule = next(server.app.url_map.iter_rules("place_bet"))
+
+        def hooks():
+            server.start_request_timer()
+            server.record_request_metrics(response)
+
+        hook_cost = time_per_call(hooks)
+
+    print(f"{'before + after request hooks':<32} {hook_cost * 1e6:8.3f}")
+    print(f"{'whole GET /user/balance':<32} {time_requests(server.app.test_client()) * 1e6:8.1f}")
+
+
+if __name__ == '__main__':
+    main()
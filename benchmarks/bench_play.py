@@ -0,0 +1,61 @@
+# end-to-end latency: five-call game flow vs the single /game/play call
+# needs a running server (API_BASE_URL), run: python -m benchmarks.bench_play
+
+import statistics
+import time
+
+from tests.api_client import UserService, PaymentService, GameService, NotificationService
+
+USER_ID = 123
+BET_AMOUNT = 0.01
+ROUNDS = 500
+TOP_UP_BALANCE = 1_000_000.00
+
+user_service = UserService()
+payment_service = PaymentService()
+game_service = GameService()
+notification_service = NotificationService()
+
+
+def five_call_round():
+    user_service.get_balance(USER_ID)
+    transactionId = payment_service.place_bet(USER_ID, BET_AMOUNT).json()["transactionId"]
+    spin_data = game_service.spin(USER_ID, BET_AMOUNT, transactionId).json()
+    if spin_data["outcome"] == "WIN":
+        payment_service.payout(USER_ID, transactionId, spin_data["winAmount"])
+    notification_service.send_notification(USER_ID, transactionId, spin_data["message"])
+
+
+def single_call_round():
+    game_service.play(USER_ID, BET_AMOUNT)
+
+
+def measure(round_fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        round_fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p95": samples[int(len(samples) * 0.95) - 1],
+        "p99": samples[int(len(samples) * 0.99) - 1]
+    }
+
+
+def main():
+    original_balance = user_service.get_balance(USER_ID).json()["balance"]
+    user_service.update_balance(USER_ID, TOP_UP_BALANCE)
+    try:
+        print(f"{'flow':<14} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name, round_fn in [("five calls", five_call_round), ("/game/play", single_call_round)]:
+            stats = measure(round_fn, ROUNDS)
+            print(f"{name:<14} {stats['mean']:9.3f} {stats['p50']:9.3f} {stats['p95']:9.3f} {stats['p99']:9.3f}")
+    finally:
+        user_service.update_balance(USER_ID, original_balance)
+
+
+if __name__ == '__main__':
+    main()
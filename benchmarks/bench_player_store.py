@@ -0,0 +1,55 @@
+# lookup latency of the player store from 1 player up to 1M players
+# run: python -m benchmarks.bench_player_store
+
+import random
+import time
+
+from player_store import PlayerStore
+
+SIZES = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+LOOKUPS = 200_000
+# the old list scan gets too slow to measure past this size
+LINEAR_SCAN_LIMIT = 10_000
+
+
+def build_store(size):
+    store = PlayerStore()
+    for userId in range(size):
+        store.add(userId, 150.00)
+    return store
+
+
+def time_store_lookups(store, ids):
+    get = store.get
+    start = time.perf_counter()
+    for userId in ids:
+        get(userId)
+    return (time.perf_counter() - start) / len(ids)
+
+
+def time_linear_lookups(players, ids):
+    start = time.perf_counter()
+    for userId in ids:
+        next((p for p in players if p['userId'] == userId), None)
+    return (time.perf_counter() - start) / len(ids)
+
+
+def main():
+    print(f"{'players':>10} {'store ns/lookup':>16} {'list scan ns/lookup':>20}")
+    for size in SIZES:
+        store = build_store(size)
+        ids = [random.randrange(size) for _ in range(LOOKUPS)]
+        store_ns = time_store_lookups(store, ids) * 1e9
+
+        if size <= LINEAR_SCAN_LIMIT:
+            players = [p.to_dict() for p in store]
+            linear_ns = time_linear_lookups(players, ids[:max(1, LOOKUPS // size)]) * 1e9
+            linear = f"{linear_ns:20.0f}"
+        else:
+            linear = f"{'-':>20}"
+
+        print(f"{size:>10} {store_ns:16.0f} {linear}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+# spin outcome throughput: per-spin random.choice vs the pooled rng in every mode
+# run: python -m benchmarks.bench_rng
+
+import random
+import threading
+import time
+
+from slot_machine import REELS, REEL_COUNT
+from spin_rng import MODES, SpinRng, np
+
+SPINS = 300_000
+THREADS = 8
+
+
+def spins_per_second(spin, spins=SPINS):
+    start = time.perf_counter()
+    for n in range(spins):
+        spin(n)
+    return spins / (time.perf_counter() - start)
+
+
+def threaded_spins_per_second(spin, threads=THREADS, spins=SPINS):
+    per_thread = spins // threads
+    workers = [threading.Thread(target=lambda: [spin(n) for n in range(per_thread)]) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    cases = [("random.choice x3 (old)", lambda n: [random.choice(REELS) for _ in range(REEL_COUNT)])]
+    for mode in MODES:
+        if mode == "numpy" and np is None:
+            continue
+        unseeded = SpinRng(mode=mode)
+        cases.append((f"{mode}", lambda n, rng=unseeded: rng.spin(n)))
+        if mode != "crypto":
+            seeded = SpinRng(mode=mode, seed=1)
+            per_user = SpinRng(mode=mode, seed=1, per_user=True)
+            cases.append((f"{mode} seeded", lambda n, rng=seeded: rng.spin(n)))
+            cases.append((f"{mode} seeded per user (1000)", lambda n, rng=per_user: rng.spin(n % 1000)))
+
+    print(f"{'rng':<32} {'spins/s':>12} {f'{THREADS} threads':>12}")
+    for name, spin in cases:
+        print(f"{name:<32} {spins_per_second(spin):12,.0f} {threaded_spins_per_second(spin):12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# game-round throughput of the in-memory and sqlite storage backends
+# run: python -m benchmarks.bench_storage
+
+import os
+import tempfile
+import threading
+import time
+
+from ledger import IdGenerator
+from storage import InMemoryStorage
+from sqlite_storage import SQLiteStorage
+
+USERS = 1_000
+ROUNDS_PER_THREAD = 2_000
+THREAD_COUNTS = [1, 4, 8]
+
+
+def play_rounds(storage, ids, rounds, offset):
+    # bet, spin outcome, payout: the same storage calls a /game/play request makes
+    for n in range(rounds):
+        user = storage.get_player((offset + n) % USERS)
+        storage.debit_if_sufficient(user, 1.00)
+        transactionId = ids.next_id()
+        transaction = storage.add_transaction({
+            "transactionId": transactionId, "userId": user.userId, "betAmount": 1.00, "createdAt": time.time()
+        })
+        storage.update_transaction(transaction, outcome="WIN")
+        storage.credit(user, 3.00)
+        storage.update_transaction(transaction, winAmount=3.00, payoutStatus="PAID")
+
+
+def measure(storage, threads):
+    for userId in range(USERS):
+        storage.add_player(userId, 1_000_000.00)
+    ids = IdGenerator("txn")
+    workers = [threading.Thread(target=play_rounds, args=(storage, ids, ROUNDS_PER_THREAD, i * 7919)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * ROUNDS_PER_THREAD / (time.perf_counter() - start)
+
+
+def main():
+    print(f"{'backend':<8} {'threads':>8} {'rounds/s':>12}")
+    for threads in THREAD_COUNTS:
+        print(f"{'memory':<8} {threads:>8} {measure(InMemoryStorage(), threads):12.0f}")
+        with tempfile.TemporaryDirectory() as directory:
+            storage = SQLiteStorage(os.path.join(directory, "bench.db"), pool_size=threads)
+            print(f"{'sqlite':<8} {threads:>8} {measure(storage, threads):12.0f}")
+            storage.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# requests per second of serve.py as worker processes are added
+# run: python -m benchmarks.bench_workers
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+PORT = 8765
+WORKER_COUNTS = [1, 2, 4]
+CLIENT_PROCESSES = 8
+DURATION_SECONDS = 5.0
+USER_ID = 123
+
+
+def client(base_url, deadline, results):
+    # alternate a balance read and a small bet, the two hottest calls of a game round
+    session = requests.Session()
+    done = 0
+    while time.time() < deadline:
+        session.get(f"{base_url}/user/balance", params={"userId": USER_ID})
+        session.post(f"{base_url}/payment/placeBet", json={"userId": USER_ID, "betAmount": 0.01})
+        done += 2
+    results.put(done)
+
+
+def wait_until_ready(base_url, timeout=15.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(f"{base_url}/user/balance", params={"userId": USER_ID}, timeout=1)
+            return
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def measure(workers):
+    base_url = f"http://127.0.0.1:{PORT}"
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ,
+                   CASINO_STORAGE="shared",
+                   CASINO_SQLITE_PATH=os.path.join(directory, "casino.db"),
+                   CASINO_SHM_PATH=os.path.join(directory, "ledger"))
+        server = subprocess.Popen(
+            [sys.executable, "serve.py", "--workers", str(workers), "--port", str(PORT), "--host", "127.0.0.1"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_until_ready(base_url)
+            requests.post(f"{base_url}/user/update-balance", json={"userId": USER_ID, "newBalance": 1_000_000.00})
+
+            results = multiprocessing.Queue()
+            deadline = time.time() + DURATION_SECONDS
+            clients = [multiprocessing.Process(target=client, args=(base_url, deadline, results)) for _ in range(CLIENT_PROCESSES)]
+            for process in clients:
+                process.start()
+            total = sum(results.get() for _ in clients)
+            for process in clients:
+                process.join()
+            return total / DURATION_SECONDS
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in WORKER_COUNTS:
+        rps = measure(workers)
+        baseline = baseline or rps
+        print(f"{workers:>8} {rps:10.0f} {rps / baseline:8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+# load test - drives every endpoint (and the full game flow) at a fixed rate and reports
+# latency percentiles, throughput and error rate as json + html, optionally against a baseline
+#
+# run:  python -m benchmarks.load_test --rate 200 --duration 10
+#       python -m benchmarks.load_test --spawn-server --workload many_users --users 1000
+#       python -m benchmarks.load_test --save-baseline           (store reports/benchmark_baseline.json)
+#       python -m benchmarks.load_test --baseline reports/benchmark_baseline.json
+
+import argparse
+import html
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from tests.api_client import API_BASE_URL, create_session, latency_summary
+
+SCENARIOS = ["balance", "update_balance", "place_bet", "spin", "payout", "notify", "play", "game_flow"]
+WORKLOADS = ["hot_user", "many_users"]
+HOT_USER_ID = 123
+BET_AMOUNT = 0.01
+TOP_UP_BALANCE = 1_000_000.00
+REPORT_DIR = "reports"
+DEFAULT_BASELINE = os.path.join(REPORT_DIR, "benchmark_baseline.json")
+
+
+class Target:
+    # thread-local keep-alive sessions against one server, plus the fixtures each scenario needs
+    def __init__(self, base_url, user_ids, concurrency):
+        self.base_url = base_url
+        self.user_ids = user_ids
+        self.concurrency = concurrency
+        self._local = threading.local()
+        self._next = 0
+        self._next_lock = threading.Lock()
+        self.transactions = {}
+
+    @property
+    def session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = create_session(pool_size=1, max_retries=0)
+        return self._local.session
+
+    def user(self):
+        with self._next_lock:
+            self._next += 1
+            return self.user_ids[self._next % len(self.user_ids)]
+
+    def post(self, endpoint, payload):
+        return self.session.post(f"{self.base_url}{endpoint}", json=payload, timeout=30)
+
+    def get(self, endpoint, params):
+        return self.session.get(f"{self.base_url}{endpoint}", params=params, timeout=30)
+
+    def prepare(self):
+        # top every user up and give each one open transaction for spin / payout / notify
+        for user_id in self.user_ids:
+            self.post("/user/update-balance", {"userId": user_id, "newBalance": TOP_UP_BALANCE})
+            bet = self.post("/payment/placeBet", {"userId": user_id, "betAmount": BET_AMOUNT})
+            if bet.status_code != 200:
+                raise RuntimeError(f"could not prepare user {user_id}: {bet.status_code} {bet.text}")
+            self.transactions[user_id] = bet.json()["transactionId"]
+
+
+def run_operation(target, scenario):
+    """One unit of work, returns True when every call in it succeeded"""
+    user_id = target.user()
+    if scenario == "balance":
+        return target.get("/user/balance", {"userId": user_id}).ok
+    if scenario == "update_balance":
+        return target.post("/user/update-balance", {"userId": user_id, "newBalance": TOP_UP_BALANCE}).ok
+    if scenario == "place_bet":
+        return target.post("/payment/placeBet", {"userId": user_id, "betAmount": BET_AMOUNT}).ok
+    if scenario == "spin":
+        transaction_id = target.transactions[user_id]
+        return target.post("/slot/spin", {"userId": user_id, "betAmount": BET_AMOUNT, "transactionId": transaction_id}).ok
+    if scenario == "payout":
+        transaction_id = target.transactions[user_id]
+        return target.post("/payment/payout", {"userId": user_id, "transactionId": transaction_id, "winAmount": BET_AMOUNT}).ok
+    if scenario == "notify":
+        transaction_id = target.transactions[user_id]
+        return target.post("/notify", {"userId": user_id, "transactionId": transaction_id, "message": "load test"}).ok
+    if scenario == "play":
+        return target.post("/game/play", {"userId": user_id, "betAmount": BET_AMOUNT}).ok
+    if scenario == "game_flow":
+        # the five-call flow from test_complete_end_to_end_game_flow
+        if not target.get("/user/balance", {"userId": user_id}).ok:
+            return False
+        bet = target.post("/payment/placeBet", {"userId": user_id, "betAmount": BET_AMOUNT})
+        if not bet.ok:
+            return False
+        transaction_id = bet.json()["transactionId"]
+        spin = target.post("/slot/spin", {"userId": user_id, "betAmount": BET_AMOUNT, "transactionId": transaction_id})
+        if not spin.ok:
+            return False
+        spin_data = spin.json()
+        if spin_data["outcome"] == "WIN":
+            payout = target.post("/payment/payout", {"userId": user_id, "transactionId": transaction_id, "winAmount": spin_data["winAmount"]})
+            if not payout.ok:
+                return False
+        return target.post("/notify", {"userId": user_id, "transactionId": transaction_id, "message": spin_data["message"]}).ok
+    raise ValueError(f"unknown scenario {scenario}")
+
+
+def run_scenario(target, scenario, rate, duration):
+    """Open loop at `rate` ops/s (or closed loop with rate 0) for `duration` seconds
+
+    In open-loop mode latency is measured from the time an operation was
+    scheduled, not from when a worker picked it up, so an overloaded server
+    shows up as growing latency instead of silently lowering the offered load.
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def execute(scheduled):
+        try:
+            ok = run_operation(target, scenario)
+        except requests.exceptions.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors[0] += 1
+
+    start = time.perf_counter()
+    end = start + duration
+    with ThreadPoolExecutor(max_workers=target.concurrency) as pool:
+        if rate > 0:
+            interval = 1.0 / rate
+            n = 0
+            while True:
+                scheduled = start + n * interval
+                if scheduled >= end:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(execute, scheduled)
+                n += 1
+        else:
+            def closed_loop():
+                while time.perf_counter() < end:
+                    execute(time.perf_counter())
+
+            for _ in range(target.concurrency):
+                pool.submit(closed_loop)
+    elapsed = time.perf_counter() - start
+
+    summary = latency_summary(latencies)
+    count = summary.pop("count")
+    return {
+        "requests": count,
+        "errors": errors[0],
+        "errorRate": errors[0] / count if count else 0.0,
+        "throughput": count / elapsed if elapsed else 0.0,
+        "latencyMs": {name: value * 1000 for name, value in summary.items()}
+    }
+
+
+def compare(current, baseline, threshold):
+    """Regressions of current vs baseline: p95/p99 or error rate up, throughput down by more than threshold"""
+    regressions = []
+    for scenario, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(scenario)
+        if not base or not result["requests"] or not base["requests"]:
+            continue
+        for percentile in ("p95", "p99"):
+            now, before = result["latencyMs"][percentile], base["latencyMs"][percentile]
+            if before and now > before * (1 + threshold):
+                regressions.append({"scenario": scenario, "metric": f"latency {percentile}", "baseline": before, "current": now})
+        if result["throughput"] < base["throughput"] * (1 - threshold):
+            regressions.append({"scenario": scenario, "metric": "throughput", "baseline": base["throughput"], "current": result["throughput"]})
+        if result["errorRate"] > base["errorRate"] + threshold / 10:
+            regressions.append({"scenario": scenario, "metric": "error rate", "baseline": base["errorRate"], "current": result["errorRate"]})
+    return regressions
+
+
+def render_html(report):
+    regressed = {(r["scenario"]) for r in report.get("regressions", [])}
+    rows = []
+    for scenario, result in report["scenarios"].items():
+        latency = result["latencyMs"]
+        style = ' style="background:#fdd"' if scenario in regressed else ""
+        rows.append(
+            f"<tr{style}><td>{html.escape(scenario)}</td><td>{result['requests']}</td>"
+            f"<td>{result['throughput']:.1f}</td><td>{result['errorRate']:.2%}</td>"
+            + "".join(f"<td>{latency.get(p, 0):.2f}</td>" for p in ("p50", "p95", "p99", "max"))
+            + "</tr>"
+        )
+    regression_items = "".join(
+        f"<li>{html.escape(r['scenario'])}: {html.escape(r['metric'])} {r['baseline']:.2f} &rarr; {r['current']:.2f}</li>"
+        for r in report.get("regressions", [])
+    )
+    config = html.escape(json.dumps(report["config"]))
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Casino benchmark</title>
+<style>body{{font-family:sans-serif}} table{{border-collapse:collapse}} td,th{{border:1px solid #999;padding:4px 8px;text-align:right}}</style>
+</head><body>
+<h1>Casino benchmark</h1>
+<p>{html.escape(report["startedAt"])} &mdash; <code>{config}</code></p>
+<table>
+<tr><th>scenario</th><th>requests</th><th>req/s</th><th>errors</th><th>p50 ms</th><th>p95 ms</th><th>p99 ms</th><th>max ms</th></tr>
+{"".join(rows)}
+</table>
+{"<h2>Regressions</h2><ul>" + regression_items + "</ul>" if regression_items else ""}
+</body></html>
+"""
+
+
+def spawn_server(port, users):
+    env = dict(os.environ, CASINO_SEED_USERS=str(users), CASINO_ADMIN_API="1")
+    server = subprocess.Popen(
+        [sys.executable, "-c", f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            requests.get(f"{base_url}/user/balance", params={"userId": HOT_USER_ID}, timeout=1)
+            return server, base_url
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the casino API")
+    parser.add_argument("--base-url", default=API_BASE_URL)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated: " + ", ".join(SCENARIOS))
+    parser.add_argument("--workload", choices=WORKLOADS, default="hot_user")
+    parser.add_argument("--users", type=int, default=1000, help="users for the many_users workload (ids 1..N)")
+    parser.add_argument("--rate", type=float, default=200, help="operations per second, 0 = as fast as possible")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--output", default=os.path.join(REPORT_DIR, "benchmark"), help="report path without extension")
+    parser.add_argument("--baseline", help="compare against this saved report")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="also save this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression")
+    parser.add_argument("--spawn-server", action="store_true", help="start app.py with seeded users for this run")
+    parser.add_argument("--port", type=int, default=8766, help="port for --spawn-server")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if args.spawn_server:
+        server, base_url = spawn_server(args.port, args.users if args.workload == "many_users" else 0)
+
+    try:
+        user_ids = [HOT_USER_ID] if args.workload == "hot_user" else list(range(1, args.users + 1))
+        target = Target(base_url, user_ids, args.concurrency)
+        target.prepare()
+
+        report = {
+            "startedAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {
+                "baseUrl": base_url, "workload": args.workload, "users": len(user_ids),
+                "rate": args.rate, "duration": args.duration, "concurrency": args.concurrency
+            },
+            "scenarios": {}
+        }
+        for scenario in args.scenarios.split(","):
+            result = run_scenario(target, scenario, args.rate, args.duration)
+            report["scenarios"][scenario] = result
+            latency = result["latencyMs"]
+            print(f"{scenario:<15} {result['throughput']:9.1f} req/s  errors {result['errorRate']:6.2%}  "
+                  f"p50 {latency.get('p50', 0):8.2f}  p95 {latency.get('p95', 0):8.2f}  p99 {latency.get('p99', 0):8.2f} ms")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            report["regressions"] = compare(report, json.load(baseline_file), args.threshold)
+        for regression in report["regressions"]:
+            print(f"REGRESSION {regression['scenario']}: {regression['metric']} {regression['baseline']:.2f} -> {regression['current']:.2f}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output + ".json", "w", encoding="utf-8") as json_file:
+        json.dump(report, json_file, indent=2)
+    with open(args.output + ".html", "w", encoding="utf-8") as html_file:
+        html_file.write(render_html(report))
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+# game statistics - running totals per player and globally, plus per-minute / per-hour ring buffers
+
+import threading
+import time
+
+from player_store import StripedLock
+
+# (name, bucket width in seconds, buckets kept)
+DEFAULT_ROLLUPS = (("minute", 60, 60), ("hour", 3600, 24))
+
+
+class Totals:
+    """Running sums of one player, one bucket or the whole casino
+
+    netPosition is wagered minus paid, the house's side: positive while the
+    house is ahead. hitRate is winning spins per spin and rtp is paid per
+    wagered, both None until there is something to divide by.
+    """
+    __slots__ = ("bets", "wagered", "spins", "wins", "payouts", "paid")
+
+    def __init__(self):
+        self.bets = 0
+        self.wagered = 0.0
+        self.spins = 0
+        self.wins = 0
+        self.payouts = 0
+        self.paid = 0.0
+
+    @classmethod
+    def from_values(cls, values):
+        totals = cls()
+        totals.bets, totals.wagered, totals.spins, totals.wins, totals.payouts, totals.paid = values
+        return totals
+
+    def values(self):
+        return (self.bets, self.wagered, self.spins, self.wins, self.payouts, self.paid)
+
+    def to_dict(self):
+        return {
+            "bets": self.bets,
+            "spins": self.spins,
+            "wins": self.wins,
+            "payouts": self.payouts,
+            "totalWagered": round(self.wagered, 2),
+            "totalPaid": round(self.paid, 2),
+            "netPosition": round(self.wagered - self.paid, 2),
+            "hitRate": self.wins / self.spins if self.spins else None,
+            "rtp": self.paid / self.wagered if self.wagered else None
+        }
+
+
+class RingRollup:
+    """Totals per fixed-width time bucket, the last `size` buckets in a ring
+
+    A bucket's slot is reused once the ring comes round to it again, so
+    memory is fixed and a write never has to expire anything but its own slot.
+    """
+
+    def __init__(self, width, size):
+        self.width = width
+        self.size = size
+        self._starts = [None] * size
+        self._totals = [Totals() for _ in range(size)]
+
+    def bucket(self, now):
+        """Totals of the bucket holding now, recycling its slot when it is stale"""
+        number = int(now // self.width)
+        slot = number % self.size
+        if self._starts[slot] != number:
+            self._starts[slot] = number
+            self._totals[slot] = Totals()
+        return self._totals[slot]
+
+    def to_list(self, now):
+        # oldest first, buckets without traffic are left out
+        newest = int(now // self.width)
+        buckets = []
+        for number in range(newest - self.size + 1, newest + 1):
+            slot = number % self.size
+            if self._starts[slot] == number:
+                buckets.append(dict(self._totals[slot].to_dict(), start=number * self.width))
+        return buckets
+
+
+class GameStats:
+    """Totals updated by every bet, spin and payout in O(1)
+
+    Each event adds to its player's Totals (under the player's lock stripe),
+    the global Totals and the current bucket of every rollup (under one
+    short global lock). Reads never scan records, so /stats costs the same
+    however much has been played.
+    """
+
+    def __init__(self, rollups=DEFAULT_ROLLUPS, clock=time.time, lock_stripes=64):
+        self.clock = clock
+        self._users = {}
+        self._user_locks = StripedLock(lock_stripes)
+        self._totals = Totals()
+        self._rollups = {name: RingRollup(width, size) for name, width, size in rollups}
+        self._lock = threading.Lock()
+
+    def _record(self, userId, update):
+        totals = self._users.get(userId)
+        if totals is None:
+            totals = self._users.setdefault(userId, Totals())
+        with self._user_locks.for_key(userId):
+            update(totals)
+        now = self.clock()
+        with self._lock:
+            update(self._totals)
+            for rollup in self._rollups.values():
+                update(rollup.bucket(now))
+
+    def record_bet(self, userId, amount):
+        def update(totals):
+            totals.bets += 1
+            totals.wagered += amount
+        self._record(userId, update)
+
+    def record_spin(self, userId, won):
+        def update(totals):
+            totals.spins += 1
+            totals.wins += won
+        self._record(userId, update)
+
+    def record_payout(self, userId, amount):
+        def update(totals):
+            totals.payouts += 1
+            totals.paid += amount
+        self._record(userId, update)
+
+    def user(self, userId):
+        """Totals dict of one player, all zero when they have not played"""
+        totals = self._users.get(userId)
+        return (totals or Totals()).to_dict()
+
+    def summary(self):
+        now = self.clock()
+        with self._lock:
+            summary = self._totals.to_dict()
+            summary["players"] = len(self._users)
+            summary["rollups"] = {name: rollup.to_list(now) for name, rollup in self._rollups.items()}
+        return summary
+
+    def clear(self):
+        with self._lock:
+            self._users = {}
+            self._totals = Totals()
+            self._rollups = {name: RingRollup(r.width, r.size) for name, r in self._rollups.items()}
+
+    def __len__(self):
+        return len(self._users)
+
+
+class SharedGameStats(GameStats):
+    """GameStats kept in the database every worker process writes to
+
+    store is a SQLiteStorage. An event is one short transaction of upserts
+    on its player's row, the casino row and the current bucket of every
+    rollup, so /stats on any serve.py worker answers for all of them. Reads
+    are primary key lookups and never scan records either.
+    """
+
+    def __init__(self, store, rollups=DEFAULT_ROLLUPS, clock=time.time):
+        self.store = store
+        self.clock = clock
+        self._rollups = tuple(rollups)
+
+    def _record(self, userId, update):
+        change = Totals()
+        update(change)
+        now = self.clock()
+        buckets = [(name, int(now // width), size) for name, width, size in self._rollups]
+        self.store.add_game_stats(userId, change.values(), buckets)
+
+    def user(self, userId):
+        row = self.store.get_game_stats(userId)
+        return (Totals.from_values(row[:6]) if row else Totals()).to_dict()
+
+    def summary(self):
+        now = self.clock()
+        row = self.store.get_game_stats()
+        summary = (Totals.from_values(row[:6]) if row else Totals()).to_dict()
+        summary["players"] = row[6] if row else 0
+        summary["rollups"] = {}
+        for name, width, size in self._rollups:
+            newest = int(now // width)
+            summary["rollups"][name] = [
+                dict(Totals.from_values(values).to_dict(), start=number * width)
+                for number, *values in self.store.game_stats_buckets(name, newest - size + 1, newest)
+            ]
+        return summary
+
+    def clear(self):
+        self.store.clear_game_stats()
+
+    def __len__(self):
+        row = self.store.get_game_stats()
+        return row[6] if row else 0
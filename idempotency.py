@@ -0,0 +1,183 @@
+# idempotency keys - first response per key kept in a bounded LRU / TTL cache and replayed on retries
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_KEYS = 100_000
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_WAIT_SECONDS = 30
+DEFAULT_POLL_SECONDS = 0.01
+PURGE_EVERY = 1000  # shared claims between two sweeps of expired keys
+
+# run() outcomes, also the labels of the hit / miss metrics
+MISS = "miss"
+HIT = "hit"
+IN_FLIGHT = "inflight"
+CONFLICT = "conflict"
+TIMEOUT = "timeout"
+
+CONFLICT_RESPONSE = ({"error": "Idempotency-Key was already used for a different request"}, 422)
+TIMEOUT_RESPONSE = ({"error": "A request with this Idempotency-Key is still in progress"}, 409)
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "done", "result", "expires")
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result = None
+        self.expires = None
+
+
+class IdempotencyCache:
+    """(body, status) of the first request per idempotency key
+
+    The first request with a key runs the operation; every later request
+    with the same key gets the stored response without running it again.
+    Duplicates that arrive while the first one is still running wait for
+    its result instead of running in parallel. Entries live for ttl seconds
+    after they complete and the least recently used ones are evicted beyond
+    max_keys. Server errors (5xx) are not stored so the client can retry.
+    """
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 wait_seconds=DEFAULT_WAIT_SECONDS, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        self.wait_seconds = wait_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {MISS: 0, HIT: 0, IN_FLIGHT: 0, CONFLICT: 0, TIMEOUT: 0, "evicted": 0}
+
+    def run(self, key, fingerprint, execute):
+        """(outcome, (body, status)), execute() only runs for a key seen for the first time"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires is not None and entry.expires <= self.clock():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                entry = self._entries[key] = _Entry(fingerprint)
+                self._evict()
+                outcome = MISS
+            elif entry.fingerprint != fingerprint:
+                outcome = CONFLICT
+            else:
+                self._entries.move_to_end(key)
+                outcome = HIT if entry.done.is_set() else IN_FLIGHT
+            if outcome != MISS:
+                self.stats[outcome] += 1
+
+        if outcome == CONFLICT:
+            return outcome, CONFLICT_RESPONSE
+        if outcome == MISS:
+            return self._execute(key, entry, execute)
+        if not entry.done.wait(self.wait_seconds):
+            with self._lock:
+                self.stats[TIMEOUT] += 1
+            return TIMEOUT, TIMEOUT_RESPONSE
+        if entry.result is None:
+            # the first request failed without a response, run this one as a fresh attempt
+            return self.run(key, fingerprint, execute)
+        return outcome, entry.result
+
+    def _execute(self, key, entry, execute):
+        outcome, result = MISS, None
+        try:
+            outcome, result = self._first_run(key, entry.fingerprint, execute)
+        finally:
+            with self._lock:
+                self.stats[outcome] += 1
+                if result is None or outcome not in (MISS, HIT) or result[1] >= 500:
+                    # nothing worth replaying, let a retry run the operation again
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                else:
+                    entry.result = result
+                    entry.expires = self.clock() + self.ttl_seconds
+            entry.done.set()
+        return outcome, result
+
+    def _first_run(self, key, fingerprint, execute):
+        """(outcome, result) of the first request with key this process has seen"""
+        return MISS, execute()
+
+    def _evict(self):
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedIdempotencyCache(IdempotencyCache):
+    """IdempotencyCache whose keys are claimed in storage every worker process shares
+
+    store is a SQLiteStorage. The first request with a key claims it with
+    one insert (which only replaces an expired row) and stores its response
+    in that row, so a retry that lands on another serve.py worker is
+    replayed instead of charged again; a duplicate whose key another
+    process still holds polls the row until the response is there. A claim
+    is a lease of wait_seconds, a worker that dies mid-request only blocks
+    its key that long. The in-process cache stays in front, so repeats
+    within one process and duplicates racing on its threads never reach
+    the database. Expiry uses the wall clock, the one clock the processes
+    share.
+    """
+
+    def __init__(self, store, poll_seconds=DEFAULT_POLL_SECONDS, clock=time.time, **kwargs):
+        super().__init__(clock=clock, **kwargs)
+        self.store = store
+        self.poll_seconds = poll_seconds
+        self._claims = 0
+
+    def _first_run(self, key, fingerprint, execute):
+        shared_key = json.dumps(key)
+        deadline = self.clock() + self.wait_seconds
+        while True:
+            now = self.clock()
+            claimed, row = self.store.claim_idempotency_key(shared_key, fingerprint, now, now + self.wait_seconds)
+            if claimed:
+                self._purge(now)
+                return MISS, self._run_claimed(shared_key, execute)
+            if row is None:
+                continue  # expired and removed since the claim, try again
+            stored_fingerprint, status, body = row
+            if stored_fingerprint != fingerprint:
+                return CONFLICT, CONFLICT_RESPONSE
+            if status is not None:
+                return HIT, (body, status)
+            if now >= deadline:
+                return TIMEOUT, TIMEOUT_RESPONSE
+            time.sleep(self.poll_seconds)
+
+    def _run_claimed(self, shared_key, execute):
+        result = None
+        try:
+            result = execute()
+        finally:
+            if result is None or result[1] >= 500:
+                self.store.release_idempotency_key(shared_key)
+            else:
+                self.store.store_idempotency_result(shared_key, result[0], result[1], self.clock() + self.ttl_seconds)
+        return result
+
+    def _purge(self, now):
+        with self._lock:
+            self._claims += 1
+            due = self._claims % PURGE_EVERY == 0
+        if due:
+            self.store.purge_idempotency_keys(now)
+
+    def clear(self):
+        super().clear()
+        self.store.clear_idempotency_keys()
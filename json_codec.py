@@ -0,0 +1,48 @@
+# json codec - orjson behind flask's json provider when it is installed, the stdlib otherwise
+
+import os
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+CODECS = ("auto", "orjson", "stdlib")
+
+
+class OrjsonProvider(JSONProvider):
+    """request.get_json() and jsonify() through orjson
+
+    Responses are built straight from the encoded bytes, skipping the
+    str round trip and the key sorting of flask's default provider.
+    """
+
+    OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=self.OPTIONS), mimetype="application/json")
+
+
+def install_codec(app, codec=None):
+    """Select the json codec of app from CASINO_JSON_CODEC, returns the one in use"""
+    codec = codec or os.getenv("CASINO_JSON_CODEC", "auto")
+    if codec not in CODECS:
+        raise ValueError(f"unknown CASINO_JSON_CODEC {codec!r}, expected one of {CODECS}")
+    if codec == "auto":
+        codec = "orjson" if orjson is not None else "stdlib"
+    if codec == "orjson":
+        if orjson is None:
+            raise RuntimeError("CASINO_JSON_CODEC=orjson needs the orjson package")
+        app.json = OrjsonProvider(app)
+    else:
+        app.json = app.json_provider_class(app)
+    return codec
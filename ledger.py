@@ -0,0 +1,295 @@
+# transaction ledger - unique sortable ids plus an index keyed by record id
+
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+
+# custom epoch (2024-01-01 UTC) keeps the 41 bit millisecond field good until 2093
+EPOCH_MS = 1704067200000
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+HISTORY_CHUNK = 256
+
+
+class IdGenerator:
+    """Snowflake style ids: milliseconds | worker id | per-millisecond sequence
+
+    Ids are unique per worker, strictly increasing and zero padded so the
+    string form sorts the same way as the numeric form.
+    """
+
+    def __init__(self, prefix, worker_id=None):
+        if worker_id is None:
+            worker_id = int(os.getenv("CASINO_WORKER_ID", "0"))
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}")
+        self.prefix = prefix
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_int(self):
+        with self._lock:
+            now_ms = int(time.time() * 1000) - EPOCH_MS
+            # never step backwards if the wall clock does
+            if now_ms <= self._last_ms:
+                now_ms = self._last_ms
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # sequence exhausted for this millisecond, borrow the next one
+                    now_ms += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            return (now_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+    def next_id(self):
+        return f"{self.prefix}_{self.next_int():019d}"
+
+
+class Ledger:
+    """Append-only record store with an O(1) index on the record id field
+
+    With a retention policy, settled records beyond the policy limits are
+    evicted to the archive and get() falls back to the (slower) archive
+    lookup for them. Records the is_settled predicate rejects stay in memory:
+    a pass that meets one moves it to a side dict, so later passes start at
+    the first record they have not seen instead of rescanning it, and only
+    re-check the side dict. After a pass the next one waits until the ledger
+    has grown by another eviction batch (or by the number of pinned records,
+    if that is larger), so pinned records can't make every add() rescan.
+    The archive write itself runs after the lock is released; until it
+    returns, evicted records are still served from memory.
+
+    With index_by, records are also indexed by that field (e.g. userId):
+    each value keeps a sorted list of (createdAt, record id) keys, so
+    history() reads one value's records in a time range without a scan.
+    The index only covers records still in memory.
+    """
+
+    def __init__(self, key, policy=None, archive=None, is_settled=None, index_by=None):
+        self.key = key
+        self.policy = policy
+        self.archive = archive
+        self.is_settled = is_settled or (lambda record: True)
+        self.index_by = index_by
+        self._by_id = {}
+        self._pinned = {}  # unsettled records a retention pass already passed over, oldest first
+        self._archiving = {}  # evicted records whose archive write has not finished yet
+        self._index = {}
+        self._lock = threading.Lock()
+        self._next_age_check = 0.0
+        self._next_size_check = 0
+
+    def add(self, record):
+        evicted = None
+        with self._lock:
+            record_id = record[self.key]
+            self._by_id[record_id] = record
+            if self.index_by is not None:
+                self._index_record(record_id, record)
+            if self.policy is not None:
+                evicted = self._enforce_retention()
+        if evicted:
+            self._archive(evicted)
+        return record
+
+    def _index_record(self, record_id, record):
+        try:
+            keys = self._index.setdefault(record[self.index_by], [])
+        except (KeyError, TypeError):
+            return  # no usable index value, the record is only reachable by id
+        entry = (record.get("createdAt") or 0.0, record_id)
+        if not keys or keys[-1] < entry:
+            keys.append(entry)
+        else:
+            insort(keys, entry)
+
+    def history(self, value, since=None, until=None, before=None, chunk_size=HISTORY_CHUNK):
+        """Yield (key, record) for the records indexed under value, newest first
+
+        key is (createdAt, record id). since is inclusive, until exclusive,
+        and before is a key from an earlier call to resume after. Keys are
+        copied chunk_size at a time under the lock, so records added while
+        a caller is iterating never shift what it has left to read.
+        """
+        if self.index_by is None:
+            raise ValueError(f"ledger of {self.key} has no secondary index")
+        upper = (until,) if until is not None else None
+        if before is not None and (upper is None or tuple(before) < upper):
+            upper = tuple(before)
+        lower = (since,) if since is not None else None
+        while True:
+            with self._lock:
+                try:
+                    keys = self._index.get(value)
+                except TypeError:
+                    keys = None
+                if not keys:
+                    return
+                hi = bisect_left(keys, upper) if upper is not None else len(keys)
+                lo = bisect_left(keys, lower, 0, hi) if lower is not None else 0
+                chunk = keys[max(lo, hi - chunk_size):hi]
+                records = [self._memory_get(record_id) for _, record_id in chunk]
+            for entry, record in zip(reversed(chunk), reversed(records)):
+                if record is not None:
+                    yield entry, record
+            if hi - lo <= chunk_size:
+                return
+            upper = chunk[0]
+
+    def _memory_get(self, record_id):
+        # records move _by_id -> _pinned -> _archiving and are added to the next dict before they
+        # leave the previous one, so a lookup without the lock always finds them in one of them
+        record = self._by_id.get(record_id)
+        if record is None and self._pinned:
+            record = self._pinned.get(record_id)
+        if record is None and self._archiving:
+            record = self._archiving.get(record_id)
+        return record
+
+    def get(self, record_id):
+        try:
+            record = self._memory_get(record_id)
+        except TypeError:
+            # unhashable ids (lists, dicts) coming from a bad json payload
+            return None
+        if record is None and self.archive is not None:
+            record = self.archive.lookup(record_id)
+        return record
+
+    def get_many(self, record_ids):
+        """Look up several records at once, None for every unknown id"""
+        get = self.get
+        return [get(record_id) for record_id in record_ids]
+
+    def enforce_retention(self):
+        with self._lock:
+            evicted = self._enforce_retention(force=True)
+        self._archive(evicted)
+        return len(evicted)
+
+    def _enforce_retention(self, force=False):
+        policy = self.policy
+        now = time.time()
+        size = len(self._by_id) + len(self._pinned)
+        over = 0
+        if policy.max_records is not None and size > policy.max_records and (force or size >= self._next_size_check):
+            over = size - policy.target_records
+
+        cutoff = None
+        if policy.max_age_seconds is not None and (force or now >= self._next_age_check):
+            # age checks walk the oldest records, so run them at most once a second
+            cutoff = now - policy.max_age_seconds
+            self._next_age_check = now + 1.0
+
+        if over <= 0 and cutoff is None:
+            return []
+
+        evicted = []
+        settled_pinned = []
+        # pinned records are the oldest, some may have settled since the last pass
+        for record_id, record in self._pinned.items():
+            expired = cutoff is not None and record.get("createdAt", now) <= cutoff
+            if (over > 0 or expired) and self.is_settled(record):
+                settled_pinned.append(record_id)
+                evicted.append(record)
+                over -= 1
+
+        pinned = []
+        for record_id, record in self._by_id.items():
+            expired = cutoff is not None and record.get("createdAt", now) <= cutoff
+            if over <= 0 and not expired:
+                # records are kept in insertion order, everything after this is newer
+                break
+            if self.is_settled(record):
+                evicted.append(record)
+                over -= 1
+            else:
+                pinned.append(record_id)
+
+        for record in evicted:
+            self._archiving[record[self.key]] = record
+        for record_id in settled_pinned:
+            del self._pinned[record_id]
+        for record in evicted:
+            self._by_id.pop(record[self.key], None)
+        for record_id in pinned:
+            self._pinned[record_id] = self._by_id[record_id]
+            del self._by_id[record_id]
+        if policy.max_records is not None:
+            # the next count-based pass waits for another batch worth of adds, and at least as many
+            # adds as there are pinned records, so re-checking those stays O(1) per add
+            size = len(self._by_id) + len(self._pinned)
+            batch = max(1, policy.max_records - policy.target_records, len(self._pinned))
+            self._next_size_check = max(size, policy.target_records) + batch
+        return evicted
+
+    def _archive(self, evicted):
+        if not evicted:
+            return
+        try:
+            if self.archive is not None:
+                self.archive.write(evicted)
+        except Exception:
+            with self._lock:
+                # back in memory, a later pass offers them to the archive again
+                for record in evicted:
+                    record_id = record[self.key]
+                    if record_id in self._archiving:
+                        self._pinned[record_id] = record
+                        del self._archiving[record_id]
+            raise
+        with self._lock:
+            for record in evicted:
+                self._archiving.pop(record[self.key], None)
+            if self.index_by is not None:
+                self._trim_index(evicted)
+
+    def _trim_index(self, evicted):
+        # a pinned record keeps the front of its list in place, so evicted keys are found by
+        # bisection; a list that loses a good share of its keys at once is filtered in one pass
+        gone = {}
+        for record in evicted:
+            try:
+                gone.setdefault(record[self.index_by], []).append((record.get("createdAt") or 0.0, record[self.key]))
+            except (KeyError, TypeError):
+                continue
+        for value, entries in gone.items():
+            keys = self._index.get(value)
+            if keys is None:
+                continue
+            if len(entries) * 4 >= len(keys):
+                entries = set(entries)
+                keys[:] = [entry for entry in keys if entry not in entries]
+            else:
+                for entry in entries:
+                    i = bisect_left(keys, entry)
+                    if i < len(keys) and keys[i] == entry:
+                        del keys[i]
+            if not keys:
+                del self._index[value]
+
+    def clear(self):
+        """Drop every record, archived ones included"""
+        with self._lock:
+            self._by_id = {}
+            self._pinned = {}
+            self._archiving = {}
+            self._index = {}
+            self._next_size_check = 0
+            if self.archive is not None:
+                self.archive.clear()
+
+    def __len__(self):
+        return len(self._by_id) + len(self._pinned)
+
+    def __contains__(self, record_id):
+        return self.get(record_id) is not None
+
+    def __iter__(self):
+        return iter(list(self._pinned.values()) + list(self._by_id.values()))
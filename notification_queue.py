@@ -0,0 +1,209 @@
+# notification queue - /notify enqueues, background workers deliver in batches
+
+import collections
+import json
+import os
+import queue
+import threading
+import time
+
+DEFAULT_MAX_DEPTH = 10_000
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_WORKERS = 2
+DEFAULT_POLL_INTERVAL = 0.05
+DEFAULT_SINK_KEEP = 1000
+
+DELIVERY_FIELDS = ("notificationId", "userId", "transactionId", "message")
+
+
+class InMemorySink:
+    """Counts delivered notifications and keeps the last `keep` of them, stand-in for tests and local runs"""
+
+    def __init__(self, keep=DEFAULT_SINK_KEEP):
+        self.delivered = collections.deque(maxlen=keep)
+        self.count = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def deliver(self, batch):
+        with self._lock:
+            self.delivered.extend(batch)
+            self.count += len(batch)
+            self.batches += 1
+
+
+class FileSink:
+    """Appends every delivered notification to a json-lines file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def deliver(self, batch):
+        lines = "".join(json.dumps(n) + "\n" for n in batch)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as sink:
+                sink.write(lines)
+
+
+def sink_from_env():
+    """CASINO_NOTIFICATION_SINK: "memory" (default) or "file:<path>" """
+    target = os.getenv("CASINO_NOTIFICATION_SINK", "memory")
+    if target.startswith("file:"):
+        return FileSink(target[len("file:"):])
+    return InMemorySink()
+
+
+class NotificationDispatcher:
+    """Bounded queue drained in batches by a pool of worker threads
+
+    submit() never blocks: when the queue is at max_depth it returns False so
+    the caller can shed load. Each queued record moves from QUEUED to SENT or
+    FAILED once its batch has been handed to the sink; on_delivered, when
+    given, is called with the batch afterwards so the new status can be
+    persisted. A batch whose on_delivered raises counts as FAILED.
+    """
+
+    def __init__(self, sink, max_depth=DEFAULT_MAX_DEPTH, batch_size=DEFAULT_BATCH_SIZE,
+                 workers=DEFAULT_WORKERS, poll_interval=DEFAULT_POLL_INTERVAL, on_delivered=None):
+        self.sink = sink
+        self.on_delivered = on_delivered
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+        self.worker_count = workers
+        self.poll_interval = poll_interval
+        self._queue = queue.Queue(maxsize=max_depth)
+        self._workers = []
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "rejected": 0,
+            "delivered": 0,
+            "failed": 0,
+            "batches": 0,
+            "totalDeliveryLagSeconds": 0.0,
+            "maxDeliveryLagSeconds": 0.0
+        }
+
+    def start(self):
+        with self._start_lock:
+            if self._workers:
+                return
+            self._stopping.clear()
+            for i in range(self.worker_count):
+                worker = threading.Thread(target=self._run, name=f"notification-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def stop(self, timeout=5.0):
+        """Deliver what is already queued, then stop the workers"""
+        self.flush(timeout)
+        self._stopping.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def submit(self, notification):
+        """Queue a notification record, returns False when the queue is full"""
+        if not self._workers:
+            self.start()
+        notification["status"] = "QUEUED"
+        notification["queuedAt"] = time.time()
+        try:
+            self._queue.put_nowait(notification)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["rejected"] += 1
+            return False
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+        return True
+
+    def flush(self, timeout=5.0):
+        """Wait until every queued notification has been delivered or failed"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.poll_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._deliver(batch)
+
+    def _deliver(self, batch):
+        try:
+            status, lags = self._send(batch)
+        finally:
+            # whatever happened, flush() must not wait on this batch forever
+            for _ in batch:
+                self._queue.task_done()
+
+        with self._stats_lock:
+            stats = self._stats
+            stats["batches"] += 1
+            stats["delivered" if status == "SENT" else "failed"] += len(batch)
+            stats["totalDeliveryLagSeconds"] += sum(lags)
+            stats["maxDeliveryLagSeconds"] = max(stats["maxDeliveryLagSeconds"], max(lags))
+
+    def _send(self, batch):
+        payload = [{field: n.get(field) for field in DELIVERY_FIELDS} for n in batch]
+        try:
+            self.sink.deliver(payload)
+            status = "SENT"
+        except Exception:
+            status = "FAILED"
+
+        now = time.time()
+        lags = []
+        for notification in batch:
+            lags.append(now - notification["queuedAt"])
+            notification["status"] = status
+            notification["deliveredAt"] = now
+        if self.on_delivered is not None:
+            try:
+                self.on_delivered(batch)
+            except Exception:
+                # the new status could not be stored (e.g. a storage error): report the batch as
+                # failed and keep the worker alive instead of shrinking the pool
+                status = "FAILED"
+                for notification in batch:
+                    notification["status"] = status
+        return status, lags
+
+    def oldest_queued_age(self):
+        # peek at the head of the queue under its own mutex
+        with self._queue.mutex:
+            head = self._queue.queue[0] if self._queue.queue else None
+        return time.time() - head["queuedAt"] if head else 0.0
+
+    def metrics(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        finished = stats["delivered"] + stats["failed"]
+        total_lag = stats.pop("totalDeliveryLagSeconds")
+        stats.update({
+            "depth": self._queue.qsize(),
+            "maxDepth": self.max_depth,
+            "workers": len(self._workers),
+            "queueLagSeconds": self.oldest_queued_age(),
+            "avgDeliveryLagSeconds": total_lag / finished if finished else 0.0
+        })
+        return stats
@@ -0,0 +1,138 @@
+# player store - hash-indexed replacement for the flat players list
+
+import threading
+import zlib
+
+DEFAULT_LOCK_STRIPES = 64
+# fibonacci hashing: ids like the snowflake user ids share their low bits, the product's top bits do not
+GOLDEN_RATIO_64 = 0x9E3779B97F4A7C15
+MASK_64 = (1 << 64) - 1
+
+
+def spread(key, buckets):
+    """Index in range(buckets) for key, taken from the top bits of its fibonacci hash"""
+    return (((hash(key) * GOLDEN_RATIO_64) & MASK_64) * buckets) >> 64
+
+
+class Player:
+    """Compact per-player record
+
+    version starts at 1 and goes up with every balance change.
+    """
+    __slots__ = ("userId", "balance", "currency", "version")
+
+    def __init__(self, userId, balance, currency="USD", version=1):
+        self.userId = userId
+        self.balance = balance
+        self.currency = currency
+        self.version = version
+
+    def etag(self):
+        """Entity tag of the balance representation
+
+        Versions restart when a user is re-created (reset, restart without a
+        journal), so the tag also carries a checksum of what it describes: a
+        stale tag can only match when the body would be the same anyway.
+        """
+        checksum = zlib.crc32(f"{self.balance!r}:{self.currency}".encode())
+        return f"{self.version}-{checksum:08x}"
+
+    def to_dict(self):
+        return {
+            "userId": self.userId,
+            "balance": self.balance,
+            "currency": self.currency
+        }
+
+
+class StripedLock:
+    """Fixed pool of locks, a key always maps to the same lock
+
+    Threads working on different users rarely share a stripe, so they do not
+    serialize on one global lock, while memory stays constant however many
+    users exist.
+    """
+
+    def __init__(self, stripes=DEFAULT_LOCK_STRIPES):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def for_key(self, key):
+        return self._locks[spread(key, len(self._locks))]
+
+
+class PlayerStore:
+    """Players keyed by userId, every lookup is a single dict access
+
+    Balance changes go through debit_if_sufficient / credit / set_balance,
+    which run under the player's lock stripe so concurrent requests can
+    neither overdraw an account nor lose an update, and bump its version. When a journal callable
+    is set it is called with the player after every change, still under the
+    stripe lock, so journal order matches the order of the changes.
+    """
+
+    def __init__(self, players=None, lock_stripes=DEFAULT_LOCK_STRIPES, journal=None):
+        self._by_id = {}
+        self._locks = StripedLock(lock_stripes)
+        self.journal = journal
+        for player in players or []:
+            self.add(**player)
+
+    def add(self, userId, balance, currency="USD"):
+        with self._locks.for_key(userId):
+            player = Player(userId, balance, currency)
+            self._by_id[userId] = player
+            if self.journal is not None:
+                self.journal(player)
+        return player
+
+    def get(self, userId):
+        try:
+            return self._by_id.get(userId)
+        except TypeError:
+            # unhashable ids (lists, dicts) coming from a bad json payload
+            return None
+
+    def get_many(self, userIds):
+        """Look up several users at once, None for every unknown id"""
+        get = self.get
+        return [get(userId) for userId in userIds]
+
+    def debit_if_sufficient(self, player, amount):
+        """Take amount from the balance, returns the new balance or None if it is too low"""
+        with self._locks.for_key(player.userId):
+            if player.balance < amount:
+                return None
+            player.balance -= amount
+            player.version += 1
+            if self.journal is not None:
+                self.journal(player)
+            return player.balance
+
+    def credit(self, player, amount):
+        with self._locks.for_key(player.userId):
+            player.balance += amount
+            player.version += 1
+            if self.journal is not None:
+                self.journal(player)
+            return player.balance
+
+    def set_balance(self, player, balance):
+        with self._locks.for_key(player.userId):
+            player.balance = balance
+            player.version += 1
+            if self.journal is not None:
+                self.journal(player)
+            return player.balance
+
+    def clear(self):
+        self._by_id = {}
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, userId):
+        return self.get(userId) is not None
+
+    def __iter__(self):
+        # a copy, so snapshots can iterate while requests add players
+        return iter(list(self._by_id.values()))
@@ -0,0 +1,185 @@
+# on-demand sampling profiler - per-route stack samples of the live app, nothing installed while idle
+
+import os
+import sys
+import threading
+import time
+
+DEFAULT_INTERVAL = 0.001
+MIN_INTERVAL = 0.0005
+TOP_FRAMES = 20
+# requests to these paths control the profiler and are never profiled themselves
+EXCLUDED_PREFIX = "/admin/profile"
+
+
+def _frame_label(code):
+    # parent directory included so flask/app.py and our app.py stay apart
+    path = os.path.join(os.path.basename(os.path.dirname(code.co_filename)), os.path.basename(code.co_filename))
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of the threads serving requests
+
+    start() swaps the app's wsgi_app for a wrapper that records which route
+    each thread is serving, and starts a sampler thread that reads every such
+    thread's stack with sys._current_frames() once per interval. When the
+    request budget or the time window runs out the original wsgi_app is put
+    back, so an idle profiler adds no code to the request path at all.
+
+    Stacks are cut at the wrapper, so every sample starts at the route and
+    ends at the function that was running. With the GIL the sampler only
+    gets to run at thread switches, so effective intervals are rarely below
+    sys.getswitchinterval().
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._original_wsgi_app = None
+        self._active = {}  # thread id -> route of the request it is serving
+        self._sampler = None
+        self._running = False
+        self._clear()
+
+    def _clear(self):
+        self._stacks = {}  # (route, outermost frame, ..., innermost frame) -> samples
+        self._routes = {}  # route -> [requests, seconds]
+        self._samples = 0
+        self._remaining = None
+        self._deadline = None
+        self._interval = DEFAULT_INTERVAL
+        self._started_at = None
+        self._finished_at = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self, requests=None, seconds=None, interval=DEFAULT_INTERVAL):
+        """Profile the next `requests` requests, or every request for `seconds`"""
+        if (requests is None) == (seconds is None):
+            raise ValueError("give either requests or seconds")
+        with self._lock:
+            if self._running:
+                raise RuntimeError("profiler is already running")
+            self._clear()
+            self._remaining = requests
+            self._deadline = time.monotonic() + seconds if seconds is not None else None
+            self._interval = max(interval, MIN_INTERVAL)
+            self._started_at = time.time()
+            self._running = True
+            self._original_wsgi_app = self.app.wsgi_app
+            self.app.wsgi_app = self._profiled_wsgi_app
+            self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        with self._lock:
+            self._stop_locked()
+
+    def _stop_locked(self):
+        if not self._running:
+            return
+        self._running = False
+        self.app.wsgi_app = self._original_wsgi_app
+        self._finished_at = time.time()
+
+    def _route(self, environ):
+        try:
+            rule, _ = self.app.url_map.bind_to_environ(environ).match(return_rule=True)
+            return rule.rule
+        except Exception:
+            return "unmatched"
+
+    def _profiled_wsgi_app(self, environ, start_response):
+        wsgi_app = self._original_wsgi_app
+        if environ.get("PATH_INFO", "").startswith(EXCLUDED_PREFIX):
+            return wsgi_app(environ, start_response)
+        route = self._route(environ)
+        thread_id = threading.get_ident()
+        self._active[thread_id] = route
+        start = time.perf_counter()
+        try:
+            return wsgi_app(environ, start_response)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._active.pop(thread_id, None)
+            with self._lock:
+                totals = self._routes.setdefault(route, [0, 0.0])
+                totals[0] += 1
+                totals[1] += elapsed
+                if self._remaining is not None:
+                    self._remaining -= 1
+                    if self._remaining <= 0:
+                        self._stop_locked()
+
+    def _sample_loop(self):
+        boundary = self._profiled_wsgi_app.__func__.__code__
+        labels = {}
+        while self._running:
+            time.sleep(self._interval)
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                self.stop()
+                break
+            frames = sys._current_frames()
+            for thread_id, route in list(self._active.items()):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None and frame.f_code is not boundary:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(code)
+                    stack.append(label)
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                stack.append(route)
+                key = tuple(reversed(stack))
+                with self._lock:
+                    self._stacks[key] = self._stacks.get(key, 0) + 1
+                    self._samples += 1
+
+    def report(self, top=TOP_FRAMES):
+        """Per-route request times plus the frames most samples were spent in"""
+        with self._lock:
+            stacks = dict(self._stacks)
+            routes = {route: list(totals) for route, totals in self._routes.items()}
+            status = {
+                "status": "RUNNING" if self._running else ("DONE" if self._started_at else "IDLE"),
+                "startedAt": self._started_at,
+                "finishedAt": self._finished_at,
+                "remainingRequests": self._remaining,
+                "intervalSeconds": self._interval,
+                "samples": self._samples
+            }
+
+        per_route = {}
+        for route, (count, seconds) in routes.items():
+            per_route[route] = {"requests": count, "totalSeconds": seconds, "meanMs": seconds / count * 1000, "samples": 0}
+        self_samples, total_samples = {}, {}
+        for (route, *frames), samples in stacks.items():
+            entry = per_route.setdefault(route, {"requests": 0, "totalSeconds": 0.0, "meanMs": None, "samples": 0})
+            entry["samples"] += samples
+            own = self_samples.setdefault(route, {})
+            own[frames[-1]] = own.get(frames[-1], 0) + samples
+            inclusive = total_samples.setdefault(route, {})
+            for frame in set(frames):
+                inclusive[frame] = inclusive.get(frame, 0) + samples
+
+        for route, entry in per_route.items():
+            inclusive = total_samples.get(route, {})
+            own = self_samples.get(route, {})
+            ranked = sorted(inclusive, key=lambda frame: (own.get(frame, 0), inclusive[frame]), reverse=True)[:top]
+            entry["topFrames"] = [
+                {"frame": frame, "selfSamples": own.get(frame, 0), "totalSamples": inclusive[frame]} for frame in ranked
+            ]
+        status["routes"] = per_route
+        return status
+
+    def collapsed(self):
+        """Samples in the collapsed-stack format flamegraph.pl and speedscope read"""
+        with self._lock:
+            stacks = dict(self._stacks)
+        return "".join(f"{';'.join(stack)} {samples}\n" for stack, samples in sorted(stacks.items()))
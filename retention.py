@@ -0,0 +1,137 @@
+# retention - bounded in-memory collections with compressed on-disk archival
+
+import gzip
+import json
+import os
+import threading
+
+DEFAULT_ARCHIVE_DIR = "archive"
+SEGMENT_SUFFIX = ".jsonl.gz"
+
+
+class RetentionPolicy:
+    """How many records (and for how long) a collection keeps in memory
+
+    max_records / max_age_seconds of None means no limit on that axis.
+    Eviction runs down to the low watermark so every archive segment holds
+    a batch of records instead of one file per evicted record.
+    """
+
+    def __init__(self, max_records=None, max_age_seconds=None, low_watermark=0.9):
+        self.max_records = max_records
+        self.max_age_seconds = max_age_seconds
+        self.low_watermark = low_watermark
+
+    @classmethod
+    def from_env(cls, name, max_records=None, max_age_seconds=None):
+        """Read CASINO_<NAME>_MAX_RECORDS / CASINO_<NAME>_MAX_AGE_SECONDS, falling back to the given defaults"""
+        prefix = f"CASINO_{name.upper()}_"
+        max_records = os.getenv(prefix + "MAX_RECORDS", max_records)
+        max_age_seconds = os.getenv(prefix + "MAX_AGE_SECONDS", max_age_seconds)
+        return cls(
+            max_records=int(max_records) if max_records not in (None, "") else None,
+            max_age_seconds=float(max_age_seconds) if max_age_seconds not in (None, "") else None
+        )
+
+    @property
+    def target_records(self):
+        return int(self.max_records * self.low_watermark)
+
+
+class SegmentArchive:
+    """Evicted records in gzip compressed json-lines segment files
+
+    Each segment starts with a header line holding the key range it covers,
+    so a lookup only decompresses segments whose range can contain the key.
+    """
+
+    def __init__(self, name, key, directory=None):
+        self.name = name
+        self.key = key
+        self.directory = directory or os.getenv("CASINO_ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+        self._lock = threading.Lock()
+        self._segments = []  # (path, min_key, max_key), oldest first
+        self._cached_path = None
+        self._cached_records = None
+        self._load_segments()
+
+    def _segment_paths(self):
+        if not os.path.isdir(self.directory):
+            return []
+        prefix = f"{self.name}-"
+        names = [n for n in os.listdir(self.directory) if n.startswith(prefix) and n.endswith(SEGMENT_SUFFIX)]
+        return [os.path.join(self.directory, n) for n in sorted(names)]
+
+    def _load_segments(self):
+        for path in self._segment_paths():
+            with gzip.open(path, "rt", encoding="utf-8") as segment:
+                header = json.loads(segment.readline())
+            self._segments.append((path, header["minKey"], header["maxKey"]))
+
+    def write(self, records):
+        """Write one segment holding the given records, returns its path"""
+        if not records:
+            return None
+        keys = [str(r[self.key]) for r in records]
+        header = {"minKey": min(keys), "maxKey": max(keys), "count": len(records)}
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            number = len(self._segments) + 1
+            if self._segments:
+                last = os.path.basename(self._segments[-1][0])
+                number = int(last[len(self.name) + 1:-len(SEGMENT_SUFFIX)]) + 1
+            path = os.path.join(self.directory, f"{self.name}-{number:08d}{SEGMENT_SUFFIX}")
+
+            # write under a temp name so a crash never leaves a half segment behind
+            tmp_path = path + ".tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as segment:
+                segment.write(json.dumps(header) + "\n")
+                for record in records:
+                    segment.write(json.dumps(record) + "\n")
+            os.replace(tmp_path, path)
+            self._segments.append((path, header["minKey"], header["maxKey"]))
+        return path
+
+    def _read_segment(self, path):
+        if path == self._cached_path:
+            return self._cached_records
+        records = {}
+        with gzip.open(path, "rt", encoding="utf-8") as segment:
+            segment.readline()
+            for line in segment:
+                record = json.loads(line)
+                records[record[self.key]] = record
+        self._cached_path, self._cached_records = path, records
+        return records
+
+    def lookup(self, record_id):
+        """Slow path: find an archived record by id, newest segment first"""
+        key = str(record_id)
+        with self._lock:
+            for path, min_key, max_key in reversed(self._segments):
+                if min_key <= key <= max_key:
+                    record = self._read_segment(path).get(record_id)
+                    if record is not None:
+                        return record
+        return None
+
+    def clear(self):
+        """Delete every segment of this archive"""
+        with self._lock:
+            for path, _, _ in self._segments:
+                os.remove(path)
+            self._segments = []
+            self._cached_path = self._cached_records = None
+
+    def __iter__(self):
+        """All archived records, oldest segment first"""
+        for path, _, _ in list(self._segments):
+            with gzip.open(path, "rt", encoding="utf-8") as segment:
+                segment.readline()
+                for line in segment:
+                    yield json.loads(line)
+
+    @property
+    def segment_count(self):
+        return len(self._segments)
@@ -0,0 +1,117 @@
+# request schemas - declared per endpoint, compiled once into validators that run before any lookup
+
+import math
+
+MAX_PROFILE_SECONDS = 600
+# largest amount or balance a request may carry, far inside what every backend can hold in cents
+MAX_AMOUNT = 1_000_000_000_000
+# items per batch call, so one request can't hold a worker for an unbounded list
+MAX_BATCH_ITEMS = 1000
+TYPE_NAMES = {"integer": "an integer", "number": "a number", "string": "a non-empty string", "list": "a list"}
+
+
+class ValidationError(ValueError):
+    """A request body that does not match its schema, answered with 400"""
+
+
+class Field:
+    """One expected body field
+
+    kind is "integer", "number", "string" or "list"; bools are never
+    accepted as numbers and numbers must be finite. None counts as missing.
+    With cents a number must be a whole number of cents, what the shared
+    balance ledger can charge; max_items caps the length of a list.
+    """
+
+    def __init__(self, kind, required=True, minimum=None, exclusive_minimum=None, maximum=None, cents=False,
+                 max_items=None):
+        self.kind = kind
+        self.required = required
+        self.minimum = minimum
+        self.exclusive_minimum = exclusive_minimum
+        self.maximum = maximum
+        self.cents = cents
+        self.max_items = max_items
+
+
+def _type_check(kind):
+    if kind == "integer":
+        return lambda value: type(value) is int
+    if kind == "number":
+        return lambda value: (type(value) is int) or (type(value) is float and math.isfinite(value))
+    if kind == "string":
+        return lambda value: type(value) is str and value != ""
+    if kind == "list":
+        return lambda value: type(value) is list
+    raise ValueError(f"unknown field kind {kind!r}")
+
+
+def _compile_field(name, field):
+    # everything that can be decided from the declaration is decided here, once
+    is_type = _type_check(field.kind)
+    bounds = []
+    if field.minimum is not None:
+        bounds.append((lambda value, limit=field.minimum: value >= limit, f"{name} must be at least {field.minimum}"))
+    if field.exclusive_minimum is not None:
+        bounds.append((lambda value, limit=field.exclusive_minimum: value > limit, f"{name} must be greater than {field.exclusive_minimum}"))
+    if field.maximum is not None:
+        bounds.append((lambda value, limit=field.maximum: value <= limit, f"{name} must be at most {field.maximum}"))
+    if field.cents:
+        bounds.append((lambda value: round(value, 2) == value, f"{name} must be a whole number of cents"))
+    if field.max_items is not None:
+        bounds.append((lambda value, limit=field.max_items: len(value) <= limit, f"{name} must have at most {field.max_items} items"))
+    required = field.required
+    missing_error = f"{name} is required"
+    type_error = f"{name} must be {TYPE_NAMES[field.kind]}"
+
+    def check(data):
+        value = data.get(name)
+        if value is None:
+            if required:
+                raise ValidationError(missing_error)
+            return
+        if not is_type(value):
+            raise ValidationError(type_error)
+        for in_bounds, bounds_error in bounds:
+            if not in_bounds(value):
+                raise ValidationError(bounds_error)
+
+    return check
+
+
+def compile_schema(fields):
+    """Validator for a {name: Field} schema, returns the body or raises ValidationError"""
+    checks = [_compile_field(name, field) for name, field in fields.items()]
+
+    def validate(data):
+        if type(data) is not dict:
+            raise ValidationError("Request body must be a JSON object")
+        for check in checks:
+            check(data)
+        return data
+
+    return validate
+
+
+USER_ID = Field("integer")
+TRANSACTION_ID = Field("string")
+BET_AMOUNT = Field("number", exclusive_minimum=0, maximum=MAX_AMOUNT, cents=True)
+
+SCHEMAS = {
+    "update_balance": {"userId": USER_ID, "newBalance": Field("number", minimum=0, maximum=MAX_AMOUNT, cents=True)},
+    "place_bet": {"userId": USER_ID, "betAmount": BET_AMOUNT},
+    "place_bets": {"bets": Field("list", max_items=MAX_BATCH_ITEMS)},
+    "payout": {"userId": USER_ID, "transactionId": TRANSACTION_ID, "winAmount": Field("number", exclusive_minimum=0, maximum=MAX_AMOUNT, cents=True)},
+    "spin": {"userId": USER_ID, "betAmount": BET_AMOUNT, "transactionId": TRANSACTION_ID},
+    "spin_many": {"spins": Field("list", max_items=MAX_BATCH_ITEMS)},
+    "notify": {"userId": USER_ID, "transactionId": TRANSACTION_ID, "message": Field("string")},
+    "play": {"userId": USER_ID, "betAmount": BET_AMOUNT, "message": Field("string", required=False)},
+    "create_user": {"balance": Field("number", required=False, minimum=0, maximum=MAX_AMOUNT, cents=True), "currency": Field("string", required=False)},
+    "start_profile": {
+        "requests": Field("integer", required=False, exclusive_minimum=0),
+        "seconds": Field("number", required=False, exclusive_minimum=0, maximum=MAX_PROFILE_SECONDS),
+        "interval": Field("number", required=False, exclusive_minimum=0)
+    }
+}
+
+VALIDATORS = {name: compile_schema(fields) for name, fields in SCHEMAS.items()}
@@ -0,0 +1,109 @@
+# production serving - N pre-forked worker processes sharing one listening socket
+# run: python serve.py --workers 4 --port 8000
+
+import argparse
+import os
+import signal
+import socket
+import sys
+
+WORKER_ENV = {
+    "CASINO_STORAGE": "shared"
+}
+
+
+def prepare_storage():
+    # create the ledger, the sqlite schema and the seed user once, before any worker starts
+    import app as server
+    server.storage.close()
+    # only the shared backend has a balance ledger, sqlite keeps balances in its file
+    if hasattr(server.storage, "ledger"):
+        server.storage.ledger.close()
+
+
+def run_worker(worker_id, listener, host, port, threaded):
+    from werkzeug.serving import make_server
+
+    # distinct worker ids keep transaction / notification ids unique across processes
+    os.environ["CASINO_WORKER_ID"] = str(worker_id)
+    import app as server
+
+    make_server(host, port, server.app, threaded=threaded, fd=listener.fileno()).serve_forever()
+
+
+def spawn_worker(worker_id, listener, args):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            run_worker(worker_id, listener, args.host, args.port, not args.single_threaded)
+        finally:
+            os._exit(1)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the casino app with N worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--single-threaded", action="store_true", help="one request at a time per worker")
+    parser.add_argument("--reset", action="store_true", help="start from an empty balance ledger")
+    args = parser.parse_args()
+
+    for name, value in WORKER_ENV.items():
+        os.environ.setdefault(name, value)
+    if os.environ["CASINO_STORAGE"] == "memory" and args.workers > 1:
+        sys.exit("CASINO_STORAGE=memory can't be shared between worker processes")
+    os.environ["CASINO_WORKERS"] = str(args.workers)
+
+    if args.reset:
+        from shm_ledger import DEFAULT_PATH
+        ledger_path = os.getenv("CASINO_SHM_PATH", DEFAULT_PATH)
+        if os.path.exists(ledger_path):
+            os.remove(ledger_path)
+
+    # prepare in a throwaway child so the supervisor never imports the app itself
+    pid = os.fork()
+    if pid == 0:
+        try:
+            prepare_storage()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((args.host, args.port))
+    listener.listen(1024)
+
+    workers = {spawn_worker(i, listener, args): i for i in range(args.workers)}
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers", flush=True)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while workers:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        worker_id = workers.pop(pid, None)
+        if not stopping and worker_id is not None:
+            # replace a crashed worker, keeping its id
+            workers[spawn_worker(worker_id, listener, args)] = worker_id
+
+
+if __name__ == '__main__':
+    main()
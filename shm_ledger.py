@@ -0,0 +1,226 @@
+# shared-memory balance ledger - fixed-width records in a memory-mapped file
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+from player_store import Player, StripedLock, spread
+from sqlite_storage import SQLiteStorage
+from storage import BalanceOutOfRange
+
+MAGIC = b"CASLEDG3"
+HEADER = struct.Struct("<8sqq")  # magic, capacity, used slots
+SLOT = struct.Struct("<qqq8s")   # userId, balance in cents, balance version, currency
+CENTS = struct.Struct("<q")
+BALANCE = struct.Struct("<qq")   # cents and version, always read and written together
+EMPTY = -(1 << 63)               # userId value marking a free slot
+MIN_CENTS = -(1 << 63)
+MAX_CENTS = (1 << 63) - 1
+CENTS_OFFSET = 8                 # byte offset of the balance inside a slot
+DEFAULT_CAPACITY = 1 << 20
+DEFAULT_PATH = "/dev/shm/casino-ledger" if os.path.isdir("/dev/shm") else "casino-ledger.bin"
+
+
+def to_cents(amount):
+    return int(round(amount * 100))
+
+
+def from_cents(cents):
+    return cents / 100
+
+
+def _check_cents(cents):
+    # struct.pack_into zeroes its target before it rejects a value, so check first
+    if not MIN_CENTS <= cents <= MAX_CENTS:
+        raise BalanceOutOfRange("balance is out of the range the shared ledger can hold")
+    return cents
+
+
+class SharedBalanceLedger:
+    """Balances of integer userIds shared by every process that maps the file
+
+    The file is an open-addressed hash table of fixed-width slots
+    (userId, cents, version, currency). Slots are claimed once and never
+    freed, so a lookup can probe without locking. Balance updates lock the
+    balance and version bytes of the slot: a thread lock stripe keeps threads of one process
+    apart and an fcntl byte-range lock keeps processes apart, so unrelated
+    users never contend. Claiming a new slot locks the header instead.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, capacity=DEFAULT_CAPACITY, lock_stripes=64):
+        self.path = path
+        size = HEADER.size + capacity * SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._insert_lock = threading.Lock()
+        self._locks = StripedLock(lock_stripes)
+
+        with self._file_lock(0, HEADER.size):
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                self._map = mmap.mmap(self._fd, size)
+                HEADER.pack_into(self._map, 0, MAGIC, capacity, 0)
+                self._map[HEADER.size:] = SLOT.pack(EMPTY, 0, 0, b"") * capacity
+            else:
+                self._map = mmap.mmap(self._fd, os.fstat(self._fd).st_size)
+                magic, capacity, _ = HEADER.unpack_from(self._map, 0)
+                if magic != MAGIC:
+                    raise ValueError(f"{path} is not a balance ledger of this version, remove it or serve with --reset")
+        self.capacity = capacity
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    def _offset(self, index):
+        return HEADER.size + index * SLOT.size
+
+    @contextmanager
+    def _file_lock(self, start, length):
+        # fcntl locks belong to the process, threads are kept apart by the thread locks
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+    def _probe(self, userId):
+        """Slot index holding userId, or (-1, first free index on its probe path)"""
+        index = spread(userId, self.capacity)
+        for _ in range(self.capacity):
+            slot_user = CENTS.unpack_from(self._map, self._offset(index))[0]
+            if slot_user == userId:
+                return index, None
+            if slot_user == EMPTY:
+                return -1, index
+            index = (index + 1) % self.capacity
+        return -1, None
+
+    def find(self, userId):
+        if not isinstance(userId, int) or isinstance(userId, bool):
+            return -1
+        return self._probe(userId)[0]
+
+    def get(self, userId):
+        """(cents, currency) for userId, or None"""
+        account = self.account(userId)
+        return account[:2] if account is not None else None
+
+    def account(self, userId):
+        """(cents, currency, version) for userId, or None"""
+        index = self.find(userId)
+        if index < 0:
+            return None
+        _, cents, version, currency = SLOT.unpack_from(self._map, self._offset(index))
+        return cents, currency.rstrip(b"\0").decode(), version
+
+    def version(self, index):
+        return BALANCE.unpack_from(self._map, self._offset(index) + CENTS_OFFSET)[1]
+
+    def add(self, userId, cents, currency="USD"):
+        """Create (or overwrite) the account of an integer userId"""
+        if not isinstance(userId, int) or isinstance(userId, bool) or userId == EMPTY:
+            raise ValueError("shared ledger userIds must be integers")
+        _check_cents(cents)
+        with self._insert_lock, self._file_lock(0, HEADER.size):
+            index, free = self._probe(userId)
+            if index < 0 and free is None:
+                raise MemoryError("shared balance ledger is full")
+            offset = self._offset(index if index >= 0 else free)
+            # write balance and currency before the userId makes the slot visible
+            struct.pack_into("<qq8s", self._map, offset + CENTS_OFFSET, cents, 1, currency.encode())
+            if index < 0:
+                index = free
+                CENTS.pack_into(self._map, offset, userId)
+                _, capacity, used = HEADER.unpack_from(self._map, 0)
+                HEADER.pack_into(self._map, 0, MAGIC, capacity, used + 1)
+        return index
+
+    def _update(self, index, change):
+        offset = self._offset(index) + CENTS_OFFSET
+        with self._locks.for_key(index), self._file_lock(offset, BALANCE.size):
+            cents, version = BALANCE.unpack_from(self._map, offset)
+            new_cents = change(cents)
+            if new_cents is None:
+                return None
+            _check_cents(new_cents)
+            BALANCE.pack_into(self._map, offset, new_cents, version + 1)
+            return new_cents
+
+    def debit_if_sufficient(self, index, cents):
+        return self._update(index, lambda balance: balance - cents if balance >= cents else None)
+
+    def credit(self, index, cents):
+        return self._update(index, lambda balance: balance + cents)
+
+    def set(self, index, cents):
+        return self._update(index, lambda balance: cents)
+
+    def clear(self):
+        """Free every slot, only safe while no process is serving requests"""
+        with self._insert_lock, self._file_lock(0, HEADER.size):
+            self._map[HEADER.size:] = SLOT.pack(EMPTY, 0, 0, b"") * self.capacity
+            HEADER.pack_into(self._map, 0, MAGIC, self.capacity, 0)
+
+    def __len__(self):
+        return HEADER.unpack_from(self._map, 0)[2]
+
+
+class SharedLedgerStorage(SQLiteStorage):
+    """Storage for multi-process serving
+
+    Balances live in the shared-memory ledger so every worker process sees
+    and atomically updates the same value; transactions, spins and
+    notifications go to the SQLite file all workers open.
+    """
+
+    def __init__(self, path, ledger, pool_size=8):
+        super().__init__(path, pool_size=pool_size)
+        self.ledger = ledger
+
+    def get_player(self, userId):
+        account = self.ledger.account(userId)
+        if account is None:
+            return None
+        cents, currency, version = account
+        return Player(userId, from_cents(cents), currency, version)
+
+    def get_players(self, userIds):
+        # balances are in the ledger, not in the players table
+        return [self.get_player(userId) for userId in userIds]
+
+    def add_player(self, userId, balance, currency="USD"):
+        self.ledger.add(userId, to_cents(balance), currency)
+        return Player(userId, balance, currency)
+
+    def _update_ledger(self, update, player, amount):
+        index = self.ledger.find(player.userId)
+        if index < 0:
+            return None
+        cents = update(index, to_cents(amount))
+        if cents is None:
+            return None
+        player.balance = from_cents(cents)
+        # read after the lock is released, another worker may already be a version ahead
+        player.version = self.ledger.version(index)
+        return player.balance
+
+    def debit_if_sufficient(self, player, amount):
+        return self._update_ledger(self.ledger.debit_if_sufficient, player, amount)
+
+    def credit(self, player, amount):
+        return self._update_ledger(self.ledger.credit, player, amount)
+
+    def set_balance(self, player, balance):
+        return self._update_ledger(self.ledger.set, player, balance)
+
+    def sizes(self):
+        sizes = super().sizes()
+        sizes["players"] = len(self.ledger)
+        return sizes
+
+    def reset(self):
+        super().reset()
+        self.ledger.clear()
@@ -0,0 +1,50 @@
+# slot machine paytable - shared by the spin route and the rtp simulator
+
+from fractions import Fraction
+from itertools import product
+
+REELS = ["Cherry", "Bell", "Seven", "Bar", "Lemon"]
+REEL_COUNT = 3
+
+# three of a kind pays betAmount * multiplier, symbols not listed pay the default
+PAYTABLE = {
+    "Cherry": 10,
+    "Seven": 5
+}
+DEFAULT_MULTIPLIER = 3
+
+
+def payout_multiplier(reels):
+    """Multiplier for a spin result, 0 for anything but three of a kind"""
+    if reels[0] == reels[1] == reels[2]:
+        return PAYTABLE.get(reels[0], DEFAULT_MULTIPLIER)
+    return 0
+
+
+def evaluate_spin(reels, betAmount):
+    """Outcome, win amount and player message for a spin result"""
+    multiplier = payout_multiplier(reels)
+    if multiplier:
+        winAmount = betAmount * multiplier
+        return "WIN", winAmount, f"Congratulations! You won ${winAmount}!"
+    return "LOSE", 0, "Better luck next time!"
+
+
+def analytic_report():
+    """Exact return to player, hit frequency and variance per unit bet
+
+    Every reel stops on each symbol with equal probability, so enumerating
+    all len(REELS) ** REEL_COUNT combinations gives the exact figures.
+    """
+    combinations = list(product(REELS, repeat=REEL_COUNT))
+    probability = Fraction(1, len(combinations))
+    multipliers = [payout_multiplier(combo) for combo in combinations]
+
+    rtp = sum(probability * m for m in multipliers)
+    hit_frequency = sum(probability for m in multipliers if m)
+    variance = sum(probability * (m - rtp) ** 2 for m in multipliers)
+    return {
+        "rtp": rtp,
+        "hitFrequency": hit_frequency,
+        "variance": variance
+    }
@@ -0,0 +1,97 @@
+# monte carlo rtp / volatility simulator for the slot paytable
+# run: python slot_simulator.py --spins 100000000
+
+import argparse
+import json
+import math
+import time
+from itertools import product
+
+import numpy as np
+
+from slot_machine import REELS, REEL_COUNT, analytic_report, payout_multiplier
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+Z_95 = 1.959963984540054
+
+
+def build_payout_table():
+    """Multiplier for every reel combination, indexed by the base-N reel indices"""
+    symbols = len(REELS)
+    table = np.zeros(symbols ** REEL_COUNT, dtype=np.float64)
+    for indices in product(range(symbols), repeat=REEL_COUNT):
+        code = 0
+        for index in indices:
+            code = code * symbols + index
+        table[code] = payout_multiplier([REELS[i] for i in indices])
+    return table
+
+
+def simulate(spins, chunk_size=DEFAULT_CHUNK_SIZE, seed=None):
+    """Run the given number of spins in chunks and return summary statistics
+
+    Memory stays at O(chunk_size): each chunk draws its reel indices, maps
+    them to multipliers through the lookup table and is folded into running
+    sums before the next chunk is drawn.
+    """
+    rng = np.random.default_rng(seed)
+    table = build_payout_table()
+    symbols = len(REELS)
+    weights = symbols ** np.arange(REEL_COUNT - 1, -1, -1)
+
+    total = 0.0
+    total_squares = 0.0
+    hits = 0
+    remaining = spins
+    started = time.perf_counter()
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        reels = rng.integers(0, symbols, size=(size, REEL_COUNT), dtype=np.int64)
+        returns = table[reels @ weights]
+        total += returns.sum()
+        total_squares += np.dot(returns, returns)
+        hits += np.count_nonzero(returns)
+        remaining -= size
+    elapsed = time.perf_counter() - started
+
+    return summarize(spins, total, total_squares, hits, elapsed)
+
+
+def summarize(spins, total, total_squares, hits, elapsed):
+    rtp = total / spins
+    # sample variance of the per-spin return (unit bet)
+    variance = (total_squares - spins * rtp * rtp) / (spins - 1) if spins > 1 else 0.0
+    rtp_margin = Z_95 * math.sqrt(variance / spins)
+    hit_frequency = hits / spins
+    hit_margin = Z_95 * math.sqrt(hit_frequency * (1 - hit_frequency) / spins)
+
+    exact = analytic_report()
+    return {
+        "spins": spins,
+        "rtp": rtp,
+        "rtpConfidence95": [rtp - rtp_margin, rtp + rtp_margin],
+        "hitFrequency": hit_frequency,
+        "hitFrequencyConfidence95": [hit_frequency - hit_margin, hit_frequency + hit_margin],
+        "variance": variance,
+        "standardDeviation": math.sqrt(variance),
+        "analyticRtp": float(exact["rtp"]),
+        "analyticHitFrequency": float(exact["hitFrequency"]),
+        "analyticVariance": float(exact["variance"]),
+        "analyticRtpWithinConfidence": rtp - rtp_margin <= exact["rtp"] <= rtp + rtp_margin,
+        "seconds": elapsed,
+        "spinsPerSecond": spins / elapsed if elapsed else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo RTP report for the slot paytable")
+    parser.add_argument("--spins", type=int, default=10_000_000)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    print(json.dumps(simulate(args.spins, args.chunk_size, args.seed), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+# spin rng - reel outcomes drawn in bulk into blocks, seedable per server or per user for replay
+
+import os
+import random
+import secrets
+import threading
+from collections import OrderedDict
+from itertools import product
+
+from player_store import spread
+from slot_machine import REELS, REEL_COUNT
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, the stdlib mode needs nothing
+    np = None
+
+MODES = ("numpy", "stdlib", "crypto")
+DEFAULT_MODE = "numpy" if np is not None else "stdlib"
+DEFAULT_POOL_SIZE = 4096
+USER_POOL_SIZE = 256
+DEFAULT_THREAD_STREAMS = 16
+DEFAULT_MAX_USER_STREAMS = 10000
+
+# every reel combination once; an outcome is one uniform draw from this list,
+# the same distribution as REEL_COUNT independent uniform reels. Tuples, so
+# spins can hand out the shared combination without copying it
+COMBINATIONS = list(product(REELS, repeat=REEL_COUNT))
+COMBINATION_COUNT = len(COMBINATIONS)
+# largest multiple of COMBINATION_COUNT below 256, crypto bytes above it are redrawn to avoid modulo bias
+CRYPTO_BYTE_LIMIT = 256 - 256 % COMBINATION_COUNT
+
+
+def _draw_numpy(key, size):
+    return np.random.default_rng(list(key)).integers(0, COMBINATION_COUNT, size=size).tolist()
+
+
+def _draw_stdlib(key, size):
+    return random.Random(":".join(map(str, key))).choices(range(COMBINATION_COUNT), k=size)
+
+
+def _draw_crypto(key, size):
+    # the key is ignored: a cryptographic generator can't be replayed
+    codes = []
+    while len(codes) < size:
+        codes.extend(b % COMBINATION_COUNT for b in secrets.token_bytes(size - len(codes)) if b < CRYPTO_BYTE_LIMIT)
+    return codes
+
+
+DRAW = {"numpy": _draw_numpy, "stdlib": _draw_stdlib, "crypto": _draw_crypto}
+
+
+class _Stream:
+    __slots__ = ("key", "size", "block", "codes", "index", "lock")
+
+    def __init__(self, key, size):
+        self.key = key
+        self.size = size
+        self.block = -1
+        self.codes = []
+        self.index = size  # empty, the first spin draws block 0
+        self.lock = threading.Lock()
+
+
+class SpinRng:
+    """Reel outcomes handed out from blocks that are generated in bulk
+
+    Each stream draws pool_size outcome codes at once and serves them one
+    by one. Block b of a stream comes from a generator seeded with
+    (seed, worker id, stream, b), so with a configured seed any spin can be
+    regenerated from the position spin() returns. With per_user every user
+    has their own stream (and lock), otherwise the server has one stream, or
+    when unseeded a fixed set of thread_streams picked by thread id, so
+    threads rarely share a lock and a new thread per connection does not
+    draw a new block.
+
+    User streams are kept for the max_user_streams most recent users. An
+    evicted user gets a fresh stream key when they come back, never the
+    block sequence they already played; replays still work as the position
+    records the key.
+
+    The crypto mode draws from the OS CSPRNG through secrets and is never
+    replayable, so it rejects a seed.
+    """
+
+    def __init__(self, mode=DEFAULT_MODE, seed=None, per_user=False, pool_size=DEFAULT_POOL_SIZE,
+                 user_pool_size=USER_POOL_SIZE, worker_id=None, thread_streams=DEFAULT_THREAD_STREAMS,
+                 max_user_streams=DEFAULT_MAX_USER_STREAMS):
+        if mode not in MODES:
+            raise ValueError(f"unknown rng mode {mode!r}, expected one of {MODES}")
+        if mode == "numpy" and np is None:
+            raise RuntimeError("the numpy rng mode needs numpy installed")
+        if mode == "crypto" and seed is not None:
+            raise ValueError("the crypto rng mode can't be seeded")
+        self.mode = mode
+        self.seed = seed
+        self.per_user = per_user
+        self.pool_size = pool_size
+        self.user_pool_size = user_pool_size
+        self.max_user_streams = max_user_streams
+        self.worker_id = worker_id if worker_id is not None else int(os.getenv("CASINO_WORKER_ID", "0"))
+        self._draw = DRAW[mode]
+        # unseeded streams still get a key, from a secret random seed nobody can replay
+        self._seed = seed if seed is not None else secrets.randbits(64)
+        self._server_stream = _Stream((self._seed, self.worker_id, 0), pool_size)
+        self._thread_streams = [_Stream((self._seed, self.worker_id, 2, i), pool_size) for i in range(thread_streams)]
+        self._user_streams = OrderedDict()
+        self._user_streams_lock = threading.Lock()
+        # bumped by every eviction, so a re-created user stream never reuses an earlier key
+        self._user_epoch = 0
+
+    @classmethod
+    def from_env(cls):
+        seed = os.getenv("CASINO_RNG_SEED")
+        return cls(
+            mode=os.getenv("CASINO_RNG", DEFAULT_MODE),
+            seed=int(seed) if seed else None,
+            per_user=os.getenv("CASINO_RNG_PER_USER", "0") == "1",
+            pool_size=int(os.getenv("CASINO_RNG_POOL_SIZE", str(DEFAULT_POOL_SIZE))),
+            max_user_streams=int(os.getenv("CASINO_RNG_MAX_USER_STREAMS", str(DEFAULT_MAX_USER_STREAMS)))
+        )
+
+    def _stream_for(self, userId):
+        if self.per_user and userId is not None:
+            with self._user_streams_lock:
+                stream = self._user_streams.get(userId)
+                if stream is not None:
+                    self._user_streams.move_to_end(userId)
+                    return stream
+                if len(self._user_streams) >= self.max_user_streams:
+                    self._user_streams.popitem(last=False)
+                    self._user_epoch += 1
+                # seed sequences want non-negative ints
+                key = (self._seed, self.worker_id, 1, userId % (1 << 64), self._user_epoch)
+                stream = self._user_streams[userId] = _Stream(key, self.user_pool_size)
+                return stream
+        if self.seed is None:
+            return self._thread_streams[spread(threading.get_ident(), len(self._thread_streams))]
+        return self._server_stream
+
+    def spin(self, userId=None):
+        """(reels, position) for the next spin, position is None unless the rng is seeded"""
+        stream = self._stream_for(userId)
+        with stream.lock:
+            index = stream.index
+            if index >= stream.size:
+                stream.block += 1
+                stream.codes = self._draw(stream.key + (stream.block,), stream.size)
+                index = 0
+            stream.index = index + 1
+            block = stream.block
+            reels = COMBINATIONS[stream.codes[index]]
+        if self.seed is None:
+            return reels, None
+        return reels, {
+            "mode": self.mode,
+            "key": list(stream.key),
+            "block": block,
+            "index": index,
+            "poolSize": stream.size
+        }
+
+
+def replay(position):
+    """Reels of the spin at a recorded position"""
+    if position["mode"] == "crypto":
+        raise ValueError("crypto spins can't be replayed")
+    codes = DRAW[position["mode"]](tuple(position["key"]) + (position["block"],), position["poolSize"])
+    return COMBINATIONS[codes[position["index"]]]
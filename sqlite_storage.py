@@ -0,0 +1,393 @@
+# sqlite storage backend - pooled WAL-mode connections behind the storage interface
+
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from player_store import Player
+from storage import Storage
+
+DEFAULT_POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 128
+IN_CHUNK_SIZE = 500  # bound parameters per IN (...) lookup, below sqlite's variable limit
+HISTORY_CHUNK = 256
+# history kind -> (table, record id column), each table has a (userId, createdAt) index
+HISTORY_TABLES = {
+    "transactions": ("transactions", "transactionId"),
+    "spins": ("spin_results", "spinId"),
+    "notifications": ("notifications", "notificationId")
+}
+TABLES = ("players", "transactions", "spin_results", "notifications")
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS players (
+        userId PRIMARY KEY,
+        balance REAL NOT NULL,
+        currency TEXT NOT NULL,
+        version INTEGER NOT NULL DEFAULT 1
+    )""",
+    """CREATE TABLE IF NOT EXISTS transactions (
+        transactionId TEXT PRIMARY KEY,
+        userId NOT NULL,
+        createdAt REAL,
+        data TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS transactions_user ON transactions (userId, createdAt)",
+    """CREATE TABLE IF NOT EXISTS spin_results (
+        spinId TEXT PRIMARY KEY,
+        transactionId TEXT,
+        userId,
+        createdAt REAL,
+        data TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS spin_results_user ON spin_results (userId, createdAt)",
+    "CREATE INDEX IF NOT EXISTS spin_results_transaction ON spin_results (transactionId)",
+    """CREATE TABLE IF NOT EXISTS notifications (
+        notificationId TEXT PRIMARY KEY,
+        transactionId TEXT,
+        userId,
+        status TEXT,
+        createdAt REAL,
+        data TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS notifications_user ON notifications (userId, createdAt)",
+    "CREATE INDEX IF NOT EXISTS notifications_transaction ON notifications (transactionId)",
+    # responses of idempotent requests, status stays NULL while the claiming request runs
+    """CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key TEXT PRIMARY KEY,
+        fingerprint TEXT NOT NULL,
+        status INTEGER,
+        body TEXT,
+        expires REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idempotency_keys_expires ON idempotency_keys (expires)",
+    # running game totals: one row per player, one for the casino and one per rollup bucket
+    """CREATE TABLE IF NOT EXISTS game_stats (
+        scope TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        bets INTEGER NOT NULL,
+        wagered REAL NOT NULL,
+        spins INTEGER NOT NULL,
+        wins INTEGER NOT NULL,
+        payouts INTEGER NOT NULL,
+        paid REAL NOT NULL,
+        players INTEGER NOT NULL,
+        PRIMARY KEY (scope, bucket)
+    ) WITHOUT ROWID"""
+]
+
+# statements are module constants so every pooled connection reuses its prepared copy
+SELECT_PLAYER = "SELECT userId, balance, currency, version FROM players WHERE userId = ?"
+SELECT_PLAYERS = "SELECT userId, balance, currency, version FROM players WHERE userId IN ({})"
+INSERT_PLAYER = "INSERT OR REPLACE INTO players (userId, balance, currency, version) VALUES (?, ?, ?, 1)"
+DEBIT_PLAYER = """UPDATE players SET balance = balance - ?, version = version + 1
+    WHERE userId = ? AND balance >= ? RETURNING balance, version"""
+CREDIT_PLAYER = "UPDATE players SET balance = balance + ?, version = version + 1 WHERE userId = ? RETURNING balance, version"
+SET_PLAYER_BALANCE = "UPDATE players SET balance = ?, version = version + 1 WHERE userId = ? RETURNING balance, version"
+INSERT_TRANSACTION = "INSERT INTO transactions (transactionId, userId, createdAt, data) VALUES (?, ?, ?, ?)"
+SELECT_TRANSACTION = "SELECT data FROM transactions WHERE transactionId = ?"
+# sets only the given fields, so concurrent updates of other fields (outcome, payout) are kept
+UPDATE_TRANSACTION = "UPDATE transactions SET data = json_set(data{}) WHERE transactionId = ?"
+INSERT_SPIN = "INSERT INTO spin_results (spinId, transactionId, userId, createdAt, data) VALUES (?, ?, ?, ?, ?)"
+INSERT_NOTIFICATION = """INSERT INTO notifications (notificationId, transactionId, userId, status, createdAt, data)
+    VALUES (?, ?, ?, ?, ?, ?)"""
+SELECT_NOTIFICATION = "SELECT data FROM notifications WHERE notificationId = ?"
+UPDATE_NOTIFICATION = "UPDATE notifications SET status = ?, data = ? WHERE notificationId = ?"
+# claims a new key, or one whose claim or response has expired
+CLAIM_IDEMPOTENCY_KEY = """INSERT INTO idempotency_keys (key, fingerprint, status, body, expires) VALUES (?, ?, NULL, NULL, ?)
+    ON CONFLICT (key) DO UPDATE SET fingerprint = excluded.fingerprint, status = NULL, body = NULL,
+    expires = excluded.expires WHERE idempotency_keys.expires <= ?"""
+SELECT_IDEMPOTENCY_KEY = "SELECT fingerprint, status, body FROM idempotency_keys WHERE key = ?"
+STORE_IDEMPOTENCY_RESULT = "UPDATE idempotency_keys SET status = ?, body = ?, expires = ? WHERE key = ?"
+DELETE_IDEMPOTENCY_KEY = "DELETE FROM idempotency_keys WHERE key = ?"
+PURGE_IDEMPOTENCY_KEYS = "DELETE FROM idempotency_keys WHERE expires <= ?"
+# game_stats scopes; rollup buckets are scoped "rollup:<name>" and numbered, the others use bucket 0
+CASINO_STATS_SCOPE = "casino"
+USER_STATS_SCOPE = "user:"
+ROLLUP_STATS_SCOPE = "rollup:"
+# adds to a row and returns its event count, 1 means the row is new
+ADD_GAME_STATS = """INSERT INTO game_stats (scope, bucket, bets, wagered, spins, wins, payouts, paid, players)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (scope, bucket) DO UPDATE SET bets = bets + excluded.bets, wagered = wagered + excluded.wagered,
+    spins = spins + excluded.spins, wins = wins + excluded.wins, payouts = payouts + excluded.payouts,
+    paid = paid + excluded.paid, players = players + excluded.players
+    RETURNING bets + spins + payouts"""
+DROP_GAME_STATS_BUCKETS = "DELETE FROM game_stats WHERE scope = ? AND bucket <= ?"
+SELECT_GAME_STATS = "SELECT bets, wagered, spins, wins, payouts, paid, players FROM game_stats WHERE scope = ? AND bucket = 0"
+SELECT_GAME_STATS_BUCKETS = """SELECT bucket, bets, wagered, spins, wins, payouts, paid FROM game_stats
+    WHERE scope = ? AND bucket BETWEEN ? AND ? ORDER BY bucket"""
+
+
+def _encode(record):
+    return json.dumps(record, separators=(",", ":"))
+
+
+class SQLiteStorage(Storage):
+    """Storage in one SQLite file shared by a fixed pool of connections
+
+    The database runs in WAL mode so readers never block the writer. Every
+    balance change is a single UPDATE ... RETURNING statement in its own
+    transaction, so the sufficiency check and the debit cannot interleave
+    with another request, across threads or processes.
+    """
+
+    def __init__(self, path, pool_size=DEFAULT_POOL_SIZE):
+        self.path = path
+        self._pool = queue.LifoQueue()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._connection() as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(players)")]
+            if "version" not in columns:
+                # files created before balances were versioned
+                connection.execute("ALTER TABLE players ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+    def _connect(self):
+        connection = sqlite3.connect(
+            self.path,
+            timeout=30,
+            isolation_level=None,  # autocommit, each statement is its own transaction
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connections_lock:
+            self._connections.append(connection)
+        return connection
+
+    @contextmanager
+    def _connection(self):
+        connection = self._pool.get()
+        try:
+            yield connection
+        finally:
+            self._pool.put(connection)
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+
+    # players
+
+    def get_player(self, userId):
+        try:
+            with self._connection() as connection:
+                row = connection.execute(SELECT_PLAYER, (userId,)).fetchone()
+        except (sqlite3.InterfaceError, sqlite3.ProgrammingError):
+            # ids sqlite can't bind (lists, dicts) coming from a bad json payload
+            return None
+        return Player(*row) if row else None
+
+    def get_players(self, userIds):
+        userIds = list(userIds)
+        found = {}
+        try:
+            with self._connection() as connection:
+                for start in range(0, len(userIds), IN_CHUNK_SIZE):
+                    chunk = userIds[start:start + IN_CHUNK_SIZE]
+                    statement = SELECT_PLAYERS.format(",".join("?" * len(chunk)))
+                    for row in connection.execute(statement, chunk):
+                        found[row[0]] = Player(*row)
+        except (sqlite3.InterfaceError, sqlite3.ProgrammingError):
+            return super().get_players(userIds)
+        return [found.get(userId) for userId in userIds]
+
+    def add_player(self, userId, balance, currency="USD"):
+        with self._connection() as connection:
+            connection.execute(INSERT_PLAYER, (userId, balance, currency))
+        return Player(userId, balance, currency)
+
+    def _update_balance(self, statement, params, player):
+        with self._connection() as connection:
+            row = connection.execute(statement, params).fetchone()
+        if row is None:
+            return None
+        player.balance, player.version = row
+        return player.balance
+
+    def debit_if_sufficient(self, player, amount):
+        return self._update_balance(DEBIT_PLAYER, (amount, player.userId, amount), player)
+
+    def credit(self, player, amount):
+        return self._update_balance(CREDIT_PLAYER, (amount, player.userId), player)
+
+    def set_balance(self, player, balance):
+        return self._update_balance(SET_PLAYER_BALANCE, (balance, player.userId), player)
+
+    # records
+
+    def _get_record(self, statement, record_id):
+        try:
+            with self._connection() as connection:
+                row = connection.execute(statement, (record_id,)).fetchone()
+        except (sqlite3.InterfaceError, sqlite3.ProgrammingError):
+            return None
+        return json.loads(row[0]) if row else None
+
+    def add_transaction(self, transaction):
+        with self._connection() as connection:
+            connection.execute(INSERT_TRANSACTION, (
+                transaction["transactionId"], transaction["userId"], transaction.get("createdAt"), _encode(transaction)
+            ))
+        return transaction
+
+    def get_transaction(self, transactionId):
+        return self._get_record(SELECT_TRANSACTION, transactionId)
+
+    def update_transaction(self, transaction, **fields):
+        transaction.update(fields)
+        params = []
+        for name, value in fields.items():
+            params += (f'$."{name}"', _encode(value))
+        statement = UPDATE_TRANSACTION.format(", ?, json(?)" * len(fields))
+        with self._connection() as connection:
+            connection.execute(statement, (*params, transaction["transactionId"]))
+        return transaction
+
+    def add_spin(self, spin):
+        with self._connection() as connection:
+            connection.execute(INSERT_SPIN, (
+                spin["spinId"], spin["transactionId"], spin["userId"], spin.get("createdAt"), _encode(spin)
+            ))
+        return spin
+
+    def add_notification(self, notification):
+        with self._connection() as connection:
+            connection.execute(INSERT_NOTIFICATION, (
+                notification["notificationId"], notification["transactionId"], notification["userId"],
+                notification.get("status"), notification.get("createdAt"), _encode(notification)
+            ))
+        return notification
+
+    def get_notification(self, notificationId):
+        return self._get_record(SELECT_NOTIFICATION, notificationId)
+
+    def update_notifications(self, notifications, **fields):
+        for notification in notifications:
+            notification.update(fields)
+        rows = [(n.get("status"), _encode(n), n["notificationId"]) for n in notifications]
+        with self._connection() as connection:
+            # one transaction for the whole batch
+            connection.execute("BEGIN")
+            try:
+                connection.executemany(UPDATE_NOTIFICATION, rows)
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def history(self, kind, userId, since=None, until=None, before=None):
+        table, id_column = HISTORY_TABLES[kind]
+        conditions = ["userId = ?"]
+        params = [userId]
+        if since is not None:
+            conditions.append("createdAt >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("createdAt < ?")
+            params.append(until)
+        statement = (f"SELECT createdAt, {id_column}, data FROM {table} WHERE {' AND '.join(conditions)}"
+                     f" {{}} ORDER BY createdAt DESC, {id_column} DESC LIMIT {HISTORY_CHUNK}")
+        resume = f"AND (createdAt, {id_column}) < (?, ?)"
+        # one keyset query per chunk, the pooled connection is not held while the caller consumes rows
+        while True:
+            with self._connection() as connection:
+                if before is None:
+                    rows = connection.execute(statement.format(""), params).fetchall()
+                else:
+                    rows = connection.execute(statement.format(resume), params + list(before)).fetchall()
+            for createdAt, record_id, data in rows:
+                yield (createdAt, record_id), json.loads(data)
+            if len(rows) < HISTORY_CHUNK:
+                return
+            before = rows[-1][:2]
+
+    # idempotency keys, shared by every process using the file
+
+    def claim_idempotency_key(self, key, fingerprint, now, lease_until):
+        """(True, None) when this call claimed key, otherwise (False, (fingerprint, status, body) or None)"""
+        with self._connection() as connection:
+            if connection.execute(CLAIM_IDEMPOTENCY_KEY, (key, fingerprint, lease_until, now)).rowcount:
+                return True, None
+            row = connection.execute(SELECT_IDEMPOTENCY_KEY, (key,)).fetchone()
+        if row is None:
+            return False, None
+        fingerprint, status, body = row
+        return False, (fingerprint, status, json.loads(body) if body is not None else None)
+
+    def store_idempotency_result(self, key, body, status, expires):
+        with self._connection() as connection:
+            connection.execute(STORE_IDEMPOTENCY_RESULT, (status, _encode(body), expires, key))
+
+    def release_idempotency_key(self, key):
+        with self._connection() as connection:
+            connection.execute(DELETE_IDEMPOTENCY_KEY, (key,))
+
+    def purge_idempotency_keys(self, now):
+        with self._connection() as connection:
+            connection.execute(PURGE_IDEMPOTENCY_KEYS, (now,))
+
+    def clear_idempotency_keys(self):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM idempotency_keys")
+
+    # game statistics, shared by every process using the file
+
+    def add_game_stats(self, userId, totals, buckets):
+        """Add totals (bets, wagered, spins, wins, payouts, paid) to a player, the casino and rollup buckets
+
+        buckets are (rollup name, bucket number, buckets kept); the first
+        event of a bucket drops the ones that have left its ring.
+        """
+        with self._connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                user_scope = USER_STATS_SCOPE + _encode(userId)
+                events = connection.execute(ADD_GAME_STATS, (user_scope, 0, *totals, 0)).fetchall()[0][0]
+                connection.execute(ADD_GAME_STATS, (CASINO_STATS_SCOPE, 0, *totals, int(events == 1))).fetchall()
+                for name, number, size in buckets:
+                    scope = ROLLUP_STATS_SCOPE + name
+                    if connection.execute(ADD_GAME_STATS, (scope, number, *totals, 0)).fetchall()[0][0] == 1:
+                        connection.execute(DROP_GAME_STATS_BUCKETS, (scope, number - size))
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def get_game_stats(self, userId=None):
+        """(bets, wagered, spins, wins, payouts, paid, players) of a player or the casino, or None"""
+        scope = CASINO_STATS_SCOPE if userId is None else USER_STATS_SCOPE + _encode(userId)
+        with self._connection() as connection:
+            return connection.execute(SELECT_GAME_STATS, (scope,)).fetchone()
+
+    def game_stats_buckets(self, name, first, last):
+        """(bucket number, bets, wagered, spins, wins, payouts, paid) of a rollup's buckets first..last"""
+        with self._connection() as connection:
+            return connection.execute(SELECT_GAME_STATS_BUCKETS, (ROLLUP_STATS_SCOPE + name, first, last)).fetchall()
+
+    def clear_game_stats(self):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM game_stats")
+
+    def sizes(self):
+        with self._connection() as connection:
+            return {
+                table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in TABLES
+            }
+
+    def reset(self):
+        with self._connection() as connection:
+            connection.execute("BEGIN")
+            for table in TABLES:
+                connection.execute(f"DELETE FROM {table}")
+            connection.execute("COMMIT")
@@ -0,0 +1,153 @@
+# storage interface - what the route handlers need from the database
+
+from player_store import PlayerStore
+from ledger import Ledger
+
+# record collections a user's history can be read from
+HISTORY_KINDS = ("transactions", "spins", "notifications")
+
+
+class BalanceOutOfRange(ValueError):
+    """A balance the backend can't represent, nothing was written"""
+
+
+class Storage:
+    """Players, transactions, spin results and notifications
+
+    Route handlers only talk to this interface. Player objects expose
+    userId / balance / currency; records are plain dicts and every change to
+    a stored record goes through an update_* call so backends that do not
+    share memory with the caller can persist it.
+    """
+
+    def get_player(self, userId):
+        raise NotImplementedError
+
+    def get_players(self, userIds):
+        return [self.get_player(userId) for userId in userIds]
+
+    def add_player(self, userId, balance, currency="USD"):
+        raise NotImplementedError
+
+    def debit_if_sufficient(self, player, amount):
+        """Atomically take amount from the balance, returns the new balance or None if it is too low"""
+        raise NotImplementedError
+
+    def credit(self, player, amount):
+        raise NotImplementedError
+
+    def set_balance(self, player, balance):
+        raise NotImplementedError
+
+    def add_transaction(self, transaction):
+        raise NotImplementedError
+
+    def get_transaction(self, transactionId):
+        raise NotImplementedError
+
+    def get_transactions(self, transactionIds):
+        return [self.get_transaction(transactionId) for transactionId in transactionIds]
+
+    def update_transaction(self, transaction, **fields):
+        raise NotImplementedError
+
+    def add_spin(self, spin):
+        raise NotImplementedError
+
+    def add_notification(self, notification):
+        raise NotImplementedError
+
+    def get_notification(self, notificationId):
+        raise NotImplementedError
+
+    def update_notifications(self, notifications, **fields):
+        raise NotImplementedError
+
+    def history(self, kind, userId, since=None, until=None, before=None):
+        """Yield (key, record) for one user's records of a HISTORY_KINDS kind, newest first
+
+        key is (createdAt, record id); since is inclusive, until exclusive,
+        and passing the last key seen as before resumes after it.
+        """
+        raise NotImplementedError
+
+    def sizes(self):
+        """Record counts per collection"""
+        raise NotImplementedError
+
+    def reset(self):
+        """Drop every player and record (test isolation, not for live traffic)"""
+        raise NotImplementedError
+
+
+class InMemoryStorage(Storage):
+    """The original in-process store: a PlayerStore plus three Ledgers"""
+
+    def __init__(self, players=None, transactions=None, spin_results=None, notifications=None):
+        self.players = players if players is not None else PlayerStore()
+        self.transactions = transactions if transactions is not None else Ledger("transactionId", index_by="userId")
+        self.spin_results = spin_results if spin_results is not None else Ledger("spinId", index_by="userId")
+        self.notifications = notifications if notifications is not None else Ledger("notificationId", index_by="userId")
+        self._history = {"transactions": self.transactions, "spins": self.spin_results, "notifications": self.notifications}
+
+    def get_player(self, userId):
+        return self.players.get(userId)
+
+    def get_players(self, userIds):
+        return self.players.get_many(userIds)
+
+    def add_player(self, userId, balance, currency="USD"):
+        return self.players.add(userId, balance, currency)
+
+    def debit_if_sufficient(self, player, amount):
+        return self.players.debit_if_sufficient(player, amount)
+
+    def credit(self, player, amount):
+        return self.players.credit(player, amount)
+
+    def set_balance(self, player, balance):
+        return self.players.set_balance(player, balance)
+
+    def add_transaction(self, transaction):
+        return self.transactions.add(transaction)
+
+    def get_transaction(self, transactionId):
+        return self.transactions.get(transactionId)
+
+    def get_transactions(self, transactionIds):
+        return self.transactions.get_many(transactionIds)
+
+    def update_transaction(self, transaction, **fields):
+        # records are shared with the ledger, updating the dict is enough
+        transaction.update(fields)
+        return transaction
+
+    def add_spin(self, spin):
+        return self.spin_results.add(spin)
+
+    def add_notification(self, notification):
+        return self.notifications.add(notification)
+
+    def get_notification(self, notificationId):
+        return self.notifications.get(notificationId)
+
+    def update_notifications(self, notifications, **fields):
+        for notification in notifications:
+            notification.update(fields)
+
+    def history(self, kind, userId, since=None, until=None, before=None):
+        return self._history[kind].history(userId, since, until, before)
+
+    def sizes(self):
+        return {
+            "players": len(self.players),
+            "transactions": len(self.transactions),
+            "spin_results": len(self.spin_results),
+            "notifications": len(self.notifications)
+        }
+
+    def reset(self):
+        self.players.clear()
+        self.transactions.clear()
+        self.spin_results.clear()
+        self.notifications.clear()
@@ -1,40 +1,312 @@
 import requests
+import json
 import os
+import threading
+import time
+from collections import deque
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "10"))
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "20"))
+API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "3"))
+API_RETRY_BACKOFF = float(os.getenv("API_RETRY_BACKOFF", "0.1"))
+# "http" talks to API_BASE_URL, "wsgi" calls the Flask app in this process (no server needed)
+API_TRANSPORT = os.getenv("API_TRANSPORT", "http")
 
-def make_request(endpoint, method, **kwargs):
-    url = f"{API_BASE_URL}{endpoint}"
-    try:
-        response = requests.request(
-            method=method,
-            url=url,
-            **kwargs
-        )
+# only calls that are safe to repeat are retried after a response error
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = (502, 503, 504)
+LATENCY_HISTORY = 100_000
+# balance reads revalidate the last response with If-None-Match, 0 turns it off
+API_BALANCE_CACHE = os.getenv("API_BALANCE_CACHE", "1") != "0"
+BALANCE_CACHE_SIZE = 10_000
+
+
+def latency_summary(seconds):
+    # count / percentiles / max of a list of durations
+    seconds = sorted(seconds)
+    if not seconds:
+        return {"count": 0}
+    return {
+        "count": len(seconds),
+        "mean": sum(seconds) / len(seconds),
+        "p50": seconds[int(len(seconds) * 0.50)],
+        "p95": seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))],
+        "p99": seconds[min(len(seconds) - 1, int(len(seconds) * 0.99))],
+        "max": seconds[-1]
+    }
+
+
+class LatencyRecorder:
+    # keeps the most recent call timings so callers can inspect client-side latency
+    def __init__(self, maxlen=LATENCY_HISTORY):
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, method, endpoint, status_code, seconds):
+        with self._lock:
+            self._samples.append({"method": method, "endpoint": endpoint, "statusCode": status_code, "seconds": seconds})
+
+    def samples(self, endpoint=None):
+        with self._lock:
+            samples = list(self._samples)
+        if endpoint is None:
+            return samples
+        return [s for s in samples if s["endpoint"] == endpoint]
+
+    def summary(self):
+        by_endpoint = {}
+        for sample in self.samples():
+            by_endpoint.setdefault(sample["endpoint"], []).append(sample["seconds"])
+        return {endpoint: latency_summary(seconds) for endpoint, seconds in by_endpoint.items()}
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+class BalanceCache:
+    # last 200 response of /user/balance per user, a 304 for its ETag hands it back
+    def __init__(self, maxsize=BALANCE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.revalidated = 0
+
+    def headers(self, userId):
+        entry = self._entries.get(str(userId))
+        return {"If-None-Match": entry[0]} if entry is not None else None
+
+    def resolve(self, userId, response):
+        key = str(userId)
+        with self._lock:
+            if response.status_code == 304:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.revalidated += 1
+                    return entry[1]
+            elif response.status_code == 200 and response.headers.get("ETag"):
+                if key not in self._entries and len(self._entries) >= self.maxsize:
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = (response.headers["ETag"], response)
+            else:
+                self._entries.pop(key, None)
         return response
-    except requests.exceptions.RequestException as e:
-        raise requests.exceptions.RequestException(f"Request failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.revalidated = 0
+
+
+def create_session(pool_size=API_POOL_SIZE, max_retries=API_MAX_RETRIES, backoff=API_RETRY_BACKOFF):
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=IDEMPOTENT_METHODS,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    new_session = requests.Session()
+    new_session.mount("http://", adapter)
+    new_session.mount("https://", adapter)
+    return new_session
+
+
+# one keep-alive connection pool shared by every service class
+session = create_session()
+latency = LatencyRecorder()
+balance_cache = BalanceCache()
+
+
+class WsgiResponse:
+    # the parts of requests.Response the tests use, built from a werkzeug test response
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.content = response.get_data()
+        # like a server after sending the body, so wsgi middleware sees the request end
+        response.close()
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_lines(self):
+        return iter(self.content.splitlines())
+
+
+class HttpTransport:
+    # real HTTP through the shared keep-alive session
+    def __init__(self, base_url=API_BASE_URL):
+        self.base_url = base_url
+
+    def request(self, method, endpoint, timeout, **kwargs):
+        try:
+            return session.request(method=method, url=f"{self.base_url}{endpoint}", timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            raise requests.exceptions.RequestException(f"Request failed: {e}")
+
+
+class WsgiTransport:
+    # dispatches straight into the Flask app through its test client, timeouts don't apply
+    def __init__(self, app=None):
+        if app is None:
+            from app import app
+        self.client = app.test_client(use_cookies=False)
+
+    def request(self, method, endpoint, timeout, params=None, stream=False, **kwargs):
+        return WsgiResponse(self.client.open(endpoint, method=method, query_string=params, **kwargs))
+
+
+TRANSPORTS = {"http": HttpTransport, "wsgi": WsgiTransport}
+
+
+def create_transport(name=API_TRANSPORT):
+    if name not in TRANSPORTS:
+        raise ValueError(f"unknown API_TRANSPORT {name!r}, expected one of {sorted(TRANSPORTS)}")
+    return TRANSPORTS[name]()
+
+
+transport = create_transport()
+
+
+def configure(pool_size=API_POOL_SIZE, max_retries=API_MAX_RETRIES, backoff=API_RETRY_BACKOFF, timeout=None,
+              transport_name=None):
+    # rebuild the shared session, e.g. with a bigger pool for load tests, or switch transport
+    global session, transport, API_TIMEOUT
+    old_session, session = session, create_session(pool_size, max_retries, backoff)
+    old_session.close()
+    if timeout is not None:
+        API_TIMEOUT = timeout
+    if transport_name is not None:
+        transport = create_transport(transport_name)
+        balance_cache.clear()
+
+
+def idempotency_headers(idempotency_key):
+    # retries sent with the same key are answered with the first response
+    return {"Idempotency-Key": idempotency_key} if idempotency_key is not None else None
+
+
+def make_request(endpoint, method, timeout=None, **kwargs):
+    start = time.perf_counter()
+    response = transport.request(method, endpoint, timeout or API_TIMEOUT, **kwargs)
+    latency.record(method, endpoint, response.status_code, time.perf_counter() - start)
+    return response
+
+
+def history_params(params):
+    # leave out the filters the caller did not set
+    return {name: value for name, value in params.items() if value is not None}
+
 
 class UserService:
-    def get_balance(self, userId):
-        return make_request(endpoint="/user/balance", method="GET", params={"userId": userId})
+    def get_balance(self, userId, timeout=None, revalidate=API_BALANCE_CACHE):
+        # with revalidate an unchanged balance comes back as a 304 and the cached 200 is returned
+        if not revalidate:
+            return make_request(endpoint="/user/balance", method="GET", params={"userId": userId}, timeout=timeout)
+        response = make_request(endpoint="/user/balance", method="GET", params={"userId": userId}, timeout=timeout,
+                                headers=balance_cache.headers(userId))
+        return balance_cache.resolve(userId, response)
+
+    def get_balances(self, userIds, timeout=None):
+        # many balances in one call, unknown ids come back under "missing"
+        return make_request(endpoint="/user/balances", method="GET", params={"userId": list(userIds)}, timeout=timeout)
+
+    def get_history(self, userId, type=None, since=None, until=None, limit=None, cursor=None, timeout=None):
+        # one page, pass the response's nextCursor back as cursor= for the next one
+        params = {"userId": userId, "type": type, "since": since, "until": until, "limit": limit, "cursor": cursor}
+        return make_request(endpoint="/user/history", method="GET", params=history_params(params), timeout=timeout)
 
-    def update_balance(self, userId, newBalance):
-        return make_request(endpoint="/user/update-balance", method="POST", json={"userId": userId, "newBalance": newBalance})
+    def stream_history(self, userId, type=None, since=None, until=None, limit=None, timeout=None):
+        # every matching record, read line by line from the ndjson stream
+        params = {"userId": userId, "type": type, "since": since, "until": until, "limit": limit, "format": "ndjson"}
+        response = make_request(endpoint="/user/history", method="GET", params=history_params(params), timeout=timeout, stream=True)
+        if response.status_code != 200:
+            raise RuntimeError(f"history stream failed with {response.status_code}: {response.text}")
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+    def update_balance(self, userId, newBalance, timeout=None):
+        return make_request(endpoint="/user/update-balance", method="POST", json={"userId": userId, "newBalance": newBalance}, timeout=timeout)
 
 class PaymentService:
-    def place_bet(self, userId, betAmount):
-        return make_request(endpoint="/payment/placeBet", method="POST", json={"userId": userId, "betAmount": betAmount})
+    def place_bet(self, userId, betAmount, timeout=None, idempotency_key=None):
+        return make_request(endpoint="/payment/placeBet", method="POST", json={"userId": userId, "betAmount": betAmount}, timeout=timeout, headers=idempotency_headers(idempotency_key))
+
+    def place_bets(self, bets, timeout=None):
+        # bets: list of {"userId": ..., "betAmount": ...}
+        return make_request(endpoint="/payment/placeBets", method="POST", json={"bets": bets}, timeout=timeout)
     
-    def payout(self, userId, transactionId, winAmount):
-        return make_request(endpoint="/payment/payout", method="POST", json={"userId": userId, "transactionId": transactionId, "winAmount": winAmount})
+    def payout(self, userId, transactionId, winAmount, timeout=None, idempotency_key=None):
+        return make_request(endpoint="/payment/payout", method="POST", json={"userId": userId, "transactionId": transactionId, "winAmount": winAmount}, timeout=timeout, headers=idempotency_headers(idempotency_key))
 
 class GameService:
-    def spin(self, userId, betAmount, transactionId):
-        return make_request(endpoint="/slot/spin", method="POST", json={"userId": userId, "betAmount": betAmount, "transactionId": transactionId})
+    def spin(self, userId, betAmount, transactionId, timeout=None, idempotency_key=None):
+        return make_request(endpoint="/slot/spin", method="POST", json={"userId": userId, "betAmount": betAmount, "transactionId": transactionId}, timeout=timeout, headers=idempotency_headers(idempotency_key))
+
+    def spin_many(self, spins, timeout=None):
+        # spins: list of {"userId": ..., "betAmount": ..., "transactionId": ...}
+        return make_request(endpoint="/slot/spinMany", method="POST", json={"spins": spins}, timeout=timeout)
+
+    def play(self, userId, betAmount, message=None, timeout=None):
+        # bet, spin, payout on WIN and notification in a single call
+        payload = {"userId": userId, "betAmount": betAmount}
+        if message is not None:
+            payload["message"] = message
+        return make_request(endpoint="/game/play", method="POST", json=payload, timeout=timeout)
 
 class NotificationService:
-    def send_notification(self, userId, transactionId, message):
-        return make_request(endpoint="/notify", method="POST", json={"userId": userId, "transactionId": transactionId, "message": message})
+    def send_notification(self, userId, transactionId, message, timeout=None):
+        return make_request(endpoint="/notify", method="POST", json={"userId": userId, "transactionId": transactionId, "message": message}, timeout=timeout)
+
+    def get_status(self, notificationId, timeout=None):
+        return make_request(endpoint="/notify/status", method="GET", params={"notificationId": notificationId}, timeout=timeout)
+
+    def get_metrics(self, timeout=None):
+        return make_request(endpoint="/notify/metrics", method="GET", timeout=timeout)
+
+class MetricsService:
+    def scrape(self, timeout=None):
+        # prometheus text format, read it from response.text
+        return make_request(endpoint="/metrics", method="GET", timeout=timeout)
+
+class StatsService:
+    def get(self, userId=None, timeout=None):
+        # casino-wide totals and rollups, or one player's totals
+        params = {"userId": userId} if userId is not None else None
+        return make_request(endpoint="/stats", method="GET", params=params, timeout=timeout)
+
+class AdminService:
+    def create_user(self, balance=None, currency=None, timeout=None):
+        # an isolated user with a fresh id, defaults to the server's starting balance
+        payload = {}
+        if balance is not None:
+            payload["balance"] = balance
+        if currency is not None:
+            payload["currency"] = currency
+        return make_request(endpoint="/admin/users", method="POST", json=payload, timeout=timeout)
+
+    def reset(self, timeout=None):
+        return make_request(endpoint="/admin/reset", method="POST", timeout=timeout)
 
+    def start_profile(self, requests=None, seconds=None, interval=None, timeout=None):
+        # profile the next `requests` requests or a `seconds` long window
+        payload = {"requests": requests, "seconds": seconds, "interval": interval}
+        return make_request(endpoint="/admin/profile", method="POST", json={k: v for k, v in payload.items() if v is not None}, timeout=timeout)
 
+    def get_profile(self, collapsed=False, timeout=None):
+        params = {"format": "collapsed"} if collapsed else None
+        return make_request(endpoint="/admin/profile", method="GET", params=params, timeout=timeout)
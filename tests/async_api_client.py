@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+import aiohttp
+
+from tests.api_client import API_BASE_URL, API_TIMEOUT, latency_summary
+
+DEFAULT_POOL_SIZE = 100
+DEFAULT_CONCURRENCY = 100
+SESSION_STEPS = ("balance", "placeBet", "spin", "payout", "notify")
+
+
+class AsyncResponse:
+    # mirrors the bits of requests.Response the tests use
+    def __init__(self, status_code, data, headers):
+        self.status_code = status_code
+        self.headers = headers
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class AsyncClient:
+    # one aiohttp session (and connection pool) shared by all async service classes
+    def __init__(self, base_url=API_BASE_URL, pool_size=DEFAULT_POOL_SIZE, timeout=API_TIMEOUT):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = None
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size),
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def request(self, endpoint, method, timeout=None, **kwargs):
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        async with self.session.request(method, f"{self.base_url}{endpoint}", **kwargs) as response:
+            data = await response.json(content_type=None)
+            return AsyncResponse(response.status, data, response.headers)
+
+
+class AsyncUserService:
+    def __init__(self, client):
+        self.client = client
+
+    async def get_balance(self, userId, timeout=None):
+        return await self.client.request(endpoint="/user/balance", method="GET", params={"userId": userId}, timeout=timeout)
+
+    async def update_balance(self, userId, newBalance, timeout=None):
+        return await self.client.request(endpoint="/user/update-balance", method="POST", json={"userId": userId, "newBalance": newBalance}, timeout=timeout)
+
+class AsyncPaymentService:
+    def __init__(self, client):
+        self.client = client
+
+    async def place_bet(self, userId, betAmount, timeout=None):
+        return await self.client.request(endpoint="/payment/placeBet", method="POST", json={"userId": userId, "betAmount": betAmount}, timeout=timeout)
+
+    async def place_bets(self, bets, timeout=None):
+        return await self.client.request(endpoint="/payment/placeBets", method="POST", json={"bets": bets}, timeout=timeout)
+
+    async def payout(self, userId, transactionId, winAmount, timeout=None):
+        return await self.client.request(endpoint="/payment/payout", method="POST", json={"userId": userId, "transactionId": transactionId, "winAmount": winAmount}, timeout=timeout)
+
+class AsyncGameService:
+    def __init__(self, client):
+        self.client = client
+
+    async def spin(self, userId, betAmount, transactionId, timeout=None):
+        return await self.client.request(endpoint="/slot/spin", method="POST", json={"userId": userId, "betAmount": betAmount, "transactionId": transactionId}, timeout=timeout)
+
+    async def spin_many(self, spins, timeout=None):
+        return await self.client.request(endpoint="/slot/spinMany", method="POST", json={"spins": spins}, timeout=timeout)
+
+    async def play(self, userId, betAmount, message=None, timeout=None):
+        payload = {"userId": userId, "betAmount": betAmount}
+        if message is not None:
+            payload["message"] = message
+        return await self.client.request(endpoint="/game/play", method="POST", json=payload, timeout=timeout)
+
+class AsyncNotificationService:
+    def __init__(self, client):
+        self.client = client
+
+    async def send_notification(self, userId, transactionId, message, timeout=None):
+        return await self.client.request(endpoint="/notify", method="POST", json={"userId": userId, "transactionId": transactionId, "message": message}, timeout=timeout)
+
+    async def get_status(self, notificationId, timeout=None):
+        return await self.client.request(endpoint="/notify/status", method="GET", params={"notificationId": notificationId}, timeout=timeout)
+
+    async def get_metrics(self, timeout=None):
+        return await self.client.request(endpoint="/notify/metrics", method="GET", timeout=timeout)
+
+
+async def _timed(step, timings, call):
+    start = time.perf_counter()
+    response = await call
+    timings[step].append(time.perf_counter() - start)
+    if response.status_code != 200:
+        raise RuntimeError(f"{step} failed with {response.status_code}: {response.json()}")
+    return response.json()
+
+
+async def play_session(services, user_id, bet_amount, timings):
+    # same flow as test_complete_end_to_end_game_flow: balance, bet, spin, payout on WIN, notify
+    users, payments, games, notifications = services
+    await _timed("balance", timings, users.get_balance(user_id))
+    bet = await _timed("placeBet", timings, payments.place_bet(user_id, bet_amount))
+    transaction_id = bet["transactionId"]
+    spin = await _timed("spin", timings, games.spin(user_id, bet_amount, transaction_id))
+    if spin["outcome"] == "WIN":
+        await _timed("payout", timings, payments.payout(user_id, transaction_id, spin["winAmount"]))
+    await _timed("notify", timings, notifications.send_notification(user_id, transaction_id, spin["message"]))
+    return spin["outcome"]
+
+
+async def run_sessions(sessions, concurrency=DEFAULT_CONCURRENCY, user_ids=(123,), bet_amount=0.01,
+                       base_url=API_BASE_URL, pool_size=None):
+    # run `sessions` game sessions with at most `concurrency` in flight, report per-step latency
+    timings = {step: [] for step in SESSION_STEPS}
+    outcomes = {"WIN": 0, "LOSE": 0}
+    errors = []
+    limit = asyncio.Semaphore(concurrency)
+
+    async with AsyncClient(base_url, pool_size=pool_size or concurrency) as client:
+        services = (AsyncUserService(client), AsyncPaymentService(client), AsyncGameService(client), AsyncNotificationService(client))
+
+        async def one(n):
+            async with limit:
+                try:
+                    outcome = await play_session(services, user_ids[n % len(user_ids)], bet_amount, timings)
+                    outcomes[outcome] += 1
+                except Exception as e:
+                    errors.append(str(e))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in range(sessions)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "sessionsPerSecond": sessions / elapsed if elapsed else None,
+        "outcomes": outcomes,
+        "errors": len(errors),
+        "errorSamples": errors[:10],
+        "steps": {step: latency_summary(seconds) for step, seconds in timings.items()}
+    }
+
+
+def run_concurrent_sessions(sessions, concurrency=DEFAULT_CONCURRENCY, **options):
+    # synchronous entry point for scripts and pytest
+    return asyncio.run(run_sessions(sessions, concurrency, **options))
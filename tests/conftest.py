@@ -1,6 +1,14 @@
-from tests.api_client import UserService, PaymentService, GameService, NotificationService
-from tests.test_data import TEST_DATA, get_user, get_bet_amount, get_balance, get_scenario, get_negative_data
+import os
+
+# the tests create their own users through /admin/users; an in-process app reads this on import
+os.environ.setdefault("CASINO_ADMIN_API", "1")
+
+from tests.api_client import UserService, PaymentService, GameService, NotificationService, AdminService, MetricsService, StatsService, WsgiTransport
+from tests.test_data import TEST_DATA, for_user, get_user, get_bet_amount, get_balance, get_scenario, get_negative_data
 import pytest
+import time
+
+NOTIFICATION_DELIVERY_TIMEOUT = 5.0
 
 
 class TestHelpers:
@@ -84,17 +92,49 @@ class TestHelpers:
     def send_notification_and_verify(notification_service, user_id, transaction_id, message):
         notification_response = notification_service.send_notification(user_id, transaction_id, message)
         assert notification_response.status_code == 200
-        assert notification_response.json()["status"] == "SENT"
+        assert notification_response.json()["status"] == "QUEUED"
+        
+        notification_id = notification_response.json()["notificationId"]
+        assert TestHelpers.wait_for_notification_status(notification_service, notification_id) == "SENT"
         return notification_response
 
+    @staticmethod
+    def wait_for_notification_status(notification_service, notification_id, timeout=NOTIFICATION_DELIVERY_TIMEOUT):
+        # delivery is asynchronous, poll until the notification leaves the queue
+        deadline = time.monotonic() + timeout
+        while True:
+            status_response = notification_service.get_status(notification_id)
+            assert status_response.status_code == 200
+            status = status_response.json()["status"]
+            if status != "QUEUED" or time.monotonic() >= deadline:
+                return status
+            time.sleep(0.01)
+
+
+class FakeClock:
+    """Stands in for time.time / time.monotonic, tests move it by setting now"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
 
 @pytest.fixture
 def helpers():
     return TestHelpers()
 
 @pytest.fixture
-def test_data():
-    return TEST_DATA
+def tenant(admin_service):
+    # every test plays as its own fresh user, so tests (and xdist workers) never share a balance
+    response = admin_service.create_user(get_balance("medium"), TEST_DATA["currency"])
+    assert response.status_code == 201
+    return response.json()["userId"]
+
+@pytest.fixture
+def test_data(tenant):
+    return for_user(tenant)
 
 @pytest.fixture
 def user_service():
@@ -112,5 +152,38 @@ def game_service():
 def notification_service():
     return NotificationService()
 
+@pytest.fixture
+def admin_service():
+    return AdminService()
+
+@pytest.fixture
+def metrics_service():
+    return MetricsService()
+
+@pytest.fixture
+def stats_service():
+    return StatsService()
+
+@pytest.fixture
+def fake_clock():
+    return FakeClock()
+
+@pytest.fixture
+def patched_app(monkeypatch):
+    """patched_app(name=value, ...) swaps app globals and returns a WsgiTransport into it, whatever API_TRANSPORT is"""
+    import app as server
 
+    def patch(**attributes):
+        for name, value in attributes.items():
+            monkeypatch.setattr(server, name, value)
+        return WsgiTransport(server.app)
+
+    return patch
+
+@pytest.fixture
+def worker_storage(tmp_path):
+    """worker_storage() opens another SQLiteStorage on one file, as each serve.py worker process does"""
+    from sqlite_storage import SQLiteStorage
 
+    path = str(tmp_path / "casino.db")
+    return lambda: SQLiteStorage(path)
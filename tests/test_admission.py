@@ -0,0 +1,76 @@
+import pytest
+
+from admission import AdmissionController, TokenBuckets, parse_limits, retry_after
+
+
+def test_token_bucket_refills_at_its_rate(fake_clock):
+    fake_clock.now = 100.0  # buckets stamped 0.0 count as never used
+    buckets = TokenBuckets(rate=2, burst=3, slots=1024, clock=fake_clock)
+
+    assert [buckets.acquire(7) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.acquire(7) == pytest.approx(0.5)
+    assert buckets.acquire(8) == 0.0  # other users have their own bucket
+    fake_clock.now += 0.5
+    assert buckets.acquire(7) == 0.0
+    assert buckets.acquire(7, cost=10) == pytest.approx(1.5)  # waits for a full bucket
+    fake_clock.now += 1.5
+    assert buckets.acquire(7, cost=10) == 0.0
+    assert buckets.acquire(7) == pytest.approx(4.0)  # and then for the 7 tokens it went into debt
+    # snowflake user ids differ in their high bits only, they still spread over the table
+    assert len({buckets._slot(n << 22) for n in range(100)}) > 90
+
+
+def test_batches_are_admitted_all_or_nothing():
+    controller = AdmissionController(limits={"spin": (1, 2)}, slots=1024)
+    assert controller.admit_users("spin", {1: 1, 2: 2}) == 0.0
+    assert controller.admit_users("spin", {1: 1, 2: 1}) > 0  # user 2 is empty, user 1 gets its token back
+    assert controller.admit_users("spin", {1: 1}) == 0.0
+    assert controller.admit_users("read", {1: 100}) == 0.0  # no limit for the class
+    assert controller.stats["rate_limited"] == 1
+
+
+def test_limit_parsing_and_retry_after():
+    assert parse_limits("spin=20/40, wallet=5") == {"spin": (20.0, 40.0), "wallet": (5.0, 5.0)}
+    assert parse_limits(None) == {}
+    with pytest.raises(ValueError):
+        parse_limits("spin=fast")
+    assert retry_after(0.01) == "1"
+    assert retry_after(2.2) == "3"
+
+
+def test_in_flight_cap_sheds_load_with_503():
+    controller = AdmissionController(max_in_flight=1)
+    started = []
+
+    def slow_app(environ, start_response):
+        started.append(environ["PATH_INFO"])
+        start_response("200 OK", [])
+        return [b"ok"]
+
+    app = controller.wsgi_middleware(slow_app, exempt_prefixes=("/metrics",))
+    statuses = []
+    first = app({"PATH_INFO": "/slot/spin"}, lambda status, headers: statuses.append(status))
+    assert controller.in_flight == 1
+    shed = app({"PATH_INFO": "/slot/spin"}, lambda status, headers: statuses.append((status, dict(headers))))
+    app({"PATH_INFO": "/metrics"}, lambda status, headers: statuses.append(status))
+    first.close()
+
+    assert controller.in_flight == 0
+    assert b"overloaded" in b"".join(shed)
+    assert statuses[1][0].startswith("503") and statuses[1][1]["Retry-After"] == "1"
+    assert started == ["/slot/spin", "/metrics"]
+    assert controller.stats["overloaded"] == 1
+
+
+def test_rate_limited_user_gets_429(patched_app):
+    transport = patched_app(admission=AdmissionController(limits={"spin": (0.5, 2)}, slots=1024))
+    tenant, other = (transport.request("POST", "/admin/users", None, json={}).json()["userId"] for _ in range(2))
+
+    def play(userId):
+        return transport.request("POST", "/game/play", None, json={"userId": userId, "betAmount": 0.01})
+
+    assert [play(tenant).status_code for _ in range(3)] == [200, 200, 429]
+    assert play(tenant).headers["Retry-After"] == "2"
+    assert play(other).status_code == 200
+    # reads are not limited here
+    assert transport.request("GET", "/user/balance", None, params={"userId": tenant}).status_code == 200
@@ -0,0 +1,50 @@
+from tests import api_client
+from tests.api_client import LatencyRecorder, WsgiTransport, create_session
+
+
+def test_latency_summary_per_endpoint():
+    recorder = LatencyRecorder()
+    for i in range(100):
+        recorder.record("GET", "/user/balance", 200, (i + 1) / 1000)
+    recorder.record("POST", "/payment/placeBet", 200, 0.5)
+
+    summary = recorder.summary()
+    assert summary["/user/balance"]["count"] == 100
+    assert summary["/user/balance"]["p50"] == 0.051
+    assert summary["/user/balance"]["p99"] == 0.1
+    assert summary["/payment/placeBet"]["max"] == 0.5
+    assert len(recorder.samples("/payment/placeBet")) == 1
+
+
+def test_session_pools_connections_and_only_retries_idempotent_calls():
+    session = create_session(pool_size=7, max_retries=2, backoff=0.05)
+    adapter = session.get_adapter("http://localhost:8000")
+
+    assert adapter._pool_maxsize == 7
+    assert adapter.max_retries.total == 2
+    assert "GET" in adapter.max_retries.allowed_methods
+    assert "POST" not in adapter.max_retries.allowed_methods
+
+
+def test_calls_are_timed(user_service, test_data):
+    api_client.latency.clear()
+    user_service.get_balance(test_data["users"]["valid_user"])
+
+    samples = api_client.latency.samples("/user/balance")
+    assert len(samples) == 1
+    assert samples[0]["statusCode"] == 200
+    assert samples[0]["seconds"] > 0
+
+
+def test_wsgi_transport_calls_the_app_in_process():
+    import app as server
+
+    transport = WsgiTransport(server.app)
+    balance = transport.request("GET", "/user/balance", None, params={"userId": 123})
+    missing = transport.request("POST", "/payment/placeBet", None, json={"userId": 999999, "betAmount": 1})
+
+    assert balance.status_code == 200
+    assert balance.ok
+    assert balance.json()["userId"] == 123
+    assert missing.status_code == 404
+    assert not missing.ok
@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from tests.api_client import API_TRANSPORT
+from tests.async_api_client import SESSION_STEPS, run_concurrent_sessions
+
+pytestmark = pytest.mark.skipif(API_TRANSPORT != "http", reason="the async client always talks to a real server")
+
+
+def test_concurrent_game_sessions(user_service, helpers, test_data):
+    user_id = test_data["users"]["valid_user"]
+    bet_amount = test_data["bet_amounts"]["minimum"]
+    sessions = 40
+    
+    initial_balance = helpers.get_user_balance(user_service, user_id)
+    if initial_balance < sessions * bet_amount:
+        user_service.update_balance(user_id, test_data["balances"]["medium"])
+    
+    report = run_concurrent_sessions(sessions, concurrency=8, user_ids=(user_id,), bet_amount=bet_amount)
+    
+    assert report["errors"] == 0, report["errorSamples"]
+    assert sum(report["outcomes"].values()) == sessions
+    assert set(report["steps"]) == set(SESSION_STEPS)
+    for step in ("balance", "placeBet", "spin", "notify"):
+        assert report["steps"][step]["count"] == sessions
+        assert 0 < report["steps"][step]["p50"] <= report["steps"][step]["p99"]
+    assert report["steps"]["payout"]["count"] == report["outcomes"]["WIN"]
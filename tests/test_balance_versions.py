@@ -0,0 +1,69 @@
+from tests.api_client import BalanceCache, balance_cache, make_request
+
+
+def conditional_get(user_id, etag):
+    return make_request(endpoint="/user/balance", method="GET", params={"userId": user_id}, headers={"If-None-Match": etag})
+
+
+def test_unchanged_balance_revalidates_with_304(user_service, payment_service, test_data):
+    user_id = test_data["users"]["valid_user"]
+    first = user_service.get_balance(user_id, revalidate=False)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert first.json()["version"] >= 1
+
+    conditional = conditional_get(user_id, etag)
+    assert conditional.status_code == 304
+    assert conditional.headers["ETag"] == etag
+
+    payment_service.place_bet(user_id, test_data["bet_amounts"]["small"])
+    changed = conditional_get(user_id, etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["version"] == first.json()["version"] + 1
+
+
+def test_client_serves_unchanged_balances_from_its_cache(user_service, payment_service, test_data):
+    user_id = test_data["users"]["valid_user"]
+    first = user_service.get_balance(user_id)
+    revalidated = balance_cache.revalidated
+
+    assert user_service.get_balance(user_id) is first
+    assert balance_cache.revalidated == revalidated + 1
+
+    payment_service.place_bet(user_id, test_data["bet_amounts"]["small"])
+    fresh = user_service.get_balance(user_id)
+    assert fresh is not first
+    assert fresh.json()["balance"] == first.json()["balance"] - test_data["bet_amounts"]["small"]
+
+
+def test_bulk_balance_read(user_service, admin_service, test_data):
+    user_id = test_data["users"]["valid_user"]
+    other_id = admin_service.create_user(balance=42.00).json()["userId"]
+
+    response = user_service.get_balances([user_id, other_id, 999_999_999])
+    assert response.status_code == 200
+    body = response.json()
+    assert [(b["userId"], b["balance"]) for b in body["balances"]] == [(user_id, 150.00), (other_id, 42.00)]
+    assert body["missing"] == [999_999_999]
+    assert body["balances"][0]["etag"] == user_service.get_balance(user_id, revalidate=False).headers["ETag"]
+
+    assert user_service.get_balances([]).status_code == 400
+    assert user_service.get_balances(["abc"]).status_code == 400
+
+
+def test_cache_drops_users_that_disappear():
+    class Response:
+        def __init__(self, status_code, etag=None):
+            self.status_code = status_code
+            self.headers = {"ETag": etag} if etag else {}
+
+    cache = BalanceCache(maxsize=1)
+    cached = cache.resolve(1, Response(200, '"1-a"'))
+    assert cache.headers(1) == {"If-None-Match": '"1-a"'}
+    assert cache.resolve(1, Response(304)) is cached
+
+    cache.resolve(2, Response(200, '"1-b"'))  # evicts user 1
+    assert cache.headers(1) is None
+    cache.resolve(2, Response(404))
+    assert cache.headers(2) is None
@@ -0,0 +1,70 @@
+import threading
+
+from player_store import PlayerStore
+
+THREADS = 16
+
+
+def run_threads(target, count=THREADS):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_hot_user_is_never_overdrawn():
+    store = PlayerStore()
+    player = store.add(1, 1000)
+    accepted = []
+
+    def bettor(_):
+        ok = 0
+        for _ in range(200):
+            if store.debit_if_sufficient(player, 1) is not None:
+                ok += 1
+        accepted.append(ok)
+
+    run_threads(bettor)
+
+    assert sum(accepted) == 1000
+    assert player.balance == 0
+
+
+def test_no_money_lost_across_many_users():
+    store = PlayerStore(lock_stripes=8)
+    users = [store.add(userId, 100) for userId in range(50)]
+    total_before = sum(p.balance for p in users)
+
+    def trader(i):
+        # move money around: every debit is matched by a credit to another user
+        for n in range(2000):
+            source = users[(i + n) % len(users)]
+            target = users[(i * 7 + n * 3) % len(users)]
+            if store.debit_if_sufficient(source, 3) is not None:
+                store.credit(target, 3)
+
+    run_threads(trader)
+
+    assert sum(p.balance for p in users) == total_before
+    assert all(p.balance >= 0 for p in users)
+
+
+def test_concurrent_bets_through_the_api():
+    import app as server
+
+    server.storage.add_player(900001, 500)
+    client = server.app.test_client()
+    statuses = []
+    lock = threading.Lock()
+
+    def bettor(_):
+        local = [client.post("/payment/placeBet", json={"userId": 900001, "betAmount": 5}).status_code for _ in range(20)]
+        with lock:
+            statuses.extend(local)
+
+    run_threads(bettor, count=8)
+
+    assert statuses.count(200) == 100
+    assert statuses.count(400) == 60
+    assert server.storage.get_player(900001).balance == 0
@@ -1,3 +1,5 @@
+import copy
+
 
 TEST_DATA = {
     # User data
@@ -71,6 +73,14 @@ TEST_DATA = {
     }
 }
 
+def for_user(user_id):
+    """Copy of TEST_DATA where the valid user and every scenario use user_id"""
+    data = copy.deepcopy(TEST_DATA)
+    data["users"]["valid_user"] = user_id
+    for scenario in data["scenarios"].values():
+        scenario["user_id"] = user_id
+    return data
+
 def get_user(user_type="valid_user"):
     """Get user ID by type"""
     return TEST_DATA["users"][user_type]
@@ -57,4 +57,37 @@ def test_complete_end_to_end_game_flow(user_service, payment_service, game_servi
     net_change_str = f"+${net_change}" if net_change >= 0 else f"-${abs(net_change)}"
     
     # Final summary
-    logger.info(f"E2E Test Complete: {outcome} | Net: {net_change_str} | Final Balance: ${final_balance}")
\ No newline at end of file
+    logger.info(f"E2E Test Complete: {outcome} | Net: {net_change_str} | Final Balance: ${final_balance}")
+
+def test_single_call_game_play(user_service, game_service, helpers, test_data):
+    scenario = test_data["scenarios"]["standard_game"]
+    user_id = scenario["user_id"]
+    bet_amount = scenario["bet_amount"]
+    
+    logger.info("Starting single-call Game Play Test")
+    
+    initial_balance = helpers.get_user_balance(user_service, user_id)
+    if initial_balance < bet_amount:
+        user_service.update_balance(user_id, test_data["balances"]["medium"])
+        initial_balance = test_data["balances"]["medium"]
+    
+    play_response = game_service.play(user_id, bet_amount)
+    assert play_response.status_code == 200
+    play_data = play_response.json()
+    
+    reels = play_data["reels"]
+    if reels[0] == reels[1] == reels[2]:
+        assert play_data["outcome"] == "WIN"
+        assert play_data["winAmount"] > 0
+    else:
+        assert play_data["outcome"] == "LOSE"
+        assert play_data["winAmount"] == 0
+    
+    assert play_data["transactionId"].startswith("txn_")
+    assert play_data["notificationId"].startswith("notif_")
+    
+    expected_final = initial_balance - bet_amount + play_data["winAmount"]
+    assert play_data["balance"] == expected_final
+    helpers.verify_balance_equals(user_service, user_id, expected_final)
+    
+    logger.info(f"Game Play Complete: {play_data['outcome']} | Reels: {reels} | Final Balance: ${play_data['balance']}")
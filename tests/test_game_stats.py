@@ -0,0 +1,86 @@
+import pytest
+
+from game_stats import GameStats, SharedGameStats
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_stats(request, worker_storage):
+    if request.param == "memory":
+        return GameStats
+    store = worker_storage()
+    return lambda **kwargs: SharedGameStats(store, **kwargs)
+
+
+def test_totals_per_player_and_globally(make_stats):
+    stats = make_stats(rollups=())
+    stats.record_bet(1, 10.0)
+    stats.record_spin(1, True)
+    stats.record_payout(1, 25.0)
+    stats.record_bet(2, 10.0)
+    stats.record_spin(2, False)
+
+    player = stats.user(1)
+    assert (player["totalWagered"], player["totalPaid"], player["netPosition"]) == (10.0, 25.0, -15.0)
+    assert player["hitRate"] == 1.0 and player["rtp"] == 2.5
+
+    summary = stats.summary()
+    assert (summary["bets"], summary["spins"], summary["wins"], summary["players"]) == (2, 2, 1, 2)
+    assert summary["hitRate"] == 0.5
+    assert summary["rtp"] == pytest.approx(1.25)
+    assert stats.user(99)["rtp"] is None
+
+
+def test_rollups_keep_a_fixed_ring_of_buckets(make_stats, fake_clock):
+    stats = make_stats(rollups=(("minute", 60, 3),), clock=fake_clock)
+    for minute in range(5):
+        fake_clock.now = minute * 60 + 1
+        stats.record_bet(1, minute + 1.0)
+
+    buckets = stats.summary()["rollups"]["minute"]
+    assert [(b["start"], b["totalWagered"]) for b in buckets] == [(120, 3.0), (180, 4.0), (240, 5.0)]
+
+    fake_clock.now = 10 * 60
+    assert stats.summary()["rollups"]["minute"] == []  # every slot is older than the ring
+    assert stats.summary()["totalWagered"] == 15.0
+
+
+def test_shared_stats_add_up_every_process(worker_storage):
+    first, second = SharedGameStats(worker_storage()), SharedGameStats(worker_storage())
+    first.record_bet(1, 10.0)
+    second.record_bet(1, 5.0)
+    second.record_bet(2, 1.0)
+    first.record_spin(2, True)
+
+    assert first.user(1)["totalWagered"] == second.user(1)["totalWagered"] == 15.0
+    summary = second.summary()
+    assert (summary["bets"], summary["spins"], summary["wins"], summary["players"]) == (3, 1, 1, 2)
+    assert summary["rollups"]["minute"][-1]["bets"] == 3
+    first.clear()
+    assert second.summary()["bets"] == 0 and len(second) == 0
+
+
+def test_stats_endpoint_follows_bets_spins_and_payouts(payment_service, game_service, stats_service, test_data):
+    user_id = test_data["users"]["valid_user"]
+    bet_amount = test_data["bet_amounts"]["small"]
+    before = stats_service.get().json()
+
+    transaction_id = payment_service.place_bet(user_id, bet_amount).json()["transactionId"]
+    game_service.spin(user_id, bet_amount, transaction_id)
+    payment_service.payout(user_id, transaction_id, 2.00)
+
+    player = stats_service.get(user_id).json()
+    assert (player["userId"], player["bets"], player["spins"], player["payouts"]) == (user_id, 1, 1, 1)
+    assert player["totalWagered"] == bet_amount
+    assert player["totalPaid"] == 2.00
+    assert player["netPosition"] == round(bet_amount - 2.00, 2)
+
+    after = stats_service.get().json()
+    assert after["bets"] >= before["bets"] + 1
+    assert after["rollups"]["minute"][-1]["bets"] >= 1
+    assert stats_service.get(999_999_999).status_code == 404
+    assert stats_service.get("abc").status_code == 400
+
+
+def test_per_process_stats_are_refused_with_several_workers(patched_app):
+    transport = patched_app(WORKER_COUNT=2, game_stats=GameStats())
+    assert transport.request("GET", "/stats", None).status_code == 501
@@ -0,0 +1,48 @@
+import time
+
+
+def test_history_pages_with_a_cursor(user_service, payment_service, test_data):
+    user_id = test_data["users"]["valid_user"]
+    bet_amount = test_data["bet_amounts"]["small"]
+    placed = [payment_service.place_bet(user_id, bet_amount).json()["transactionId"] for _ in range(5)]
+
+    seen = []
+    cursor = None
+    while True:
+        page = user_service.get_history(user_id, limit=2, cursor=cursor)
+        assert page.status_code == 200
+        body = page.json()
+        seen.extend(item["transactionId"] for item in body["items"])
+        cursor = body["nextCursor"]
+        if cursor is None:
+            break
+    assert seen == placed[::-1]
+
+
+def test_history_filters_by_time_and_streams_ndjson(user_service, payment_service, game_service, test_data):
+    user_id = test_data["users"]["valid_user"]
+    bet_amount = test_data["bet_amounts"]["small"]
+    first = payment_service.place_bet(user_id, bet_amount).json()["transactionId"]
+    middle = time.time()
+    second = payment_service.place_bet(user_id, bet_amount).json()["transactionId"]
+    game_service.spin(user_id, bet_amount, second)
+
+    recent = user_service.get_history(user_id, since=middle).json()["items"]
+    assert [item["transactionId"] for item in recent] == [second]
+    older = user_service.get_history(user_id, until=middle).json()["items"]
+    assert [item["transactionId"] for item in older] == [first]
+
+    streamed = list(user_service.stream_history(user_id))
+    assert [item["transactionId"] for item in streamed] == [second, first]
+    spins = list(user_service.stream_history(user_id, type="spins"))
+    assert len(spins) == 1 and spins[0]["transactionId"] == second
+    assert "rng" not in spins[0]
+
+
+def test_history_rejects_bad_queries(user_service, test_data):
+    user_id = test_data["users"]["valid_user"]
+    assert user_service.get_history(user_id, type="players").status_code == 400
+    assert user_service.get_history(user_id, cursor="not-a-cursor").status_code == 400
+    assert user_service.get_history(user_id, limit=0).status_code == 400
+    assert user_service.get_history(user_id, since="yesterday").status_code == 400
+    assert user_service.get_history(999_999_999).status_code == 404
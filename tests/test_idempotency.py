@@ -0,0 +1,140 @@
+import threading
+import time
+import uuid
+
+from idempotency import CONFLICT, HIT, IN_FLIGHT, MISS, TIMEOUT, IdempotencyCache, SharedIdempotencyCache
+
+
+def counting(result):
+    calls = []
+
+    def execute():
+        calls.append(1)
+        return result
+
+    return execute, calls
+
+
+def test_duplicates_replay_the_first_response():
+    cache = IdempotencyCache()
+    execute, calls = counting(({"transactionId": "txn_1"}, 200))
+
+    assert cache.run("k", "body", execute) == (MISS, ({"transactionId": "txn_1"}, 200))
+    assert cache.run("k", "body", execute) == (HIT, ({"transactionId": "txn_1"}, 200))
+    assert cache.run("k", "other body", execute)[0] == CONFLICT
+    assert len(calls) == 1
+    assert cache.stats[MISS] == 1 and cache.stats[HIT] == 1
+
+
+def test_ttl_and_lru_eviction(fake_clock):
+    cache = IdempotencyCache(max_keys=2, ttl_seconds=10, clock=fake_clock)
+    execute, calls = counting(({}, 200))
+
+    cache.run("a", "", execute)
+    cache.run("b", "", execute)
+    cache.run("a", "", execute)  # a is now the most recently used
+    cache.run("c", "", execute)  # evicts b
+    assert len(cache) == 2
+    assert cache.run("a", "", execute)[0] == HIT
+    assert cache.run("b", "", execute)[0] == MISS
+
+    fake_clock.now = 11
+    assert cache.run("a", "", execute)[0] == MISS
+    assert len(calls) == 5
+
+
+def test_server_errors_are_not_cached():
+    cache = IdempotencyCache()
+    execute, calls = counting(({"error": "busy"}, 503))
+
+    cache.run("k", "", execute)
+    cache.run("k", "", execute)
+    assert len(calls) == 2
+
+
+def test_concurrent_duplicates_run_once():
+    cache = IdempotencyCache()
+    calls = []
+
+    def slow_execute():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"ok": True}, 200
+
+    outcomes = []
+    threads = [threading.Thread(target=lambda: outcomes.append(cache.run("k", "", slow_execute))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(outcome for outcome, _ in outcomes).count(MISS) == 1
+    assert all(outcome in (MISS, HIT, IN_FLIGHT) for outcome, _ in outcomes)
+    assert all(result == ({"ok": True}, 200) for _, result in outcomes)
+
+
+def test_shared_keys_are_replayed_by_other_processes(worker_storage):
+    first, second = SharedIdempotencyCache(worker_storage()), SharedIdempotencyCache(worker_storage())
+    execute, calls = counting(({"transactionId": "txn_1"}, 200))
+
+    assert first.run(("/payment/placeBet", "k"), "body", execute) == (MISS, ({"transactionId": "txn_1"}, 200))
+    assert second.run(("/payment/placeBet", "k"), "body", execute) == (HIT, ({"transactionId": "txn_1"}, 200))
+    assert second.run(("/payment/placeBet", "k"), "body", execute)[0] == HIT  # now from its own front cache
+    assert second.run(("/payment/placeBet", "k"), "other body", execute)[0] == CONFLICT
+    assert second.run(("/payment/payout", "k"), "body", execute)[0] == MISS
+    assert len(calls) == 2
+
+
+def test_shared_keys_wait_for_and_release_claims_of_other_processes(worker_storage):
+    store = worker_storage()
+    cache = SharedIdempotencyCache(worker_storage(), wait_seconds=0.05)
+    execute, calls = counting(({"ok": True}, 200))
+
+    # another process holds the key and has not answered yet
+    now = time.time()
+    assert store.claim_idempotency_key('["k"]', "", now, now + 60) == (True, None)
+    assert cache.run(("k",), "", execute)[0] == TIMEOUT
+    store.store_idempotency_result('["k"]', {"ok": False}, 200, now + 60)
+    assert cache.run(("k",), "", execute) == (HIT, ({"ok": False}, 200))
+
+    # a failed first attempt releases its claim, a lapsed one can be taken over
+    failing = SharedIdempotencyCache(worker_storage())
+    failing.run(("busy",), "", lambda: ({"error": "busy"}, 503))
+    assert cache.run(("busy",), "", execute)[0] == MISS
+    store.claim_idempotency_key('["lapsed"]', "", now - 120, now - 60)
+    assert cache.run(("lapsed",), "", execute)[0] == MISS
+    assert len(calls) == 2
+
+
+def test_retried_bet_and_payout_are_charged_once(payment_service, user_service, helpers, test_data):
+    user_id = test_data["users"]["valid_user"]
+    bet_amount = test_data["bet_amounts"]["small"]
+    initial_balance = helpers.get_user_balance(user_service, user_id)
+    bet_key = str(uuid.uuid4())
+
+    first = payment_service.place_bet(user_id, bet_amount, idempotency_key=bet_key)
+    retry = payment_service.place_bet(user_id, bet_amount, idempotency_key=bet_key)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers.get("Idempotent-Replayed") == "true"
+    helpers.verify_balance_decreased(user_service, user_id, initial_balance, bet_amount)
+
+    transaction_id = first.json()["transactionId"]
+    payout_key = str(uuid.uuid4())
+    for _ in range(3):
+        assert payment_service.payout(user_id, transaction_id, bet_amount, idempotency_key=payout_key).status_code == 200
+    helpers.verify_balance_equals(user_service, user_id, initial_balance)
+
+    assert payment_service.place_bet(user_id, bet_amount + 1, idempotency_key=bet_key).status_code == 422
+
+
+def test_per_process_keys_are_refused_with_several_workers(patched_app):
+    transport = patched_app(WORKER_COUNT=2, idempotency_cache=IdempotencyCache())
+    userId = transport.request("POST", "/admin/users", None, json={}).json()["userId"]
+
+    def bet(headers):
+        return transport.request("POST", "/payment/placeBet", None, json={"userId": userId, "betAmount": 1}, headers=headers)
+
+    assert bet({"Idempotency-Key": str(uuid.uuid4())}).status_code == 501
+    assert bet(None).status_code == 200
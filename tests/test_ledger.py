@@ -0,0 +1,97 @@
+import threading
+
+from ledger import IdGenerator, Ledger
+from retention import RetentionPolicy, SegmentArchive
+
+
+def test_ids_are_unique_and_sorted_across_threads():
+    generator = IdGenerator("txn")
+    ids = []
+    lock = threading.Lock()
+
+    def worker():
+        local = [generator.next_id() for _ in range(5000)]
+        with lock:
+            ids.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(ids)) == len(ids)
+    assert sorted(ids) == sorted(ids, key=lambda i: int(i.split("_")[1]))
+
+
+def test_ids_increase_within_a_thread():
+    generator = IdGenerator("notif")
+    ids = [generator.next_id() for _ in range(10000)]
+    assert ids == sorted(ids)
+    assert all(i.startswith("notif_") for i in ids)
+
+
+def test_worker_id_is_part_of_the_id():
+    first = IdGenerator("txn", worker_id=1).next_int()
+    second = IdGenerator("txn", worker_id=2).next_int()
+    assert (first >> 12) & 0x3FF == 1
+    assert (second >> 12) & 0x3FF == 2
+
+
+def test_ledger_indexes_by_key():
+    ledger = Ledger("transactionId")
+    ledger.add({"transactionId": "txn_1", "betAmount": 10})
+    ledger.add({"transactionId": "txn_2", "betAmount": 20})
+
+    assert ledger.get("txn_2")["betAmount"] == 20
+    assert ledger.get("txn_999999") is None
+    assert ledger.get(["txn_1"]) is None
+    assert [t["transactionId"] for t in ledger] == ["txn_1", "txn_2"]
+
+
+def history_ids(ledger, userId, **filters):
+    return [record["transactionId"] for _, record in ledger.history(userId, **filters)]
+
+
+def test_secondary_index_serves_time_ranges_and_cursors():
+    ledger = Ledger("transactionId", index_by="userId")
+    for i in range(10):
+        ledger.add({"transactionId": f"txn_{i}", "userId": i % 2, "createdAt": float(i)})
+    ledger.add({"transactionId": "txn_late", "userId": 0, "createdAt": 3.5})  # out of order
+
+    assert history_ids(ledger, 0) == ["txn_8", "txn_6", "txn_4", "txn_late", "txn_2", "txn_0"]
+    assert history_ids(ledger, 0, since=2.0, until=6.0) == ["txn_4", "txn_late", "txn_2"]
+    assert history_ids(ledger, 7) == []
+
+    key, _ = next(ledger.history(0))
+    assert history_ids(ledger, 0, before=key, since=2.0) == ["txn_6", "txn_4", "txn_late", "txn_2"]
+    # small chunks read the same sequence
+    assert [r["transactionId"] for _, r in ledger.history(0, chunk_size=2)] == history_ids(ledger, 0)
+
+
+def test_evicted_records_leave_the_index(tmp_path):
+    ledger = Ledger(
+        "transactionId", policy=RetentionPolicy(max_records=4, low_watermark=0.5),
+        archive=SegmentArchive("transactions", "transactionId", directory=str(tmp_path)), index_by="userId"
+    )
+    for i in range(5):
+        ledger.add({"transactionId": f"txn_{i}", "userId": 1, "createdAt": float(i)})
+
+    assert history_ids(ledger, 1) == ["txn_4", "txn_3"]
+    assert len(ledger._index[1]) == 2
+    ledger.clear()
+    assert history_ids(ledger, 1) == []
+
+
+def test_a_pinned_record_does_not_keep_evicted_keys(tmp_path):
+    ledger = Ledger(
+        "transactionId", policy=RetentionPolicy(max_records=100, low_watermark=0.5),
+        archive=SegmentArchive("transactions", "transactionId", directory=str(tmp_path)),
+        is_settled=lambda record: record["status"] != "PENDING", index_by="userId"
+    )
+    ledger.add({"transactionId": "txn_open", "userId": 1, "createdAt": 0.0, "status": "PENDING"})
+    for i in range(1, 1000):
+        ledger.add({"transactionId": f"txn_{i:04d}", "userId": 1, "createdAt": float(i), "status": "SETTLED"})
+
+    assert len(ledger._index[1]) == len(ledger)
+    assert history_ids(ledger, 1)[-1] == "txn_open"
@@ -0,0 +1,53 @@
+from metrics import MetricsRegistry
+
+
+def parse(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_counters_gauges_and_cumulative_histogram_buckets():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "requests", ("route", "status"))
+    bets = registry.counter("bets_total", "bets")
+    latency = registry.histogram("latency_seconds", "latency", ("route",), buckets=(0.01, 0.1))
+    registry.gauge("queue_depth", "depth", lambda: 7)
+
+    requests.inc(1, ("/slot/spin", 200))
+    requests.inc(2, ("/slot/spin", 200))
+    for seconds in (0.005, 0.05, 0.5):
+        latency.observe(seconds, ("/slot/spin",))
+
+    text = registry.render()
+    samples = parse(text)
+    assert "# TYPE latency_seconds histogram" in text
+    assert samples['requests_total{route="/slot/spin",status="200"}'] == 3
+    assert samples["bets_total"] == 0
+    assert samples["queue_depth"] == 7
+    assert samples['latency_seconds_bucket{route="/slot/spin",le="0.01"}'] == 1
+    assert samples['latency_seconds_bucket{route="/slot/spin",le="0.1"}'] == 2
+    assert samples['latency_seconds_bucket{route="/slot/spin",le="+Inf"}'] == 3
+    assert samples['latency_seconds_count{route="/slot/spin"}'] == 3
+    assert abs(samples['latency_seconds_sum{route="/slot/spin"}'] - 0.555) < 1e-9
+
+
+def test_metrics_endpoint_counts_routes_and_bets(metrics_service, payment_service, test_data):
+    user_id = test_data["users"]["valid_user"]
+    bet_amount = test_data["bet_amounts"]["small"]
+    route_count = 'casino_http_requests_total{route="/payment/placeBet",method="POST",status="200"}'
+
+    before = parse(metrics_service.scrape().text)
+    assert payment_service.place_bet(user_id, bet_amount).status_code == 200
+    response = metrics_service.scrape()
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    after = parse(response.text)
+    assert after[route_count] >= before.get(route_count, 0) + 1
+    assert after["casino_bets_placed_total"] >= before["casino_bets_placed_total"] + 1
+    assert after["casino_amount_wagered_total"] >= before["casino_amount_wagered_total"] + bet_amount
+    assert after['casino_collection_size{collection="transactions"}'] >= 1
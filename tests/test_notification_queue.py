@@ -0,0 +1,105 @@
+import json
+import threading
+
+from notification_queue import FileSink, InMemorySink, NotificationDispatcher
+
+
+def make_notification(i):
+    return {"notificationId": f"notif_{i:04d}", "userId": 123, "transactionId": f"txn_{i:04d}", "message": "hi"}
+
+
+class BlockingSink(InMemorySink):
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def deliver(self, batch):
+        self.release.wait(5)
+        super().deliver(batch)
+
+
+class FailingSink:
+    def deliver(self, batch):
+        raise ConnectionError("sink down")
+
+
+def test_notifications_are_delivered_in_batches():
+    sink = InMemorySink()
+    dispatcher = NotificationDispatcher(sink, batch_size=50, workers=1)
+    records = [make_notification(i) for i in range(200)]
+    for record in records:
+        assert dispatcher.submit(record)
+
+    assert dispatcher.flush()
+    dispatcher.stop()
+
+    assert sink.count == 200
+    assert sink.batches < 200
+    assert all(r["status"] == "SENT" for r in records)
+    metrics = dispatcher.metrics()
+    assert metrics["delivered"] == 200
+    assert metrics["depth"] == 0
+
+
+def test_full_queue_rejects_instead_of_blocking():
+    sink = BlockingSink()
+    dispatcher = NotificationDispatcher(sink, max_depth=5, batch_size=1, workers=1)
+    accepted = [dispatcher.submit(make_notification(i)) for i in range(20)]
+
+    assert not all(accepted)
+    assert dispatcher.metrics()["rejected"] == accepted.count(False)
+    assert dispatcher.metrics()["queueLagSeconds"] >= 0
+
+    sink.release.set()
+    assert dispatcher.flush()
+    dispatcher.stop()
+    assert sink.count == accepted.count(True)
+
+
+def test_memory_sink_keeps_only_the_latest_notifications():
+    sink = InMemorySink(keep=10)
+    for start in range(0, 25, 5):
+        sink.deliver([make_notification(i) for i in range(start, start + 5)])
+
+    assert sink.count == 25 and sink.batches == 5
+    assert [n["notificationId"] for n in sink.delivered] == [f"notif_{i:04d}" for i in range(15, 25)]
+
+
+def test_sink_errors_mark_notifications_failed():
+    dispatcher = NotificationDispatcher(FailingSink(), workers=1)
+    record = make_notification(1)
+    dispatcher.submit(record)
+
+    assert dispatcher.flush()
+    dispatcher.stop()
+    assert record["status"] == "FAILED"
+    assert dispatcher.metrics()["failed"] == 1
+
+
+def test_storage_errors_fail_the_batch_but_keep_the_worker():
+    def on_delivered(batch):
+        if batch[0]["notificationId"] == "notif_0001":
+            raise RuntimeError("database is locked")
+
+    dispatcher = NotificationDispatcher(InMemorySink(), batch_size=1, workers=1, on_delivered=on_delivered)
+    first, second = make_notification(1), make_notification(2)
+    dispatcher.submit(first)
+    assert dispatcher.flush(timeout=2)
+    dispatcher.submit(second)
+    assert dispatcher.flush(timeout=2)
+    dispatcher.stop()
+
+    assert (first["status"], second["status"]) == ("FAILED", "SENT")
+    assert dispatcher.metrics()["failed"] == 1 and dispatcher.metrics()["delivered"] == 1
+
+
+def test_file_sink_writes_json_lines(tmp_path):
+    path = tmp_path / "notifications.jsonl"
+    dispatcher = NotificationDispatcher(FileSink(str(path)), workers=1)
+    for i in range(3):
+        dispatcher.submit(make_notification(i))
+
+    assert dispatcher.flush()
+    dispatcher.stop()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [n["notificationId"] for n in lines] == ["notif_0000", "notif_0001", "notif_0002"]
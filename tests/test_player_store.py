@@ -0,0 +1,68 @@
+import threading
+
+from player_store import Player, PlayerStore, StripedLock
+
+
+def test_lookup_by_user_id():
+    store = PlayerStore([{"userId": 123, "balance": 150.00, "currency": "USD"}])
+    store.add(456, 20.00)
+
+    player = store.get(456)
+    assert player.userId == 456
+    assert player.balance == 20.00
+    assert player.currency == "USD"
+    assert len(store) == 2
+    assert 123 in store
+
+
+def test_unknown_and_unhashable_ids_return_none():
+    store = PlayerStore()
+    store.add(123, 150.00)
+
+    assert store.get(999) is None
+    assert store.get(None) is None
+    assert store.get([123]) is None
+
+
+def test_player_record_is_compact():
+    player = Player(123, 150.00)
+    assert not hasattr(player, "__dict__")
+    assert player.to_dict() == {"userId": 123, "balance": 150.00, "currency": "USD"}
+
+
+def test_balance_changes_bump_the_version_and_etag():
+    store = PlayerStore()
+    player = store.add(123, 150.00)
+    etag = player.etag()
+
+    store.debit_if_sufficient(player, 500.00)
+    assert (player.version, player.etag()) == (1, etag)
+    store.credit(player, 0.00)
+    assert player.version == 2
+    assert player.etag() != etag
+    # a re-created user starts at version 1 again, the checksum keeps old tags from matching
+    assert store.add(123, 100.00).etag() != etag
+
+
+def test_iteration_is_safe_while_players_are_added():
+    store = PlayerStore()
+
+    def adder():
+        for userId in range(20000):
+            store.add(userId, 1.00)
+
+    thread = threading.Thread(target=adder)
+    thread.start()
+    try:
+        while thread.is_alive():
+            [p.to_dict() for p in store]
+    finally:
+        thread.join()
+    assert len(list(store)) == 20000
+
+
+def test_snowflake_ids_spread_over_the_lock_stripes():
+    # ids made a millisecond apart differ only above their low 22 bits
+    locks = StripedLock(64)
+    stripes = {id(locks.for_key(ms << 22)) for ms in range(1000)}
+    assert len(stripes) == 64
@@ -63,4 +63,49 @@ def test_slot_spin(payment_service, game_service, helpers, test_data):
     
     assert spin_data["userId"] == user_id
     assert len(spin_data["reels"]) == 3
-    assert isinstance(spin_data["winAmount"], (int, float))
\ No newline at end of file
+    assert isinstance(spin_data["winAmount"], (int, float))
+
+
+def test_batch_bets_and_spins(payment_service, game_service, user_service, helpers, test_data):
+    user_id = test_data["users"]["valid_user"]
+    invalid_user = test_data["users"]["invalid_user"]
+    bet_amount = test_data["bet_amounts"]["very_small"]
+    
+    initial_balance = helpers.get_user_balance(user_service, user_id)
+    bets = [
+        {"userId": user_id, "betAmount": bet_amount},
+        {"userId": invalid_user, "betAmount": bet_amount},
+        {"userId": user_id, "betAmount": bet_amount}
+    ]
+    bet_response = payment_service.place_bets(bets)
+    assert bet_response.status_code == 200
+    
+    bet_results = bet_response.json()["results"]
+    assert [r["statusCode"] for r in bet_results] == [200, 404, 200]
+    assert "error" in bet_results[1]
+    assert bet_results[0]["transactionId"] != bet_results[2]["transactionId"]
+    helpers.verify_balance_decreased(user_service, user_id, initial_balance, 2 * bet_amount)
+    
+    spins = [{"userId": user_id, "betAmount": bet_amount, "transactionId": r["transactionId"]} for r in (bet_results[0], bet_results[2])]
+    spin_response = game_service.spin_many(spins)
+    assert spin_response.status_code == 200
+    
+    spin_results = spin_response.json()["results"]
+    assert len(spin_results) == 2
+    for spin_data in spin_results:
+        assert spin_data["statusCode"] == 200
+        assert spin_data["outcome"] in ["WIN", "LOSE"]
+        assert len(spin_data["reels"]) == 3
+
+def test_isolated_users_do_not_share_balances(admin_service, user_service, payment_service, helpers, test_data):
+    user_id = test_data["users"]["valid_user"]
+    bet_amount = test_data["bet_amounts"]["small"]
+    
+    other_response = admin_service.create_user(test_data["balances"]["high"])
+    assert other_response.status_code == 201
+    other_user = other_response.json()
+    assert other_user["userId"] != user_id
+    assert other_user["balance"] == test_data["balances"]["high"]
+    
+    helpers.place_bet_and_verify(payment_service, user_service, user_id, bet_amount)
+    helpers.verify_balance_equals(user_service, other_user["userId"], test_data["balances"]["high"])
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+from flask import Flask
+
+from profiler import SamplingProfiler
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+@pytest.fixture
+def profiled_app():
+    app = Flask(__name__)
+
+    @app.route('/slow')
+    def slow():
+        busy(0.03)
+        return "ok"
+
+    @app.route('/fast')
+    def fast():
+        return "ok"
+
+    return app
+
+
+def test_profiles_a_request_budget_then_uninstalls(profiled_app):
+    profiler = SamplingProfiler(profiled_app)
+    original = profiled_app.wsgi_app
+    client = profiled_app.test_client()
+
+    profiler.start(requests=3)
+    assert profiled_app.wsgi_app != original
+    for path in ("/slow", "/slow", "/fast", "/slow"):
+        client.get(path)
+
+    report = profiler.report()
+    assert report["status"] == "DONE"
+    assert profiled_app.wsgi_app == original
+    assert report["routes"]["/slow"]["requests"] == 2
+    assert report["routes"]["/fast"]["requests"] == 1
+    assert report["routes"]["/slow"]["samples"] > 0
+    assert any(frame["frame"].startswith("busy ") for frame in report["routes"]["/slow"]["topFrames"])
+
+    lines = profiler.collapsed().splitlines()
+    assert lines and all(line.startswith("/slow;") or line.startswith("/fast;") for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_time_window_stops_by_itself(profiled_app):
+    profiler = SamplingProfiler(profiled_app)
+    profiler.start(seconds=0.05)
+
+    with pytest.raises(RuntimeError):
+        profiler.start(requests=1)
+    deadline = time.monotonic() + 2
+    while profiler.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert not profiler.running
+    assert profiler.report()["status"] == "DONE"
+
+
+def test_profile_endpoint(admin_service, user_service, test_data):
+    start_response = admin_service.start_profile(requests=1)
+    if start_response.status_code == 409:
+        pytest.skip("a profile is already running on this server")
+    assert start_response.status_code == 200
+    assert start_response.json()["status"] == "RUNNING"
+
+    user_service.get_balance(test_data["users"]["valid_user"])
+
+    report = admin_service.get_profile().json()
+    assert report["status"] == "DONE"
+    assert sum(route["requests"] for route in report["routes"].values()) == 1
+    assert admin_service.get_profile(collapsed=True).status_code == 200
+    assert admin_service.start_profile().status_code == 400
@@ -0,0 +1,160 @@
+import threading
+import time
+
+import pytest
+
+from ledger import Ledger
+from retention import RetentionPolicy, SegmentArchive
+
+
+def make_ledger(tmp_path, **policy):
+    return Ledger(
+        "transactionId",
+        policy=RetentionPolicy(**policy),
+        archive=SegmentArchive("transactions", "transactionId", directory=str(tmp_path)),
+        is_settled=lambda t: t.get("outcome") is not None
+    )
+
+
+class GatedArchive(SegmentArchive):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, records):
+        self.entered.set()
+        assert self.release.wait(5)
+        return super().write(records)
+
+
+class FailingArchive(SegmentArchive):
+    def write(self, records):
+        raise OSError("disk full")
+
+
+def settled(i):
+    return {"transactionId": f"txn_{i:04d}", "outcome": "LOSE", "createdAt": time.time()}
+
+
+def test_settled_records_are_evicted_and_still_readable(tmp_path):
+    ledger = make_ledger(tmp_path, max_records=10)
+    for i in range(25):
+        ledger.add({"transactionId": f"txn_{i:04d}", "outcome": "LOSE", "createdAt": time.time()})
+
+    assert len(ledger) <= 10
+    assert ledger.archive.segment_count > 0
+    assert ledger.get("txn_0000")["outcome"] == "LOSE"
+    assert ledger.get("txn_0024")["outcome"] == "LOSE"
+    assert ledger.get("txn_9999") is None
+
+
+def test_active_records_are_never_evicted(tmp_path):
+    ledger = make_ledger(tmp_path, max_records=5)
+    for i in range(20):
+        ledger.add({"transactionId": f"txn_{i:04d}", "createdAt": time.time()})
+
+    assert len(ledger) == 20
+    assert ledger.archive.segment_count == 0
+
+
+def test_age_based_eviction(tmp_path):
+    ledger = make_ledger(tmp_path, max_age_seconds=60)
+    old = time.time() - 120
+    ledger.add({"transactionId": "txn_0001", "outcome": "LOSE", "createdAt": old})
+    ledger.add({"transactionId": "txn_0002", "createdAt": old})
+    ledger.add({"transactionId": "txn_0003", "outcome": "LOSE", "createdAt": time.time()})
+    ledger.enforce_retention()
+
+    assert [t["transactionId"] for t in ledger] == ["txn_0002", "txn_0003"]
+    assert ledger.get("txn_0001")["outcome"] == "LOSE"
+
+
+def test_archive_segments_survive_restart(tmp_path):
+    ledger = make_ledger(tmp_path, max_records=2)
+    for i in range(10):
+        ledger.add({"transactionId": f"txn_{i:04d}", "outcome": "WIN", "createdAt": time.time()})
+
+    reopened = SegmentArchive("transactions", "transactionId", directory=str(tmp_path))
+    assert reopened.segment_count == ledger.archive.segment_count
+    assert reopened.lookup("txn_0000")["outcome"] == "WIN"
+
+
+def test_clear_drops_memory_and_archive(tmp_path):
+    ledger = make_ledger(tmp_path, max_records=10)
+    for i in range(25):
+        ledger.add({"transactionId": f"txn_{i:04d}", "outcome": "LOSE", "createdAt": time.time()})
+
+    ledger.clear()
+
+    assert len(ledger) == 0
+    assert ledger.archive.segment_count == 0
+    assert list(tmp_path.iterdir()) == []
+    assert ledger.get("txn_0000") is None
+
+
+def test_pinned_records_are_not_rescanned_on_every_add(tmp_path):
+    checks = []
+
+    def is_settled(record):
+        checks.append(1)
+        return record.get("outcome") is not None
+
+    ledger = Ledger(
+        "transactionId",
+        policy=RetentionPolicy(max_records=100),
+        archive=SegmentArchive("transactions", "transactionId", directory=str(tmp_path)),
+        is_settled=is_settled
+    )
+    for i in range(1000):
+        ledger.add({"transactionId": f"txn_{i:04d}", "createdAt": time.time()})  # never spun
+    for i in range(1000, 3000):
+        ledger.add({"transactionId": f"txn_{i:04d}", "outcome": "LOSE", "createdAt": time.time()})
+
+    # each record is looked at a handful of times, not once per add
+    assert len(checks) < 20_000
+    # passes are spaced by the pinned count, so memory stays within twice the pinned records
+    assert len(ledger) <= 2 * 1000 + 100
+    assert ledger.get("txn_0000") is not None and ledger.get("txn_2999") is not None
+
+    ledger.get("txn_0000")["outcome"] = "LOSE"  # settles later, leaves with the next pass
+    ledger.enforce_retention()
+    assert "txn_0000" in [r["transactionId"] for r in ledger.archive]
+
+
+def test_archive_writes_run_outside_the_ledger_lock(tmp_path):
+    ledger = make_ledger(tmp_path, max_records=10)
+    ledger.archive = archive = GatedArchive("transactions", "transactionId", directory=str(tmp_path))
+    for i in range(10):
+        ledger.add(settled(i))
+    writer = threading.Thread(target=ledger.add, args=(settled(10),))
+    writer.start()
+    assert archive.entered.wait(5)
+
+    # the pass has evicted its records, they are readable while the segment is being written
+    assert ledger._lock.acquire(timeout=1)
+    ledger._lock.release()
+    assert len(ledger) <= 10
+    assert all(ledger.get(f"txn_{i:04d}") is not None for i in range(11))
+
+    archive.release.set()
+    writer.join()
+    assert archive.segment_count == 1
+    assert ledger.get("txn_0000")["outcome"] == "LOSE"
+
+
+def test_failed_archive_write_keeps_records_in_memory(tmp_path):
+    ledger = make_ledger(tmp_path, max_records=10)
+    ledger.archive = FailingArchive("transactions", "transactionId", directory=str(tmp_path))
+    for i in range(10):
+        ledger.add(settled(i))
+    with pytest.raises(OSError):
+        ledger.add(settled(10))
+
+    assert len(ledger) == 11
+    assert ledger.get("txn_0000")["outcome"] == "LOSE"
+
+    ledger.archive = SegmentArchive("transactions", "transactionId", directory=str(tmp_path))
+    ledger.enforce_retention()
+    assert len(ledger) <= 10
+    assert ledger.archive.lookup("txn_0000")["outcome"] == "LOSE"
@@ -0,0 +1,51 @@
+import pytest
+
+from schemas import Field, ValidationError, VALIDATORS, compile_schema
+
+
+def test_compiled_schema_checks_presence_types_and_bounds():
+    validate = compile_schema({
+        "userId": Field("integer"),
+        "amount": Field("number", exclusive_minimum=0, maximum=100),
+        "note": Field("string", required=False)
+    })
+
+    assert validate({"userId": 1, "amount": 2.5}) == {"userId": 1, "amount": 2.5}
+    assert validate({"userId": 1, "amount": 100, "note": "hi"})["note"] == "hi"
+
+    for body, error in [
+        (None, "Request body must be a JSON object"),
+        ([1], "Request body must be a JSON object"),
+        ({"amount": 1}, "userId is required"),
+        ({"userId": None, "amount": 1}, "userId is required"),
+        ({"userId": "1", "amount": 1}, "userId must be an integer"),
+        ({"userId": True, "amount": 1}, "userId must be an integer"),
+        ({"userId": 1, "amount": 0}, "amount must be greater than 0"),
+        ({"userId": 1, "amount": 101}, "amount must be at most 100"),
+        ({"userId": 1, "amount": float("nan")}, "amount must be a number"),
+        ({"userId": 1, "amount": 1, "note": ""}, "note must be a non-empty string")
+    ]:
+        with pytest.raises(ValidationError) as excinfo:
+            validate(body)
+        assert str(excinfo.value) == error
+
+
+def test_endpoint_schemas_reject_the_negative_cases():
+    with pytest.raises(ValidationError):
+        VALIDATORS["place_bet"]({"userId": 123, "betAmount": -25.0})
+    with pytest.raises(ValidationError):
+        VALIDATORS["notify"]({"userId": 123, "transactionId": "txn_1", "message": None})
+    with pytest.raises(ValidationError):
+        VALIDATORS["update_balance"]({"userId": 123, "newBalance": None})
+    with pytest.raises(ValidationError):
+        VALIDATORS["payout"]({"userId": 123, "transactionId": "txn_1", "winAmount": 0})
+    with pytest.raises(ValidationError):
+        VALIDATORS["update_balance"]({"userId": 123, "newBalance": 1e20})
+    with pytest.raises(ValidationError):
+        VALIDATORS["create_user"]({"balance": 1e18})
+    with pytest.raises(ValidationError, match="whole number of cents"):
+        VALIDATORS["place_bet"]({"userId": 123, "betAmount": 0.004})
+    assert VALIDATORS["payout"]({"userId": 123, "transactionId": "txn_1", "winAmount": 0.29})["winAmount"] == 0.29
+    with pytest.raises(ValidationError, match="at most 1000 items"):
+        VALIDATORS["spin_many"]({"spins": [{}] * 1001})
+    assert VALIDATORS["play"]({"userId": 123, "betAmount": 1})["betAmount"] == 1
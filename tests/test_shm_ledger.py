@@ -0,0 +1,96 @@
+import multiprocessing
+
+import pytest
+
+from player_store import spread
+from shm_ledger import MAX_CENTS, SharedBalanceLedger, SharedLedgerStorage
+from storage import BalanceOutOfRange
+
+
+def debit_worker(path, userId, attempts, results):
+    ledger = SharedBalanceLedger(path)
+    index = ledger.find(userId)
+    results.put(sum(1 for _ in range(attempts) if ledger.debit_if_sufficient(index, 1) is not None))
+    ledger.close()
+
+
+def test_accounts_are_found_and_updated(tmp_path):
+    ledger = SharedBalanceLedger(str(tmp_path / "ledger"), capacity=64)
+    for userId in range(40):
+        ledger.add(userId, 1000)
+
+    index = ledger.find(7)
+    assert ledger.debit_if_sufficient(index, 300) == 700
+    assert ledger.debit_if_sufficient(index, 800) is None
+    assert ledger.credit(index, 50) == 750
+    assert ledger.get(7) == (750, "USD")
+    assert ledger.find(99) == -1
+    assert ledger.find("7") == -1
+    assert len(ledger) == 40
+
+
+
+def test_snowflake_ids_mostly_land_in_their_first_probe_slot(tmp_path):
+    ledger = SharedBalanceLedger(str(tmp_path / "ledger"), capacity=4096)
+    userIds = [ms << 22 for ms in range(1000)]
+    for userId in userIds:
+        ledger.add(userId, 1000)
+
+    first_probe = sum(1 for userId in userIds if ledger.find(userId) == spread(userId, ledger.capacity))
+    assert first_probe > 800
+
+
+def test_processes_share_one_balance(tmp_path):
+    path = str(tmp_path / "ledger")
+    ledger = SharedBalanceLedger(path, capacity=16)
+    ledger.add(123, 1000)
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=debit_worker, args=(path, 123, 400, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sum(results.get() for _ in workers) == 1000
+    assert ledger.get(123) == (0, "USD")
+
+
+def test_storage_converts_cents(tmp_path):
+    storage = SharedLedgerStorage(str(tmp_path / "casino.db"), SharedBalanceLedger(str(tmp_path / "ledger"), capacity=16))
+    storage.add_player(123, 150.00)
+    user = storage.get_player(123)
+
+    assert storage.debit_if_sufficient(user, 10.20) == pytest.approx(139.80)
+    assert storage.credit(user, 0.01) == pytest.approx(139.81)
+    assert storage.get_player(123).balance == pytest.approx(139.81)
+    storage.close()
+
+
+def test_balance_changes_bump_the_version(tmp_path):
+    storage = SharedLedgerStorage(str(tmp_path / "casino.db"), SharedBalanceLedger(str(tmp_path / "ledger"), capacity=16))
+    storage.add_player(123, 150.00)
+    user = storage.get_player(123)
+    assert user.version == 1
+
+    storage.debit_if_sufficient(user, 10.00)
+    storage.credit(user, 1.00)
+    assert user.version == 3
+    assert storage.ledger.account(123) == (14100, "USD", 3)
+    assert [u and u.version for u in storage.get_players([123, 999])] == [3, None]
+    storage.close()
+
+
+def test_out_of_range_balances_leave_the_account_alone(tmp_path):
+    ledger = SharedBalanceLedger(str(tmp_path / "ledger"), capacity=16)
+    index = ledger.add(123, 15000)
+
+    with pytest.raises(BalanceOutOfRange):
+        ledger.set(index, MAX_CENTS + 1)
+    with pytest.raises(BalanceOutOfRange):
+        ledger.credit(index, MAX_CENTS)
+    with pytest.raises(BalanceOutOfRange):
+        ledger.add(456, MAX_CENTS + 1)
+    assert ledger.account(123) == (15000, "USD", 1)
+    assert ledger.find(456) == -1 and len(ledger) == 1
@@ -0,0 +1,33 @@
+from fractions import Fraction
+
+import pytest
+
+from slot_machine import analytic_report, evaluate_spin, payout_multiplier
+
+
+def test_paytable_matches_game_rules():
+    assert payout_multiplier(["Cherry", "Cherry", "Cherry"]) == 10
+    assert payout_multiplier(["Seven", "Seven", "Seven"]) == 5
+    assert payout_multiplier(["Bell", "Bell", "Bell"]) == 3
+    assert payout_multiplier(["Cherry", "Cherry", "Bell"]) == 0
+
+
+def test_evaluate_spin_messages():
+    assert evaluate_spin(["Seven", "Seven", "Seven"], 10) == ("WIN", 50, "Congratulations! You won $50!")
+    assert evaluate_spin(["Bar", "Lemon", "Bar"], 10) == ("LOSE", 0, "Better luck next time!")
+
+
+def test_analytic_rtp():
+    report = analytic_report()
+    assert report["rtp"] == Fraction(24, 125)
+    assert report["hitFrequency"] == Fraction(5, 125)
+
+
+def test_simulation_agrees_with_analytic_rtp():
+    pytest.importorskip("numpy")
+    from slot_simulator import simulate
+
+    report = simulate(2_000_000, chunk_size=250_000, seed=7)
+    assert report["spins"] == 2_000_000
+    assert report["analyticRtpWithinConfidence"]
+    assert report["hitFrequency"] == pytest.approx(0.04, abs=0.001)
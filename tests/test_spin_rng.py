@@ -0,0 +1,84 @@
+import threading
+from collections import Counter
+
+import pytest
+
+from slot_machine import REELS
+from spin_rng import COMBINATIONS, MODES, SpinRng, replay
+
+REPLAYABLE_MODES = [mode for mode in MODES if mode != "crypto"]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_every_mode_covers_all_combinations_uniformly(mode):
+    if mode == "numpy":
+        pytest.importorskip("numpy")
+    rng = SpinRng(mode=mode, pool_size=1000)
+    counts = Counter(tuple(rng.spin()[0]) for _ in range(25_000))
+
+    assert len(counts) == len(COMBINATIONS)
+    assert all(symbol in REELS for combo in counts for symbol in combo)
+    # 200 expected per combination
+    assert min(counts.values()) > 120
+    assert max(counts.values()) < 280
+
+
+@pytest.mark.parametrize("mode", REPLAYABLE_MODES)
+def test_seeded_server_stream_is_deterministic_and_replayable(mode):
+    if mode == "numpy":
+        pytest.importorskip("numpy")
+    first = SpinRng(mode=mode, seed=42, pool_size=16)
+    second = SpinRng(mode=mode, seed=42, pool_size=16)
+
+    spins = [first.spin(123) for _ in range(40)]
+    assert [reels for reels, _ in spins] == [second.spin(456)[0] for _ in range(40)]
+    assert all(replay(position) == reels for reels, position in spins)
+    other_seed = SpinRng(mode=mode, seed=43, pool_size=16)
+    assert [other_seed.spin()[0] for _ in range(40)] != [reels for reels, _ in spins]
+
+
+@pytest.mark.parametrize("mode", REPLAYABLE_MODES)
+def test_per_user_streams_do_not_depend_on_interleaving(mode):
+    if mode == "numpy":
+        pytest.importorskip("numpy")
+    alone = SpinRng(mode=mode, seed=7, per_user=True, user_pool_size=8)
+    mixed = SpinRng(mode=mode, seed=7, per_user=True, user_pool_size=8)
+
+    expected = [alone.spin(1)[0] for _ in range(20)]
+    actual = []
+    for _ in range(20):
+        mixed.spin(2)
+        actual.append(mixed.spin(1)[0])
+    assert actual == expected
+
+
+def test_unseeded_and_crypto_spins_have_no_replay_position():
+    assert SpinRng(mode="stdlib").spin(1)[1] is None
+    assert SpinRng(mode="crypto").spin(1)[1] is None
+    with pytest.raises(ValueError):
+        SpinRng(mode="crypto", seed=1)
+
+
+def test_unseeded_streams_are_shared_by_short_lived_threads():
+    rng = SpinRng(mode="stdlib", pool_size=64, thread_streams=4)
+    draws = []
+    draw = rng._draw
+    rng._draw = lambda key, size: draws.append(key) or draw(key, size)
+
+    for _ in range(50):
+        thread = threading.Thread(target=rng.spin)
+        thread.start()
+        thread.join()
+    assert len(draws) <= 4
+
+
+def test_evicted_user_streams_come_back_with_a_new_key():
+    rng = SpinRng(mode="stdlib", seed=7, per_user=True, user_pool_size=8, max_user_streams=2)
+    first = rng.spin(1)[1]
+    rng.spin(2)
+    rng.spin(3)
+    assert len(rng._user_streams) == 2
+
+    reels, again = rng.spin(1)
+    assert again["key"] != first["key"]
+    assert replay(again) == reels
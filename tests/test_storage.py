@@ -0,0 +1,128 @@
+import threading
+
+import pytest
+
+from storage import InMemoryStorage
+from sqlite_storage import SQLiteStorage
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryStorage()
+    else:
+        backend = SQLiteStorage(str(tmp_path / "casino.db"), pool_size=4)
+        yield backend
+        backend.close()
+
+
+def test_player_balance_operations(storage):
+    storage.add_player(123, 150.00)
+    user = storage.get_player(123)
+
+    assert storage.debit_if_sufficient(user, 50.00) == 100.00
+    assert storage.debit_if_sufficient(user, 500.00) is None
+    assert storage.credit(user, 25.00) == 125.00
+    assert storage.set_balance(user, 10.00) == 10.00
+    assert storage.get_player(123).balance == 10.00
+    assert storage.get_player(999) is None
+    assert storage.get_player([123]) is None
+
+
+def test_transaction_records_round_trip(storage):
+    storage.add_transaction({"transactionId": "txn_1", "userId": 123, "betAmount": 10, "createdAt": 1.0})
+    transaction = storage.get_transaction("txn_1")
+    storage.update_transaction(transaction, outcome="WIN")
+    storage.update_transaction(transaction, winAmount=30, payoutStatus="PAID")
+
+    stored = storage.get_transaction("txn_1")
+    assert stored["outcome"] == "WIN"
+    assert stored["payoutStatus"] == "PAID"
+    assert storage.get_transactions(["txn_1", "txn_2"])[1] is None
+
+
+def test_updates_of_different_fields_do_not_overwrite_each_other(tmp_path):
+    spins, payouts = (SQLiteStorage(str(tmp_path / "casino.db"), pool_size=1) for _ in range(2))
+    spins.add_transaction({"transactionId": "txn_1", "userId": 123, "betAmount": 10, "createdAt": 1.0})
+    # both workers read the record before either writes
+    spun, paid = spins.get_transaction("txn_1"), payouts.get_transaction("txn_1")
+    spins.update_transaction(spun, outcome="WIN", note=None)
+    payouts.update_transaction(paid, winAmount=30.5, payoutStatus="PAID")
+
+    assert spins.get_transaction("txn_1") == {
+        "transactionId": "txn_1", "userId": 123, "betAmount": 10, "createdAt": 1.0,
+        "outcome": "WIN", "note": None, "winAmount": 30.5, "payoutStatus": "PAID"
+    }
+    spins.close()
+    payouts.close()
+
+
+def test_notification_status_updates(storage):
+    notification = {"notificationId": "notif_1", "userId": 123, "transactionId": "txn_1", "status": "QUEUED", "createdAt": 1.0}
+    storage.add_notification(notification)
+    storage.update_notifications([notification], status="SENT")
+
+    assert storage.get_notification("notif_1")["status"] == "SENT"
+    assert storage.sizes()["notifications"] == 1
+
+
+def test_concurrent_debits_never_overdraw(storage):
+    storage.add_player(1, 100)
+    accepted = []
+
+    def bettor():
+        user = storage.get_player(1)
+        accepted.extend(1 for _ in range(50) if storage.debit_if_sufficient(user, 1) is not None)
+
+    threads = [threading.Thread(target=bettor) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(accepted) == 100
+    assert storage.get_player(1).balance == 0
+
+
+def test_reset_drops_players_and_records(storage):
+    storage.add_player(123, 150.00)
+    storage.add_transaction({"transactionId": "txn_1", "userId": 123, "betAmount": 10, "createdAt": 1.0})
+    storage.add_notification({"notificationId": "notif_1", "transactionId": "txn_1", "userId": 123, "status": "SENT"})
+
+    storage.reset()
+
+    assert storage.get_player(123) is None
+    assert storage.get_transaction("txn_1") is None
+    assert storage.sizes() == {"players": 0, "transactions": 0, "spin_results": 0, "notifications": 0}
+
+
+def test_balance_versions_and_bulk_reads(storage):
+    storage.add_player(123, 150.00)
+    storage.add_player(456, 20.00)
+    user = storage.get_player(123)
+    assert user.version == 1
+
+    storage.debit_if_sufficient(user, 50.00)
+    storage.debit_if_sufficient(user, 500.00)  # refused, no change
+    storage.credit(user, 25.00)
+    assert user.version == 3
+    assert storage.get_player(123).version == 3
+
+    users = storage.get_players(iter([456, 999, 123]))
+    assert [u and (u.userId, u.balance, u.version) for u in users] == [(456, 20.00, 1), None, (123, 125.00, 3)]
+
+
+def test_history_pages_newest_first(storage):
+    for i in range(600):
+        storage.add_transaction({"transactionId": f"txn_{i:04d}", "userId": i % 2, "betAmount": 1, "createdAt": float(i)})
+    storage.add_spin({"spinId": "spin_1", "transactionId": "txn_0001", "userId": 1, "createdAt": 1.5})
+
+    ids = [record["transactionId"] for _, record in storage.history("transactions", 1)]
+    assert len(ids) == 300
+    assert ids[:2] == ["txn_0599", "txn_0597"] and ids[-1] == "txn_0001"
+
+    page = list(storage.history("transactions", 0, since=100.0, until=110.0))
+    assert [record["createdAt"] for _, record in page] == [108.0, 106.0, 104.0, 102.0, 100.0]
+    resumed = storage.history("transactions", 0, since=100.0, until=110.0, before=page[1][0])
+    assert [record["createdAt"] for _, record in resumed] == [104.0, 102.0, 100.0]
+    assert [record["spinId"] for _, record in storage.history("spins", 1)] == ["spin_1"]
@@ -0,0 +1,148 @@
+import errno
+import threading
+import time
+
+import pytest
+
+from player_store import PlayerStore
+from wal import LogUnavailable, WriteAheadLog
+
+
+def open_store(directory, **options):
+    wal = WriteAheadLog(str(directory), **options)
+    store = PlayerStore()
+    state, events = wal.recover()
+    for record in (state or {}).get("players", []) + events:
+        user = store.get(record["userId"])
+        if user is None:
+            store.add(record["userId"], record["balance"])
+        else:
+            user.balance = record["balance"]
+
+    def journal(player):
+        wal.append({"type": "balance", "userId": player.userId, "balance": player.balance})
+
+    store.journal = journal
+    wal.start()
+    return wal, store
+
+
+def test_balances_survive_restart(tmp_path):
+    wal, store = open_store(tmp_path)
+    player = store.add(1, 100)
+    store.debit_if_sufficient(player, 30)
+    store.credit(store.add(2, 5), 10)
+    assert wal.wait_durable()
+    wal.close()
+
+    wal, store = open_store(tmp_path)
+    assert store.get(1).balance == 70
+    assert store.get(2).balance == 15
+    wal.close()
+
+
+def test_concurrent_writers_share_commits(tmp_path):
+    wal, store = open_store(tmp_path, commit_window=0.005)
+    players = [store.add(i, 0) for i in range(8)]
+
+    def writer(i):
+        for _ in range(50):
+            store.credit(players[i], 1)
+            wal.wait_durable()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wal.close()
+
+    assert wal.stats["appends"] == 8 + 400
+    assert wal.stats["commits"] < wal.stats["appends"]
+
+
+def test_snapshot_truncates_log_and_recovery_replays_tail(tmp_path):
+    wal, store = open_store(tmp_path)
+    player = store.add(1, 0)
+    for _ in range(100):
+        store.credit(player, 1)
+    wal.wait_durable()
+    wal.snapshot(lambda: {"players": [{"userId": p.userId, "balance": p.balance} for p in store]})
+    for _ in range(5):
+        store.credit(player, 1)
+    wal.wait_durable()
+    wal.close()
+
+    assert len(list(tmp_path.glob("wal-*.log"))) == 1
+
+    wal, store = open_store(tmp_path)
+    assert store.get(1).balance == 105
+    wal.close()
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    wal, store = open_store(tmp_path)
+    store.add(1, 42)
+    wal.wait_durable()
+    wal.close()
+
+    segment = sorted(tmp_path.glob("wal-*.log"))[-1]
+    with open(segment, "a") as log:
+        log.write('{"type": "balance", "userId": 1, "bal')
+
+    wal, store = open_store(tmp_path)
+    assert store.get(1).balance == 42
+    wal.close()
+
+
+def test_failed_snapshot_does_not_stop_later_ones(tmp_path):
+    wal = WriteAheadLog(str(tmp_path), snapshot_interval=0.01)
+    store = PlayerStore()
+    calls = []
+
+    def state_fn():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("dictionary changed size during iteration")
+        return {"players": [p.to_dict() for p in store]}
+
+    store.journal = lambda player: wal.append({"type": "balance", "userId": player.userId, "balance": player.balance})
+    wal.start(state_fn=state_fn)
+    for userId in range(3):
+        store.add(userId, 10)
+        wal.wait_durable()
+        time.sleep(0.05)
+    wal.close()
+
+    assert wal.stats["snapshotErrors"] == 1
+    assert wal.stats["snapshots"] >= 1
+
+
+class FullDisk:
+    def write(self, data):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    def close(self):
+        pass
+
+
+def test_failed_write_wakes_waiters_instead_of_hanging(tmp_path):
+    wal, store = open_store(tmp_path)
+    store.add(1, 100)
+    assert wal.wait_durable()
+
+    segment, wal._segment = wal._segment, FullDisk()
+    store.add(2, 5)
+    with pytest.raises(LogUnavailable):
+        wal.wait_durable(timeout=5)
+    # the flusher is gone, later writers fail straight away
+    store.add(3, 5)
+    with pytest.raises(LogUnavailable):
+        wal.wait_durable(timeout=5)
+    assert wal.stats["commitErrors"] == 1
+    wal.close()
+    segment.close()
+
+    wal, store = open_store(tmp_path)
+    assert store.get(1).balance == 100 and store.get(2) is None
+    wal.close()
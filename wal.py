@@ -0,0 +1,264 @@
+# write-ahead log - group-committed balance journal with snapshots for fast restart
+
+import json
+import os
+import threading
+import time
+
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".log"
+SNAPSHOT_FILE = "snapshot.json"
+
+DEFAULT_COMMIT_WINDOW = 0.002
+DEFAULT_SNAPSHOT_INTERVAL = 60.0
+DEFAULT_SNAPSHOT_EVERY = 100_000
+
+
+def _fsync_directory(directory):
+    # make renames and new files durable, not every platform allows this
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class LogUnavailable(RuntimeError):
+    """The log could not be written, events appended since are not durable"""
+
+
+class WriteAheadLog:
+    """Append-only event log where many writers share one fsync
+
+    append() only buffers the event and hands back its sequence number; a
+    single flusher thread writes whatever accumulated during the commit
+    window and fsyncs once for the whole group. wait_durable() blocks until
+    the caller's events are on disk. If a write or fsync fails the log stops
+    for good: waiters wake up with LogUnavailable instead of blocking on a
+    flusher that is gone.
+
+    Events record absolute values (the balance after the change), so
+    replaying an event twice is harmless. That lets snapshots be taken
+    without stopping writers: the log is rotated at the snapshot sequence,
+    state is captured, and recovery replays every event after that sequence
+    on top of it.
+    """
+
+    def __init__(self, directory, commit_window=DEFAULT_COMMIT_WINDOW,
+                 snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL, snapshot_every=DEFAULT_SNAPSHOT_EVERY):
+        self.directory = directory
+        self.commit_window = commit_window
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # held by whoever writes to the segment file (flusher or snapshot rotation)
+        self._io_lock = threading.Lock()
+        self._appended = threading.Condition(self._lock)
+        self._durable = threading.Condition(self._lock)
+        self._local = threading.local()
+        self._buffer = []
+        self._seq = 0
+        self._durable_seq = 0
+        self._snapshot_seq = 0
+        self._events_since_snapshot = 0
+        self._segment = None
+        self._closed = False
+        self._error = None
+        self._flusher = None
+        self._snapshotter = None
+        self._snapshot_requested = threading.Event()
+        self._state_fn = None
+        self.stats = {"appends": 0, "commits": 0, "commitErrors": 0, "snapshots": 0, "snapshotErrors": 0}
+
+    # recovery
+
+    def _segment_paths(self):
+        names = [n for n in os.listdir(self.directory) if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX)]
+        return [os.path.join(self.directory, n) for n in sorted(names)]
+
+    def recover(self):
+        """Latest snapshot state (or None) and the events logged after it
+
+        Must run before start(). A torn last line from a crash mid-write is
+        ignored, everything before it is replayed.
+        """
+        state = None
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, encoding="utf-8") as snapshot:
+                data = json.load(snapshot)
+            state = data["state"]
+            self._snapshot_seq = data["seq"]
+
+        events = []
+        last_seq = self._snapshot_seq
+        for path in self._segment_paths():
+            with open(path, encoding="utf-8") as segment:
+                for line in segment:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    if event["seq"] > self._snapshot_seq:
+                        events.append(event)
+                        last_seq = max(last_seq, event["seq"])
+
+        self._seq = self._durable_seq = last_seq
+        return state, events
+
+    # writing
+
+    def start(self, state_fn=None):
+        """Start the flusher, and the periodic snapshotter when state_fn is given"""
+        self._open_segment(self._seq + 1)
+        self._flusher = threading.Thread(target=self._flush_loop, name="wal-flusher", daemon=True)
+        self._flusher.start()
+        if state_fn is not None:
+            self._state_fn = state_fn
+            self._snapshotter = threading.Thread(target=self._snapshot_loop, name="wal-snapshotter", daemon=True)
+            self._snapshotter.start()
+
+    def _open_segment(self, first_seq):
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{first_seq:016d}{SEGMENT_SUFFIX}")
+        self._segment = open(path, "a", encoding="utf-8")
+        _fsync_directory(self.directory)
+
+    def append(self, event):
+        """Buffer an event and return its sequence number, does not wait for disk"""
+        with self._lock:
+            self._seq += 1
+            event["seq"] = self._seq
+            if self._error is None:
+                # nothing drains the buffer once the log has failed
+                self._buffer.append(json.dumps(event, separators=(",", ":")) + "\n")
+            self.stats["appends"] += 1
+            self._appended.notify()
+            seq = self._seq
+        self._local.seq = seq
+        return seq
+
+    def wait_durable(self, seq=None, timeout=None):
+        """Block until seq (default: this thread's last append) is fsynced
+
+        Raises LogUnavailable when the log failed before seq reached disk.
+        """
+        if seq is None:
+            seq = getattr(self._local, "seq", 0)
+            self._local.seq = 0
+        if not seq:
+            return True
+        with self._lock:
+            done = self._durable.wait_for(
+                lambda: self._durable_seq >= seq or self._closed or self._error is not None, timeout)
+            if self._durable_seq < seq and self._error is not None:
+                raise LogUnavailable(f"write-ahead log failed: {self._error}") from self._error
+            return done
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                self._appended.wait_for(lambda: self._buffer or self._closed)
+                if self._closed and not self._buffer:
+                    return
+            # let more writers join this commit group
+            if self.commit_window:
+                time.sleep(self.commit_window)
+            with self._io_lock:
+                with self._lock:
+                    lines, self._buffer = self._buffer, []
+                    seq = self._seq
+                if lines:
+                    try:
+                        self._segment.write("".join(lines))
+                        self._segment.flush()
+                        os.fsync(self._segment.fileno())
+                    except OSError as error:
+                        self._fail(error)
+                        return
+            with self._lock:
+                self._durable_seq = max(self._durable_seq, seq)
+                self.stats["commits"] += 1
+                self._events_since_snapshot += len(lines)
+                if self._events_since_snapshot >= self.snapshot_every:
+                    self._snapshot_requested.set()
+                self._durable.notify_all()
+
+    def _fail(self, error):
+        with self._lock:
+            self._error = error
+            self._buffer = []
+            self.stats["commitErrors"] += 1
+            self._durable.notify_all()
+
+    # snapshots
+
+    def _snapshot_loop(self):
+        while not self._closed:
+            self._snapshot_requested.wait(self.snapshot_interval)
+            self._snapshot_requested.clear()
+            if self._closed:
+                return
+            if self._seq > self._snapshot_seq:
+                try:
+                    self.snapshot(self._state_fn)
+                except Exception:
+                    # the log segments are only dropped after a snapshot is written, nothing is
+                    # lost; keep the thread alive so the next interval tries again
+                    self.stats["snapshotErrors"] += 1
+
+    def snapshot(self, state_fn):
+        """Write a compact snapshot and drop the log segments it covers"""
+        with self._io_lock:
+            with self._lock:
+                if self._error is not None:
+                    raise LogUnavailable(f"write-ahead log failed: {self._error}")
+                snapshot_seq = self._seq
+                pending, self._buffer = self._buffer, []
+                self._events_since_snapshot = 0
+            old_segment = self._segment
+            old_segment.write("".join(pending))
+            old_segment.flush()
+            os.fsync(old_segment.fileno())
+            with self._lock:
+                self._durable_seq = max(self._durable_seq, snapshot_seq)
+                self._durable.notify_all()
+            # rotate so every event after snapshot_seq lands in a fresh segment
+            self._open_segment(snapshot_seq + 1)
+            old_segment.close()
+
+        state = state_fn()
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as snapshot:
+            json.dump({"seq": snapshot_seq, "createdAt": time.time(), "state": state}, snapshot, separators=(",", ":"))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(tmp_path, path)
+        _fsync_directory(self.directory)
+
+        current = os.path.basename(self._segment.name)
+        for segment_path in self._segment_paths():
+            if os.path.basename(segment_path) < current:
+                os.remove(segment_path)
+        self._snapshot_seq = snapshot_seq
+        self.stats["snapshots"] += 1
+        return snapshot_seq
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._appended.notify_all()
+        self._snapshot_requested.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            self._durable.notify_all()
+        if self._segment is not None:
+            self._segment.close()